@@ -0,0 +1,66 @@
+"""add reconciliation_runs and reconciliation_drifts
+
+Persisted state for the reconciliation engine: one row per run (mode,
+checkpoint cursor, counters) and one row per drifted or unreadable account.
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a3b4c5d6e7f8'
+down_revision: Union[str, Sequence[str], None] = 'f2a3b4c5d6e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'reconciliation_runs',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('mode', sa.String(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('baseline_run_id', sa.String(), nullable=True),
+        sa.Column('cursor', sa.String(), nullable=True),
+        sa.Column('accounts_checked', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('drifted', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('errors', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('started_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['baseline_run_id'], ['reconciliation_runs.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_reconciliation_runs_started_at', 'reconciliation_runs', ['started_at'])
+    op.create_table(
+        'reconciliation_drifts',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('run_id', sa.String(), nullable=False),
+        sa.Column('crypto_account_id', sa.String(), nullable=False),
+        sa.Column('user_id', sa.String(), nullable=True),
+        sa.Column('merchant_id', sa.String(), nullable=True),
+        sa.Column('asset_code', sa.String(), nullable=False),
+        sa.Column('partner_account_id', sa.String(), nullable=False),
+        sa.Column('internal_balance', sa.Numeric(38, 18), nullable=False),
+        sa.Column('external_balance', sa.Numeric(38, 18), nullable=True),
+        sa.Column('drift', sa.Numeric(38, 18), nullable=True),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['run_id'], ['reconciliation_runs.id']),
+        sa.ForeignKeyConstraint(['crypto_account_id'], ['crypto_accounts.id']),
+        sa.ForeignKeyConstraint(['asset_code'], ['assets.code']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_reconciliation_drifts_run_id', 'reconciliation_drifts', ['run_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reconciliation_drifts_run_id', table_name='reconciliation_drifts')
+    op.drop_table('reconciliation_drifts')
+    op.drop_index('ix_reconciliation_runs_started_at', table_name='reconciliation_runs')
+    op.drop_table('reconciliation_runs')
@@ -0,0 +1,87 @@
+"""add materialized balances table
+
+One row per (owner_type, owner_id, asset_code) holding the running balance in
+base units, maintained alongside every ledger insert. Backfilled here from the
+existing ledger with the same rules as the legacy SUM (USD from `amount`,
+stablecoins from `amount_base_units`).
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import uuid
+from decimal import Decimal
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a7b8c9d0e1f2'
+down_revision: Union[str, Sequence[str], None] = 'f6a7b8c9d0e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'balances',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('owner_type', sa.String(), nullable=False),
+        sa.Column('owner_id', sa.String(), nullable=False),
+        sa.Column('asset_code', sa.String(), server_default='USD', nullable=False),
+        sa.Column('balance_base_units', sa.Numeric(38, 0), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['asset_code'], ['assets.code']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('owner_type', 'owner_id', 'asset_code', name='uq_balance_owner_asset'),
+    )
+
+    ledger = sa.table(
+        'ledger',
+        sa.column('merchant_id', sa.String),
+        sa.column('user_id', sa.String),
+        sa.column('entry_type', sa.String),
+        sa.column('asset_code', sa.String),
+        sa.column('amount', sa.Numeric(12, 2)),
+        sa.column('amount_base_units', sa.Numeric(38, 0)),
+    )
+    is_credit = ledger.c.entry_type == 'credit'
+    signed_amount = sa.case((is_credit, ledger.c.amount), else_=-ledger.c.amount)
+    signed_units = sa.case((is_credit, ledger.c.amount_base_units), else_=-ledger.c.amount_base_units)
+
+    bind = op.get_bind()
+    rows = []
+    for owner_type, owner_col in (('merchant', ledger.c.merchant_id), ('user', ledger.c.user_id)):
+        result = bind.execute(
+            sa.select(owner_col, ledger.c.asset_code, sa.func.sum(signed_amount), sa.func.sum(signed_units))
+            .where(owner_col.isnot(None))
+            .group_by(owner_col, ledger.c.asset_code)
+        )
+        for owner_id, asset_code, amount_sum, units_sum in result:
+            if asset_code == 'USD':
+                units = int((Decimal(str(amount_sum or 0)) * 100).to_integral_value())
+            else:
+                units = int(units_sum or 0)
+            rows.append({
+                'id': str(uuid.uuid4()), 'owner_type': owner_type, 'owner_id': owner_id,
+                'asset_code': asset_code, 'balance_base_units': units,
+            })
+
+    if rows:
+        op.bulk_insert(
+            sa.table(
+                'balances',
+                sa.column('id', sa.String),
+                sa.column('owner_type', sa.String),
+                sa.column('owner_id', sa.String),
+                sa.column('asset_code', sa.String),
+                sa.column('balance_base_units', sa.Numeric(38, 0)),
+            ),
+            rows,
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('balances')
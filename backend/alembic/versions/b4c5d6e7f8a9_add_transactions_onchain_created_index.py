@@ -0,0 +1,33 @@
+"""partial index of on-chain transactions on (created_at, id) for compliance exports
+
+Lets the streaming audit-trail / CTR exports read on-chain transactions in
+export order from the index instead of sorting every row before the first
+one is sent.
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b4c5d6e7f8a9'
+down_revision: Union[str, Sequence[str], None] = 'a3b4c5d6e7f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_transactions_onchain_created', 'transactions', ['created_at', 'id'],
+        postgresql_where=sa.text("settlement_type = 'onchain'"),
+        sqlite_where=sa.text("settlement_type = 'onchain'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_onchain_created', table_name='transactions')
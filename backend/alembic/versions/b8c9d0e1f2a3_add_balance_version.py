@@ -0,0 +1,31 @@
+"""add optimistic-concurrency version to balances
+
+post_journal locks balance rows with SELECT ... FOR UPDATE; the version column
+additionally conditions every UPDATE on the value read, so backends without
+row locks (SQLite) reject a lost update instead of applying it.
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'b8c9d0e1f2a3'
+down_revision: Union[str, Sequence[str], None] = 'a7b8c9d0e1f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('balances', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('balances', schema=None) as batch_op:
+        batch_op.drop_column('version')
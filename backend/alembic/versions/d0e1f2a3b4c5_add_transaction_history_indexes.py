@@ -0,0 +1,33 @@
+"""add (party, created_at) indexes on transactions for keyset pagination
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'd0e1f2a3b4c5'
+down_revision: Union[str, Sequence[str], None] = 'c9d0e1f2a3b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_INDEXES = (
+    ('ix_transactions_sender_merchant_created', 'sender_merchant_id'),
+    ('ix_transactions_receiver_merchant_created', 'receiver_merchant_id'),
+    ('ix_transactions_sender_user_created', 'sender_user_id'),
+    ('ix_transactions_receiver_user_created', 'receiver_user_id'),
+)
+
+
+def upgrade() -> None:
+    for name, column in _INDEXES:
+        op.create_index(name, 'transactions', [column, 'created_at'])
+
+
+def downgrade() -> None:
+    for name, _ in _INDEXES:
+        op.drop_index(name, table_name='transactions')
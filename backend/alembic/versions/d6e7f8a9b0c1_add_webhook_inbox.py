@@ -0,0 +1,50 @@
+"""add webhook_inbox
+
+Inbound webhooks accepted in queue mode (WEBHOOK_INGEST_MODE=queue): one row
+per delivery, deduped by event_id, drained in order per ordering_key.
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd6e7f8a9b0c1'
+down_revision: Union[str, Sequence[str], None] = 'c5d6e7f8a9b0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'webhook_inbox',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('provider', sa.String(), nullable=False),
+        sa.Column('event_id', sa.String(), nullable=False),
+        sa.Column('event_type', sa.String(), nullable=True),
+        sa.Column('ordering_key', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(), server_default='pending', nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('claim_id', sa.String(), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('outcome', sa.String(), nullable=True),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('received_at', sa.DateTime(), nullable=False),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_id'),
+    )
+    op.create_index('ix_webhook_inbox_status_received', 'webhook_inbox', ['status', 'received_at'])
+    op.create_index('ix_webhook_inbox_ordering_key', 'webhook_inbox', ['ordering_key', 'received_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_webhook_inbox_ordering_key', table_name='webhook_inbox')
+    op.drop_index('ix_webhook_inbox_status_received', table_name='webhook_inbox')
+    op.drop_table('webhook_inbox')
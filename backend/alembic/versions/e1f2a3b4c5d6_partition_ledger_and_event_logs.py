@@ -0,0 +1,154 @@
+"""partition ledger and event_logs by month; add archive_snapshots
+
+On Postgres both tables become declarative RANGE partitions on created_at:
+one partition per month from the oldest row through PARTITION_PREMAKE_MONTHS
+ahead, plus a DEFAULT partition. The primary key becomes (id, created_at)
+because Postgres requires the partition key in every unique constraint.
+Existing rows are copied across in the same transaction.
+
+SQLite has no partitioning; there the tables stay as they are, with
+created_at back-filled and made NOT NULL, and get created_at indexes, so the
+archival job's month ranges are index scans.
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'e1f2a3b4c5d6'
+down_revision: Union[str, Sequence[str], None] = 'd0e1f2a3b4c5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_PREMAKE_MONTHS = 3
+
+# table -> (foreign keys, secondary indexes) recreated on the partitioned table
+_TABLES = {
+    'ledger': (
+        (('merchant_id', 'merchants', 'id'), ('user_id', 'users', 'id'),
+         ('transaction_id', 'transactions', 'id'), ('asset_code', 'assets', 'code')),
+        (('ix_ledger_merchant_id', ['merchant_id']), ('ix_ledger_user_id', ['user_id']),
+         ('ix_ledger_owner_asset', ['merchant_id', 'user_id', 'asset_code'])),
+    ),
+    'event_logs': (
+        (),
+        (('ix_event_logs_event_type', ['event_type']), ('ix_event_logs_reference_id', ['reference_id'])),
+    ),
+}
+
+# Added on every dialect.
+_NEW_INDEXES = (
+    ('ix_ledger_created_at', 'ledger', 'created_at'),
+    ('ix_ledger_transaction_id', 'ledger', 'transaction_id'),
+    ('ix_event_logs_created_at', 'event_logs', 'created_at'),
+)
+
+
+def _months(first: datetime, last: datetime):
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        yield datetime(year, month, 1)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _next_month(start: datetime) -> datetime:
+    return datetime(start.year + 1, 1, 1) if start.month == 12 else datetime(start.year, start.month + 1, 1)
+
+
+def _partition(table: str) -> None:
+    conn = op.get_bind()
+    foreign_keys, indexes = _TABLES[table]
+    old = f'{table}_unpartitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {old}_pkey')
+    for name, _ in indexes:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute(f'UPDATE {old} SET created_at = now() WHERE created_at IS NULL')
+
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)')
+    for column, target, target_column in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES {target} ({target_column})')
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    now = datetime.utcnow()
+    oldest = conn.execute(sa.text(f'SELECT min(created_at) FROM {old}')).scalar() or now
+    last = datetime(now.year, now.month, 1)
+    for _ in range(_PREMAKE_MONTHS):
+        last = _next_month(last)
+    for start in _months(oldest, last):
+        op.execute(
+            f"CREATE TABLE {table}_y{start:%Y}m{start:%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{_next_month(start):%Y-%m-%d}')"
+        )
+
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    op.execute(f'DROP TABLE {old}')
+    for name, columns in indexes:
+        op.create_index(name, table, columns)
+
+
+def _unpartition(table: str) -> None:
+    foreign_keys, indexes = _TABLES[table]
+    old = f'{table}_partitioned'
+    op.execute(f'ALTER TABLE {table} RENAME TO {old}')
+    op.execute(f'ALTER INDEX {table}_pkey RENAME TO {old}_pkey')
+    for name, _ in indexes:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.execute(f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS)')
+    op.execute(f'ALTER TABLE {table} ALTER COLUMN created_at DROP NOT NULL')
+    op.execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)')
+    for column, target, target_column in foreign_keys:
+        op.execute(f'ALTER TABLE {table} ADD FOREIGN KEY ({column}) REFERENCES {target} ({target_column})')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+    op.execute(f'DROP TABLE {old} CASCADE')  # drops every partition with it
+    for name, columns in indexes:
+        op.create_index(name, table, columns)
+
+
+def upgrade() -> None:
+    op.create_table(
+        'archive_snapshots',
+        sa.Column('id', sa.String(), nullable=False),
+        sa.Column('table_name', sa.String(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('period_end', sa.DateTime(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('opening_entries', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('checksum', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('table_name', 'period_start', name='uq_archive_snapshots_table_period'),
+    )
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in _TABLES:
+            _partition(table)
+    else:
+        for table in _TABLES:
+            op.execute(f'UPDATE {table} SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+    for name, table, column in _NEW_INDEXES:
+        op.create_index(name, table, [column])
+
+
+def downgrade() -> None:
+    for name, table, _ in _NEW_INDEXES:
+        op.drop_index(name, table_name=table)
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in _TABLES:
+            _unpartition(table)
+    else:
+        for table in _TABLES:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=True)
+    op.drop_table('archive_snapshots')
@@ -0,0 +1,35 @@
+"""normalize transactions.created_at text on SQLite
+
+Rows written through server_default CURRENT_TIMESTAMP are stored as
+'YYYY-MM-DD HH:MM:SS'; the ORM now sets created_at itself and stores
+'YYYY-MM-DD HH:MM:SS.ffffff'. Rewrite the short form so keyset pagination can
+compare and order on the raw column (and its indexes). Other dialects store a
+real timestamp and need nothing.
+
+Revision ID: e7f8a9b0c1d2
+Revises: d6e7f8a9b0c1
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'e7f8a9b0c1d2'
+down_revision: Union[str, Sequence[str], None] = 'd6e7f8a9b0c1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(
+            "UPDATE transactions SET created_at = created_at || '.000000' "
+            "WHERE length(created_at) = 19"
+        )
+
+
+def downgrade() -> None:
+    # The long form reads back as the same datetime; nothing to undo.
+    pass
@@ -0,0 +1,52 @@
+"""covering ledger totals indexes, transaction reference and pending on-chain indexes
+
+Replaces the single-column ledger owner indexes (and the unused
+(merchant_id, user_id, asset_code) one) with covering per-owner totals
+indexes, indexes transactions.reference_id for the bank webhook, and adds a
+partial index of on-chain transfers awaiting settlement.
+
+Revision ID: f2a3b4c5d6e7
+Revises: e1f2a3b4c5d6
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f2a3b4c5d6e7'
+down_revision: Union[str, Sequence[str], None] = 'e1f2a3b4c5d6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_TOTALS_COLUMNS = ['asset_code', 'entry_type', 'amount', 'amount_base_units']
+
+
+def upgrade() -> None:
+    op.drop_index('ix_ledger_owner_asset', table_name='ledger')
+    op.drop_index('ix_ledger_merchant_id', table_name='ledger')
+    op.drop_index('ix_ledger_user_id', table_name='ledger')
+    op.create_index('ix_ledger_merchant_totals', 'ledger', ['merchant_id'] + _TOTALS_COLUMNS)
+    op.create_index('ix_ledger_user_totals', 'ledger', ['user_id'] + _TOTALS_COLUMNS)
+
+    op.create_index('ix_transactions_reference_id', 'transactions', ['reference_id'])
+    op.create_index(
+        'ix_transactions_onchain_pending', 'transactions', ['onchain_status', 'created_at'],
+        postgresql_where=sa.text(
+            "settlement_type = 'onchain' AND onchain_status IN ('submitted', 'confirming') "
+            "AND partner_transfer_id IS NOT NULL"
+        ),
+        sqlite_where=sa.text("settlement_type = 'onchain' AND partner_transfer_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_onchain_pending', table_name='transactions')
+    op.drop_index('ix_transactions_reference_id', table_name='transactions')
+    op.drop_index('ix_ledger_user_totals', table_name='ledger')
+    op.drop_index('ix_ledger_merchant_totals', table_name='ledger')
+    op.create_index('ix_ledger_user_id', 'ledger', ['user_id'])
+    op.create_index('ix_ledger_merchant_id', 'ledger', ['merchant_id'])
+    op.create_index('ix_ledger_owner_asset', 'ledger', ['merchant_id', 'user_id', 'asset_code'])
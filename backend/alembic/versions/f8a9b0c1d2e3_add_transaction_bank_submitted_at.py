@@ -0,0 +1,31 @@
+"""add transactions.bank_submitted_at
+
+Set by the async settlement executor just before it calls the bank, so the
+resubmit sweeper can tell a transfer whose bank call was started from one whose
+queued job was lost.
+
+Revision ID: f8a9b0c1d2e3
+Revises: e7f8a9b0c1d2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f8a9b0c1d2e3'
+down_revision: Union[str, Sequence[str], None] = 'e7f8a9b0c1d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.add_column(sa.Column('bank_submitted_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('transactions') as batch_op:
+        batch_op.drop_column('bank_submitted_at')
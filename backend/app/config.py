@@ -7,7 +7,36 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Password hashing: bcrypt cost (existing hashes are upgraded on login) and
+    # the dedicated hashing pool; requests beyond workers + pending get a 429.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Authenticated-principal cache (per process), keyed by user id + token iat
+    AUTH_PRINCIPAL_CACHE_SIZE: int = 10000
+    AUTH_PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    # Build the principal from signed role/merchant claims with no DB lookup.
+    # Revocation (role change, password reset) is only seen by the instance
+    # that made it, so other instances honour old claims until tokens expire.
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False
     DATABASE_URL: str = "sqlite:///./local.db"
+    # Connection pools (Postgres). The sync engine holds up to DB_POOL_SIZE +
+    # DB_MAX_OVERFLOW connections and the asyncio engine (read endpoints) up to
+    # DB_ASYNC_POOL_SIZE + DB_ASYNC_MAX_OVERFLOW, so one instance peaks at the
+    # sum of all four (20 by default); that times the max instance count must
+    # stay under the server's max_connections.
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_ASYNC_POOL_SIZE: int = 2
+    DB_ASYNC_MAX_OVERFLOW: int = 3
+    DB_POOL_TIMEOUT_SECONDS: float = 10.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0      # 0 = server default
+    DB_APPLICATION_NAME: str = "payrails-backend"
+    # Behind PgBouncer in transaction-pooling mode: no client-side pool
+    # (NullPool) and no session-level startup options.
+    DB_PGBOUNCER: bool = False
     CORS_ORIGINS: str = "http://localhost:3000,http://localhost:8080,http://localhost:5000,http://localhost:8000,http://192.168.1.88:3000,http://192.168.1.88:8080,http://192.168.1.88:8000"
     ENCRYPTION_KEY: str = ""
     # Email via SMTP relay (Brevo or any provider)
@@ -21,19 +50,110 @@ class Settings(BaseSettings):
     # SMS via Brevo REST API
     BREVO_API_KEY: str = ""
     BREVO_SMS_SENDER: str = "PayRails"
+    # Notification outbox dispatcher (background thread; /tasks/notifications/* for schedulers)
+    NOTIFICATION_DISPATCHER_ENABLED: bool = True
+    NOTIFICATION_BATCH_SIZE: int = 50
+    NOTIFICATION_POLL_SECONDS: float = 2.0
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BASE_SECONDS: int = 30
+    NOTIFICATION_RETRY_MAX_SECONDS: int = 3600
     # Claude API (AI-generated transaction descriptions)
     ANTHROPIC_API_KEY: str = ""
+    # Description engine: provider auto|anthropic|stub ("auto" = anthropic when a key is set)
+    DESCRIPTION_PROVIDER: str = "auto"
+    DESCRIPTION_TIMEOUT_SECONDS: float = 3.0
+    DESCRIPTION_FAILURE_COOLDOWN_SECONDS: int = 60
+    DESCRIPTION_CACHE_SIZE: int = 2048
+    DESCRIPTION_CACHE_TTL_SECONDS: int = 86400
+    DESCRIPTION_ASYNC_FILL: bool = False          # save fallback text, enrich in the background
+    DESCRIPTION_PRECOMPUTE_TEMPLATES: bool = False  # warm per-merchant templates on startup
+    DESCRIPTION_TEMPLATE_REFRESH_SECONDS: int = 3600  # and re-warm them this often
     # Stablecoin partner integration (step 4 async processing)
     # Secret Manager names: payrails-stablecoin-webhook-secret / -worker-secret
     STABLECOIN_WEBHOOK_SECRET: str = ""   # HMAC secret for inbound partner webhooks
     STABLECOIN_WORKER_SECRET: str = ""    # shared secret guarding /tasks/* worker endpoints
+    # /tasks/settle: concurrent batched partner status calls, one DB transaction per
+    # page, and a per-run cap / time budget that fits the scheduler deadline.
+    SETTLEMENT_POLL_CONCURRENCY: int = 16
+    SETTLEMENT_POLL_BATCH_SIZE: int = 100
+    SETTLEMENT_POLL_MAX_TRANSFERS: int = 5000
+    SETTLEMENT_POLL_TIME_BUDGET_SECONDS: float = 150.0
+    # /tasks/reconcile: accounts per checkpointed chunk, concurrent partner
+    # balance batches, and the per-call time budget (resume with ?run_id=).
+    RECONCILIATION_BATCH_SIZE: int = 500
+    RECONCILIATION_CONCURRENCY: int = 8
+    RECONCILIATION_TIME_BUDGET_SECONDS: float = 150.0
+    # /tasks/exports: rows fetched per server-side cursor batch and written
+    # per streamed chunk.
+    EXPORT_BATCH_SIZE: int = 1000
+    # Idempotency keys on payment endpoints: completed responses cached per
+    # instance, how long a duplicate waits for the first request, and how long
+    # a reservation is held before a retry may take it over.
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_CACHE_TTL_SECONDS: int = 600
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0
+    IDEMPOTENCY_LOCK_SECONDS: int = 60
+    # Inbound webhooks: "inline" applies each event before responding; "queue"
+    # verifies, appends the raw event to webhook_inbox and acks, and the inbox
+    # worker drains it (in order per transfer/reference) on a thread pool.
+    WEBHOOK_INGEST_MODE: str = "inline"
+    WEBHOOK_INBOX_WORKERS: int = 4
+    WEBHOOK_INBOX_BATCH_SIZE: int = 200
+    WEBHOOK_INBOX_POLL_SECONDS: float = 1.0
+    WEBHOOK_INBOX_MAX_ATTEMPTS: int = 5
+    WEBHOOK_INBOX_LOCK_SECONDS: int = 120
     # KYT / blockchain-analytics provider (Secret Manager: payrails-kyt-api-key)
     KYT_API_KEY: str = ""
     KYT_BASE_URL: str = ""
-    # API rate limiting (per-instance, fixed window)
+    # API rate limiting. Backend "memory" is per-instance; "redis" shares limits
+    # across instances. Algorithm: sliding_window | token_bucket | fixed_window.
     RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memory"
+    RATE_LIMIT_ALGORITHM: str = "sliding_window"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
     RATE_LIMIT_MAX_REQUESTS: int = 120
     RATE_LIMIT_WINDOW_SECONDS: int = 60
+    # /auth/login, per client address
+    RATE_LIMIT_LOGIN_MAX_REQUESTS: int = 10
+    RATE_LIMIT_LOGIN_WINDOW_SECONDS: int = 60
+    # Ledger / event_logs monthly partitions (Postgres) and archival: months
+    # older than the hot window move to archive_snapshots.
+    LEDGER_HOT_MONTHS: int = 3
+    EVENT_LOG_HOT_MONTHS: int = 3
+    PARTITION_PREMAKE_MONTHS: int = 3
+    # Audit event log: "sync" commits each event on the caller's session;
+    # "async" (opt-in) buffers events and bulk-inserts them in the background,
+    # retrying failed writes with backoff up to EVENT_LOG_RETRY_MAX_SECONDS.
+    EVENT_LOG_MODE: str = "sync"
+    EVENT_LOG_BUFFER_SIZE: int = 10000
+    EVENT_LOG_BATCH_SIZE: int = 500
+    EVENT_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    EVENT_LOG_RETRY_MAX_SECONDS: float = 30.0
+    # Cache merchant display names used to enrich payment listings (per process)
+    MERCHANT_NAME_CACHE_ENABLED: bool = False
+    MERCHANT_NAME_CACHE_TTL_SECONDS: int = 300
+    MERCHANT_NAME_CACHE_SIZE: int = 10_000
+    # Bank settlement: when async, payments return as `processing` and a
+    # background pool calls the bank rail and finalizes them.
+    BANK_SETTLEMENT_ASYNC: bool = False
+    BANK_SETTLEMENT_WORKERS: int = 8
+    # /tasks/settlement/resubmit re-sends processing bank transfers that have
+    # no bank reference this long after submission (lost job, failed call).
+    BANK_SETTLEMENT_RESUBMIT_AFTER_SECONDS: int = 300
+    BANK_SETTLEMENT_RESUBMIT_BATCH_SIZE: int = 100
+    # Rail routing: active bank configs are compiled into a routing table that
+    # is rebuilt after a local change or every TTL. "priority" picks the first
+    # eligible rail in FedNow → RTP → ACH → Card order; "scored" picks the
+    # lowest cost_bps * COST_WEIGHT + observed_latency_ms * LATENCY_WEIGHT.
+    RAIL_ROUTING_CACHE_TTL_SECONDS: int = 60
+    RAIL_ROUTING_STRATEGY: str = "priority"
+    RAIL_ROUTING_COST_WEIGHT: float = 10.0
+    RAIL_ROUTING_LATENCY_WEIGHT: float = 1.0
+    # In-memory bank / stablecoin mocks: transfers, quotes and idempotency keys
+    # kept per store (LRU beyond the size, dropped after the TTL) so soak runs
+    # against the mocks stay flat in memory.
+    MOCK_PROVIDER_CACHE_SIZE: int = 100_000
+    MOCK_PROVIDER_CACHE_TTL_SECONDS: int = 86400
     # Seed demo stablecoin balances on startup (idempotent). Enabled in prod deploy.
     SEED_STABLECOIN_BALANCES: bool = False
 
@@ -1,17 +1,151 @@
-from sqlalchemy import create_engine
+"""Engine, session factory and connection-pool configuration.
+
+Engines get a QueuePool sized from the DB_* settings, with pre-ping (drops
+connections the server or a proxy closed while idle) and recycling. With
+DB_PGBOUNCER the pooling is left to PgBouncer: NullPool opens a connection per
+checkout from the local bouncer, and no startup options are sent since
+transaction pooling cannot honour session state (set statement_timeout on the
+database role instead). psycopg2 does not use server-side prepared statements,
+so nothing else needs disabling. In-memory SQLite keeps SQLAlchemy's default
+(single-connection) pool.
+
+Read-heavy endpoints use a second, asyncio engine on the same database
+(asyncpg / aiosqlite) through get_async_db, so they wait on the database
+without holding a threadpool worker. It has its own, smaller pool budget
+(DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW) that counts towards the
+per-instance connection total; in PgBouncer mode asyncpg's prepared-statement
+caches are turned off, since prepared statements do not survive transaction
+pooling.
+"""
+import threading
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool, QueuePool
 
 from app.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-    if "sqlite" in settings.DATABASE_URL
-    else {},
-)
+
+def engine_options(url: str) -> dict:
+    """create_engine keyword arguments for `url` from the DB_* settings."""
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+        if url in ("sqlite://", "sqlite:///:memory:"):
+            return {"connect_args": connect_args}
+    else:
+        connect_args = {}
+    postgres = url.startswith("postgresql")
+    if postgres:
+        connect_args["application_name"] = settings.DB_APPLICATION_NAME
+    if settings.DB_PGBOUNCER:
+        return {"poolclass": NullPool, "connect_args": connect_args}
+
+    if postgres and settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_use_lifo": True,  # let surplus connections idle out
+        "connect_args": connect_args,
+    }
+
+
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def async_database_url(url: str) -> str:
+    """The asyncio-driver equivalent of a sync DATABASE_URL."""
+    parsed = make_url(url)
+    parsed = parsed.set(drivername=_ASYNC_DRIVERS[parsed.get_backend_name()])
+    if settings.DB_PGBOUNCER and parsed.get_backend_name() == "postgresql":
+        parsed = parsed.update_query_dict({"prepared_statement_cache_size": "0"})
+    return parsed.render_as_string(hide_password=False)
+
+
+def async_engine_options(url: str) -> dict:
+    """create_async_engine keyword arguments: the sync options, adapted to asyncpg,
+    with the pool sized from DB_ASYNC_POOL_SIZE / DB_ASYNC_MAX_OVERFLOW."""
+    options = engine_options(url)
+    if "pool_size" in options:
+        options.update(pool_size=settings.DB_ASYNC_POOL_SIZE, max_overflow=settings.DB_ASYNC_MAX_OVERFLOW)
+    if not url.startswith("postgresql"):
+        return options
+    connect_args = options.pop("connect_args", {})
+    server_settings = {"application_name": connect_args["application_name"]}
+    if settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER:
+        server_settings["statement_timeout"] = str(settings.DB_STATEMENT_TIMEOUT_MS)
+    options["connect_args"] = {"server_settings": server_settings}
+    if settings.DB_PGBOUNCER:
+        options["connect_args"]["statement_cache_size"] = 0
+    return options
+
+
+class PoolMetrics:
+    """Counters for an engine's pool, fed by pool events."""
+
+    def __init__(self, engine: Engine, max_overflow: Optional[int] = None) -> None:
+        self._engine = engine
+        self._max_overflow = max_overflow
+        self._lock = threading.Lock()
+        self._counters = {"connects": 0, "checkouts": 0, "checkins": 0, "invalidations": 0}
+        self._checked_out = 0
+        self._peak_checked_out = 0
+        event.listen(engine, "connect", self._on("connects"))
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on("invalidations"))
+
+    def _on(self, counter: str):
+        def listener(*args):
+            with self._lock:
+                self._counters[counter] += 1
+        return listener
+
+    def _on_checkout(self, *args) -> None:
+        with self._lock:
+            self._counters["checkouts"] += 1
+            self._checked_out += 1
+            self._peak_checked_out = max(self._peak_checked_out, self._checked_out)
+
+    def _on_checkin(self, *args) -> None:
+        with self._lock:
+            self._counters["checkins"] += 1
+            self._checked_out = max(self._checked_out - 1, 0)
+
+    def snapshot(self) -> dict:
+        pool = self._engine.pool
+        with self._lock:
+            data = dict(self._counters)
+            data["checked_out"] = self._checked_out
+            data["peak_checked_out"] = self._peak_checked_out
+        data["pool_class"] = type(pool).__name__
+        if isinstance(pool, QueuePool):
+            data.update({
+                "pool_size": pool.size(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": self._max_overflow,
+            })
+        return data
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
+pool_metrics = PoolMetrics(engine, max_overflow=settings.DB_MAX_OVERFLOW)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL),
+                                   **async_engine_options(settings.DATABASE_URL))
+async_pool_metrics = PoolMetrics(async_engine.sync_engine, max_overflow=settings.DB_ASYNC_MAX_OVERFLOW)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -21,3 +155,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
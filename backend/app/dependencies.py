@@ -1,20 +1,26 @@
+import hashlib
+import json
 from functools import wraps
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.services import principal_cache
 from app.services.auth_service import decode_token
+from app.services.idempotency import IdempotentReplay, IdempotentRequest, idempotency_store
+from app.services.principal_cache import Principal
+from app.services.rate_limiter import rate_limiter
 from app.models.user import User
 
 security = HTTPBearer()
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
-    token = credentials.credentials
+def _token_claims(token: str) -> dict:
+    """Claims of a valid access token; 401 otherwise."""
     payload = decode_token(token)
     if payload is None:
         raise HTTPException(
@@ -24,23 +30,125 @@ def get_current_user(
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token type"
         )
-    user_id = payload.get("sub")
-    if user_id is None:
+    if payload.get("sub") is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload"
         )
-    user = db.query(User).filter(User.id == user_id).first()
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
-        )
-    return user
+    return payload
+
+
+def _user_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
+    )
+
+
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+) -> Principal:
+    """The caller as a Principal snapshot; hits the DB only on a cache miss."""
+    claims = _token_claims(credentials.credentials)
+    principal = principal_cache.lookup(claims)
+    if principal is None:
+        user = db.query(User).filter(User.id == claims["sub"]).first()
+        if user is None:
+            raise _user_not_found()
+        principal = principal_cache.remember(user, claims)
+    return principal
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    """get_current_user for async endpoints (AsyncSession, no threadpool worker)."""
+    claims = _token_claims(credentials.credentials)
+    principal = principal_cache.lookup(claims)
+    if principal is None:
+        user = await db.get(User, claims["sub"])
+        if user is None:
+            raise _user_not_found()
+        principal = principal_cache.remember(user, claims)
+    return principal
+
+
+def get_token_subject(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    """Authenticated user id from the signed token alone, without a DB lookup."""
+    return _token_claims(credentials.credentials)["sub"]
+
+
+def _enforce_rate_limit(key: str, max_requests: int, window_seconds: int) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    if not rate_limiter.allow(key, max_requests, window_seconds):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Rate limit exceeded",
+                            headers={"Retry-After": str(window_seconds)})
+
+
+def rate_limit(request: Request, user_id: str = Depends(get_token_subject)) -> None:
+    """Per-user, per-route rate limit (config-driven).
+
+    Keyed on the signed token's subject, so it costs no DB round trip and runs
+    the same in front of sync and async endpoints.
+    """
+    _enforce_rate_limit(f"{user_id}:{request.url.path}",
+                        settings.RATE_LIMIT_MAX_REQUESTS, settings.RATE_LIMIT_WINDOW_SECONDS)
+
+
+def login_rate_limit(request: Request) -> None:
+    """Per-client-address limit on credential checks, ahead of any bcrypt work."""
+    client = request.client.host if request.client else "unknown"
+    _enforce_rate_limit(f"login:{client}",
+                        settings.RATE_LIMIT_LOGIN_MAX_REQUESTS, settings.RATE_LIMIT_LOGIN_WINDOW_SECONDS)
+
+
+async def idempotency(request: Request, owner: str = Depends(get_token_subject),
+                      db: Session = Depends(get_db)):
+    """Idempotency for endpoints whose JSON body carries `idempotency_key`.
+
+    A retry of a completed request is answered with the stored response
+    before the endpoint runs; a duplicate of one still running waits for it.
+    The endpoint returns `idem.save(result)` to have its response stored.
+    Key rows are written on a session of their own, so reserving, completing
+    or releasing a key never commits or rolls back the endpoint's `db`.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    key = body.get("idempotency_key") if isinstance(body, dict) else None
+    route = request.scope.get("route")
+    handle = IdempotentRequest(None, "", getattr(route, "status_code", None) or status.HTTP_200_OK)
+    if not key:
+        yield handle
+        return
+
+    handle.scope = (owner, f"{request.method} {getattr(route, 'path', request.url.path)}", str(key))
+    handle.request_hash = hashlib.sha256(
+        json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+    key_db = Session(bind=db.get_bind())
+    try:
+        stored = await run_in_threadpool(idempotency_store.reserve, key_db, handle.scope, handle.request_hash)
+        if stored is not None:
+            raise IdempotentReplay(stored)
+        try:
+            yield handle
+        finally:
+            if handle.saved:
+                await run_in_threadpool(idempotency_store.complete, key_db, handle.scope, handle.request_hash,
+                                        handle.status_code, handle.response)
+            else:
+                await run_in_threadpool(idempotency_store.release, key_db, handle.scope)
+    finally:
+        key_db.close()
 
 
 def require_role(*roles):
     def decorator(func):
         @wraps(func)
-        async def wrapper(*args, current_user: User = Depends(get_current_user), **kwargs):
+        async def wrapper(*args, current_user: Principal = Depends(get_current_user), **kwargs):
             if current_user.role not in roles:
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
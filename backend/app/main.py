@@ -1,12 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.config import settings
 from app.database import SessionLocal
 from app.models import *  # noqa: F401,F403 — register all models
 from app.routers import auth, payments, merchants, webhooks, consumer, wallet_transfer
-from app.routers import stablecoin_webhooks, stablecoin_worker, stablecoin_api
+from app.routers import stablecoin_webhooks, stablecoin_worker, stablecoin_api, notification_worker, db_metrics
+from app.routers import archive_worker, compliance_exports, settlement_worker, webhook_worker
 from app.routers.merchants import banks_router
+from app.services.auth_service import PasswordHasherBusy, password_hasher
+from app.services.idempotency import IdempotencyConflict, IdempotencyInProgress, IdempotentReplay
 
 app = FastAPI(title="PayRails Backend")
 
@@ -30,12 +34,79 @@ app.include_router(wallet_transfer.router)
 app.include_router(stablecoin_webhooks.router)
 app.include_router(stablecoin_worker.router)
 app.include_router(stablecoin_api.router)
+app.include_router(notification_worker.router)
+app.include_router(db_metrics.router)
+app.include_router(archive_worker.router)
+app.include_router(compliance_exports.router)
+app.include_router(webhook_worker.router)
+app.include_router(settlement_worker.router)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many concurrent sign-in attempts; retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay(request: Request, exc: IdempotentReplay):
+    return JSONResponse(status_code=exc.response.status_code, content=exc.response.body,
+                        headers={"Idempotent-Replayed": "true"})
+
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict(request: Request, exc: IdempotencyConflict):
+    return JSONResponse(status_code=422,
+                        content={"detail": "Idempotency key was already used with a different request"})
+
+
+@app.exception_handler(IdempotencyInProgress)
+async def idempotency_in_progress(request: Request, exc: IdempotencyInProgress):
+    return JSONResponse(status_code=409,
+                        content={"detail": "A request with this idempotency key is still in progress"},
+                        headers={"Retry-After": "1"})
 
 
 @app.on_event("startup")
 def on_startup():
     _seed_default_bank_config()
     _seed_stablecoin_balances_if_enabled()
+    _ensure_partitions()
+    if settings.NOTIFICATION_DISPATCHER_ENABLED:
+        from app.services.notification_service import dispatcher
+
+        dispatcher.start()
+    if settings.WEBHOOK_INGEST_MODE == "queue":
+        from app.services.webhook_inbox import inbox_worker
+
+        inbox_worker.start()
+    if settings.DESCRIPTION_PRECOMPUTE_TEMPLATES:
+        from app.services.description_service import refresh_templates_in_background
+
+        refresh_templates_in_background()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    from app.services.settlement_service import settlement_executor
+
+    settlement_executor.shutdown(wait=True)
+    from app.services.notification_service import dispatcher
+
+    dispatcher.stop()
+    from app.services.webhook_inbox import inbox_worker
+
+    inbox_worker.stop()
+    from app.services.description_service import description_engine
+
+    description_engine.shutdown(wait=False)
+    from app.services.event_service import event_sink
+
+    event_sink.stop()  # flush buffered audit events
+    password_hasher.shutdown(wait=False)
 
 
 def _seed_stablecoin_balances_if_enabled():
@@ -57,6 +128,25 @@ def _seed_stablecoin_balances_if_enabled():
         db.close()
 
 
+def _ensure_partitions():
+    """Make sure this month's ledger/event_logs partitions exist (Postgres only)."""
+    import logging
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from app.services.ledger_archive import ensure_partitions
+
+    db = SessionLocal()
+    try:
+        ensure_partitions(db)
+    except SQLAlchemyError as exc:
+        # Not migrated to partitioned tables yet, or another instance is
+        # creating the same partition; the scheduled job will catch up.
+        db.rollback()
+        logging.getLogger("payrails").warning("Skipping partition maintenance: %s", exc)
+    finally:
+        db.close()
+
+
 def _seed_default_bank_config():
     import logging
     from decimal import Decimal
@@ -3,6 +3,7 @@ from app.models.merchant import Merchant
 from app.models.transaction import Transaction
 from app.models.bank_account import BankAccount
 from app.models.ledger import Ledger
+from app.models.balance import Balance
 from app.models.bank_config import BankConfig
 from app.models.event_log import EventLog
 from app.models.asset import Asset
@@ -11,6 +12,11 @@ from app.models.crypto_account import CryptoAccount
 from app.models.kyc_record import KycRecord
 from app.models.sanctions_screening import SanctionsScreening
 from app.models.webhook_event import WebhookEvent
+from app.models.notification_outbox import NotificationOutbox
+from app.models.archive_snapshot import ArchiveSnapshot
+from app.models.reconciliation import ReconciliationRun, ReconciliationDrift
+from app.models.idempotency_key import IdempotencyKey
+from app.models.webhook_inbox import WebhookInbox
 
 __all__ = [
     "User",
@@ -18,6 +24,7 @@ __all__ = [
     "Transaction",
     "BankAccount",
     "Ledger",
+    "Balance",
     "BankConfig",
     "EventLog",
     "Asset",
@@ -26,4 +33,10 @@ __all__ = [
     "KycRecord",
     "SanctionsScreening",
     "WebhookEvent",
+    "NotificationOutbox",
+    "ArchiveSnapshot",
+    "ReconciliationRun",
+    "ReconciliationDrift",
+    "IdempotencyKey",
+    "WebhookInbox",
 ]
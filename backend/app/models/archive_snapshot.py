@@ -0,0 +1,27 @@
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, LargeBinary, UniqueConstraint, func
+from app.database import Base
+
+
+class ArchiveSnapshot(Base):
+    """One closed month of an append-only table, compressed and removed from the live table.
+
+    `payload` is zlib-compressed JSON lines of the archived rows; `checksum` is
+    the SHA-256 of the uncompressed bytes. Written by ledger_archive.
+    """
+
+    __tablename__ = "archive_snapshots"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    table_name = Column(String, nullable=False)     # ledger | event_logs
+    period_start = Column(DateTime, nullable=False)  # inclusive, naive UTC
+    period_end = Column(DateTime, nullable=False)    # exclusive
+    row_count = Column(Integer, nullable=False)
+    opening_entries = Column(Integer, nullable=False, default=0, server_default="0")
+    payload = Column(LargeBinary, nullable=False)
+    checksum = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("table_name", "period_start", name="uq_archive_snapshots_table_period"),
+    )
@@ -0,0 +1,35 @@
+import uuid
+from sqlalchemy import Column, String, Numeric, Integer, DateTime, ForeignKey, UniqueConstraint, func
+from app.database import Base
+
+
+class Balance(Base):
+    """Materialized running balance per (owner, asset).
+
+    Maintained in the same DB transaction as every Ledger insert so balance
+    reads are a single-row lookup instead of a SUM over the owner's history.
+    The ledger stays the source of truth; see balance_service.rebuild_balances.
+    """
+
+    __tablename__ = "balances"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner_type = Column(String, nullable=False)  # merchant | user
+    owner_id = Column(String, nullable=False)
+    asset_code = Column(
+        String, ForeignKey("assets.code"),
+        nullable=False, default="USD", server_default="USD",
+    )
+    # Integer minor units (amount x 10^asset.decimals), same scale as
+    # Ledger.amount_base_units.
+    balance_base_units = Column(Numeric(38, 0), nullable=False, default=0, server_default="0")
+    # Optimistic-concurrency counter: every UPDATE is conditioned on the version
+    # read, so a concurrent writer that slipped past the row lock (e.g. SQLite,
+    # which ignores FOR UPDATE) fails instead of silently losing an update.
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("owner_type", "owner_id", "asset_code", name="uq_balance_owner_asset"),
+    )
+    __mapper_args__ = {"version_id_col": version}
@@ -11,4 +11,5 @@ class EventLog(Base):
     source = Column(String, nullable=False)
     payload = Column(Text, nullable=True)  # JSON string
     reference_id = Column(String, nullable=True, index=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Partition key on Postgres (monthly range partitions); see ledger_archive.
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
@@ -0,0 +1,30 @@
+import uuid
+from sqlalchemy import Column, String, Integer, Text, DateTime, UniqueConstraint, func
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client idempotency key reserved by one caller on one endpoint.
+
+    "in_progress" while the first request runs (held until `locked_until`,
+    after which a retry may take it over); "completed" once its response is
+    stored, after which retries are answered from `response_body`.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    owner = Column(String, nullable=False)        # token subject
+    endpoint = Column(String, nullable=False)     # e.g. "POST /payments"
+    key = Column(String, nullable=False)
+    request_hash = Column(String, nullable=False)  # SHA-256 of the canonical JSON body
+    status = Column(String, nullable=False, default="in_progress")  # in_progress | completed
+    response_status = Column(Integer, nullable=True)
+    response_body = Column(Text, nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # naive UTC
+    created_at = Column(DateTime, server_default=func.now())
+    completed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("owner", "endpoint", "key", name="uq_idempotency_keys_owner_endpoint_key"),
+    )
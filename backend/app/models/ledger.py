@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, func
+from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Index, func
 from app.database import Base
 
 
@@ -7,15 +7,16 @@ class Ledger(Base):
     __tablename__ = "ledger"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    merchant_id = Column(String, ForeignKey("merchants.id"), nullable=True, index=True)
-    user_id = Column(String, ForeignKey("users.id"), nullable=True, index=True)
-    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=True)
+    merchant_id = Column(String, ForeignKey("merchants.id"), nullable=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    transaction_id = Column(String, ForeignKey("transactions.id"), nullable=True, index=True)
     entry_type = Column(String, nullable=False)  # debit, credit
     # Legacy USD-only Decimal columns (nullable: stablecoin entries use base units).
     amount = Column(Numeric(12, 2), nullable=True)
     balance_after = Column(Numeric(12, 2), nullable=True)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Partition key on Postgres (monthly range partitions); see ledger_archive.
+    created_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
 
     # --- multi-asset / stablecoin scaffolding (not yet wired into ledger logic) ---
     # Balances are per (owner, asset_code); base-unit columns store integer minor
@@ -26,3 +27,14 @@ class Ledger(Base):
     )
     amount_base_units = Column(Numeric(38, 0), nullable=True)
     balance_after_base_units = Column(Numeric(38, 0), nullable=True)
+
+    # Covering indexes for per-owner totals (balance_service.ledger_totals):
+    # every column the grouped SUM reads is in the index, so it is an
+    # index-only scan in (owner, asset) order. They also serve plain
+    # owner lookups.
+    __table_args__ = (
+        Index("ix_ledger_merchant_totals", "merchant_id", "asset_code", "entry_type",
+              "amount", "amount_base_units"),
+        Index("ix_ledger_user_totals", "user_id", "asset_code", "entry_type",
+              "amount", "amount_base_units"),
+    )
@@ -0,0 +1,30 @@
+import uuid
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index, func
+from app.database import Base
+
+
+class NotificationOutbox(Base):
+    """Pending email/SMS notifications, written in the request and sent by the dispatcher.
+
+    Rows are rendered at enqueue time so the dispatcher needs no access to the
+    originating transaction. `next_attempt_at` drives retry backoff.
+    """
+
+    __tablename__ = "notification_outbox"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    channel = Column(String, nullable=False)        # email | sms
+    recipient = Column(String, nullable=False)      # email address | E.164 phone
+    subject = Column(String, nullable=True)         # email only
+    body = Column(Text, nullable=False)             # HTML for email, plain text for SMS
+    transaction_id = Column(String, nullable=True, index=True)
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # pending|sent|dead
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, server_default=func.now())  # naive UTC
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_notification_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
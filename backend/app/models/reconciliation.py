@@ -0,0 +1,45 @@
+import uuid
+from sqlalchemy import Column, String, Integer, Numeric, DateTime, ForeignKey, func
+from app.database import Base
+
+
+class ReconciliationRun(Base):
+    """One pass of the ledger-vs-partner reconciliation engine.
+
+    `cursor` is the last crypto_accounts.id checkpointed; a run left "running"
+    (time budget spent) resumes after it. An incremental run only looks at
+    owners with activity since `baseline_run_id` (the last clean run) started.
+    """
+
+    __tablename__ = "reconciliation_runs"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    mode = Column(String, nullable=False, default="full")          # full | incremental
+    status = Column(String, nullable=False, default="running")     # running | completed
+    baseline_run_id = Column(String, ForeignKey("reconciliation_runs.id"), nullable=True)
+    cursor = Column(String, nullable=True)
+    accounts_checked = Column(Integer, nullable=False, default=0, server_default="0")
+    drifted = Column(Integer, nullable=False, default=0, server_default="0")
+    errors = Column(Integer, nullable=False, default=0, server_default="0")
+    started_at = Column(DateTime, server_default=func.now(), index=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class ReconciliationDrift(Base):
+    """A crypto account whose internal balance did not match the partner's,
+    or whose partner balance could not be fetched (`error` set)."""
+
+    __tablename__ = "reconciliation_drifts"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    run_id = Column(String, ForeignKey("reconciliation_runs.id"), nullable=False, index=True)
+    crypto_account_id = Column(String, ForeignKey("crypto_accounts.id"), nullable=False)
+    user_id = Column(String, nullable=True)
+    merchant_id = Column(String, nullable=True)
+    asset_code = Column(String, ForeignKey("assets.code"), nullable=False)
+    partner_account_id = Column(String, nullable=False)
+    internal_balance = Column(Numeric(38, 18), nullable=False)
+    external_balance = Column(Numeric(38, 18), nullable=True)
+    drift = Column(Numeric(38, 18), nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
@@ -1,8 +1,13 @@
 import uuid
-from sqlalchemy import Column, String, Numeric, Integer, DateTime, ForeignKey, func
+from datetime import datetime, timezone
+from sqlalchemy import Column, String, Numeric, Integer, DateTime, ForeignKey, Index, func, text
 from app.database import Base
 
 
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
 
@@ -18,10 +23,14 @@ class Transaction(Base):
     rail = Column(String, nullable=True)  # fednow, rtp, ach, card
     status = Column(String, default="pending")  # pending, processing, completed, failed, cancelled
     idempotency_key = Column(String, unique=True, nullable=False, index=True)
-    reference_id = Column(String, nullable=True)
+    reference_id = Column(String, nullable=True, index=True)  # bank webhook lookup
+    bank_submitted_at = Column(DateTime, nullable=True)  # async executor took the bank call (naive UTC)
     failure_reason = Column(String, nullable=True)
     description = Column(String, nullable=True)
-    created_at = Column(DateTime, server_default=func.now())
+    # Set by the ORM so every row is stored in one format with microseconds
+    # (SQLite's CURRENT_TIMESTAMP text has no fraction and ties per second);
+    # keyset pagination compares and orders on the raw column.
+    created_at = Column(DateTime, default=_utcnow, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     # --- stablecoin / on-chain settlement scaffolding (not yet wired into logic) ---
@@ -40,3 +49,29 @@ class Transaction(Base):
     partner = Column(String, nullable=True)              # 'zerohash'
     partner_transfer_id = Column(String, nullable=True, index=True)
     direction = Column(String, nullable=True)            # onramp|offramp|send|deposit|withdrawal
+
+    # Back keyset pagination of per-party history on (created_at, id).
+    __table_args__ = (
+        Index("ix_transactions_sender_merchant_created", "sender_merchant_id", "created_at"),
+        Index("ix_transactions_receiver_merchant_created", "receiver_merchant_id", "created_at"),
+        Index("ix_transactions_sender_user_created", "sender_user_id", "created_at"),
+        Index("ix_transactions_receiver_user_created", "receiver_user_id", "created_at"),
+        # Compliance exports stream on-chain transactions in (created_at, id)
+        # order straight off this partial index, without sorting the whole
+        # set first.
+        Index("ix_transactions_onchain_created", "created_at", "id",
+              postgresql_where=text("settlement_type = 'onchain'"),
+              sqlite_where=text("settlement_type = 'onchain'")),
+        # Partial index of on-chain transfers the settlement poller still has
+        # to chase. Postgres keeps only the pending statuses in it; SQLite
+        # cannot match an IN-list predicate against bound parameters, so there
+        # the status is the leading key instead.
+        Index(
+            "ix_transactions_onchain_pending", "onchain_status", "created_at",
+            postgresql_where=text(
+                "settlement_type = 'onchain' AND onchain_status IN ('submitted', 'confirming') "
+                "AND partner_transfer_id IS NOT NULL"
+            ),
+            sqlite_where=text("settlement_type = 'onchain' AND partner_transfer_id IS NOT NULL"),
+        ),
+    )
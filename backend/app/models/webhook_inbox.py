@@ -0,0 +1,35 @@
+import uuid
+from sqlalchemy import Column, String, Integer, Text, DateTime, Index
+from app.database import Base
+
+
+class WebhookInbox(Base):
+    """Raw inbound webhooks accepted in queue mode, drained by the inbox worker.
+
+    One insert per delivery; a redelivered `event_id` is dropped by the unique
+    constraint. Rows sharing an `ordering_key` (the partner transfer / bank
+    reference they touch) are applied strictly in `received_at` order, which is
+    set in Python so it carries microseconds on every backend.
+    """
+
+    __tablename__ = "webhook_inbox"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    provider = Column(String, nullable=False)       # stablecoin | bank
+    event_id = Column(String, nullable=False, unique=True)
+    event_type = Column(String, nullable=True)
+    ordering_key = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)          # raw JSON body
+    status = Column(String, nullable=False, default="pending", server_default="pending")  # pending|processing|processed|dead
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    claim_id = Column(String, nullable=True)        # drain pass holding the row while processing
+    locked_until = Column(DateTime, nullable=True)  # naive UTC; a stale claim is retaken after this
+    outcome = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    received_at = Column(DateTime, nullable=False)  # naive UTC
+    processed_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_webhook_inbox_status_received", "status", "received_at"),
+        Index("ix_webhook_inbox_ordering_key", "ordering_key", "received_at"),
+    )
@@ -0,0 +1,23 @@
+"""Worker endpoints for ledger/event_logs partition upkeep and archival.
+
+Meant for a monthly scheduler (and a daily partition top-up). Guarded by the
+same X-Worker-Secret as the other /tasks/* endpoints.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.routers.stablecoin_worker import require_worker_secret
+from app.services.ledger_archive import archive_closed_periods, ensure_partitions
+
+router = APIRouter(prefix="/tasks/archive", tags=["archive-worker"])
+
+
+@router.post("/partitions", dependencies=[Depends(require_worker_secret)])
+def partitions(db: Session = Depends(get_db)):
+    return {"partitions": ensure_partitions(db)}
+
+
+@router.post("/run", dependencies=[Depends(require_worker_secret)])
+def run(db: Session = Depends(get_db)):
+    return {"archived": archive_closed_periods(db)}
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.dependencies import get_current_user
+from app.database import get_async_db, get_db
+from app.dependencies import get_current_user, get_current_user_async, login_rate_limit
 from app.models.merchant import Merchant
 from app.models.user import User
 from app.schemas.user import (
@@ -12,12 +14,14 @@ from app.schemas.user import (
 )
 from app.services.auth_service import (
     hash_password,
-    verify_password,
+    needs_rehash,
+    password_hasher,
     create_access_token,
     create_refresh_token,
     create_reset_token,
     decode_token,
 )
+from app.services.principal_cache import Principal, invalidate_principal
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -29,6 +33,8 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="Email already registered"
         )
+    # Hash before the first write so bcrypt never runs inside the transaction.
+    hashed_password = hash_password(payload.password)
     # Create a linked merchant record for the consumer so they can manage bank accounts
     local_part = payload.email.split("@")[0]
     merchant = Merchant(
@@ -41,7 +47,7 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
     db.flush()  # get merchant.id before commit
     user = User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed_password,
         role=payload.role,
         merchant_id=merchant.id,
     )
@@ -61,6 +67,7 @@ def register_merchant(payload: MerchantRegisterPayload, db: Session = Depends(ge
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT, detail="EIN already registered"
         )
+    hashed_password = hash_password(payload.password)
     merchant = Merchant(
         name=payload.business_name,
         ein=payload.ein,
@@ -72,7 +79,7 @@ def register_merchant(payload: MerchantRegisterPayload, db: Session = Depends(ge
     db.flush()
     user = User(
         email=payload.email,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed_password,
         role="merchant_admin",
         merchant_id=merchant.id,
     )
@@ -82,14 +89,19 @@ def register_merchant(payload: MerchantRegisterPayload, db: Session = Depends(ge
     return user
 
 
-@router.post("/login", response_model=TokenResponse)
-def login(payload: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.hashed_password):
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(login_rate_limit)])
+async def login(payload: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(select(User).where(User.email == payload.email))).scalar_one_or_none()
+    if not user or not await password_hasher.verify_async(payload.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
-    token_data = {"sub": user.id, "email": user.email, "role": user.role}
+    if needs_rehash(user.hashed_password):
+        # BCRYPT_ROUNDS changed since this hash was made; upgrade it while we
+        # have the plaintext.
+        user.hashed_password = await password_hasher.hash_async(payload.password)
+        await db.commit()
+    token_data = {"sub": user.id, "email": user.email, "role": user.role, "merchant_id": user.merchant_id}
     return TokenResponse(
         access_token=create_access_token(token_data),
         refresh_token=create_refresh_token(token_data),
@@ -109,7 +121,7 @@ def refresh(refresh_token: str, db: Session = Depends(get_db)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found"
         )
-    token_data = {"sub": user.id, "email": user.email, "role": user.role}
+    token_data = {"sub": user.id, "email": user.email, "role": user.role, "merchant_id": user.merchant_id}
     return TokenResponse(
         access_token=create_access_token(token_data),
         refresh_token=create_refresh_token(token_data),
@@ -150,33 +162,44 @@ def confirm_password_reset(payload: PasswordResetConfirm, db: Session = Depends(
         )
     user.hashed_password = hash_password(payload.new_password)
     db.commit()
+    invalidate_principal(user.id)
     return {"message": "Password reset successfully"}
 
 
 @router.get("/me", response_model=UserResponse)
-def me(current_user: User = Depends(get_current_user)):
-    return current_user
+async def me(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    user = await db.get(User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return user
 
 
 @router.patch("/me", response_model=UserResponse)
 def update_me(
     payload: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     if payload.email is not None:
         new_email = payload.email.strip().lower()
-        if new_email and new_email != current_user.email:
-            taken = db.query(User).filter(User.email == new_email, User.id != current_user.id).first()
+        if new_email and new_email != user.email:
+            taken = db.query(User).filter(User.email == new_email, User.id != user.id).first()
             if taken:
                 raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email already in use")
-            current_user.email = new_email
+            user.email = new_email
     if payload.phone is not None:
-        current_user.phone = payload.phone.strip() or None
+        user.phone = payload.phone.strip() or None
     if payload.first_name is not None:
-        current_user.first_name = payload.first_name.strip() or None
+        user.first_name = payload.first_name.strip() or None
     if payload.last_name is not None:
-        current_user.last_name = payload.last_name.strip() or None
+        user.last_name = payload.last_name.strip() or None
     db.commit()
-    db.refresh(current_user)
-    return current_user
+    db.refresh(user)
+    invalidate_principal(user.id)
+    return user
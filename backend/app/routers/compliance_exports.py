@@ -0,0 +1,56 @@
+"""Streaming compliance exports (on-chain audit trail, CTR, screening).
+
+Rows are read through a server-side cursor and written as CSV or NDJSON while
+they are fetched, so exports of any size run in constant memory. Guarded by
+the same X-Worker-Secret as the other /tasks/* endpoints.
+"""
+from decimal import Decimal
+from typing import Iterator, List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.routers.stablecoin_worker import require_worker_secret
+from app.services.reporting_service import (
+    AUDIT_TRAIL_FIELDS,
+    CTR_THRESHOLD,
+    SCREENING_FIELDS,
+    csv_lines,
+    iter_ctr_report,
+    iter_onchain_audit_trail,
+    iter_screening_report,
+    ndjson_lines,
+)
+
+router = APIRouter(prefix="/tasks/exports", tags=["compliance-exports"])
+
+ExportFormat = Literal["csv", "ndjson"]
+_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _export(rows: Iterator[dict], fields: List[str], fmt: str, name: str) -> StreamingResponse:
+    body = csv_lines(rows, fields) if fmt == "csv" else ndjson_lines(rows)
+    return StreamingResponse(
+        body, media_type=_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@router.get("/onchain-audit-trail", dependencies=[Depends(require_worker_secret)])
+def export_onchain_audit_trail(format: ExportFormat = "csv", asset_code: Optional[str] = None,
+                               db: Session = Depends(get_db)):
+    return _export(iter_onchain_audit_trail(db, asset_code), AUDIT_TRAIL_FIELDS, format, "onchain_audit_trail")
+
+
+@router.get("/ctr", dependencies=[Depends(require_worker_secret)])
+def export_ctr_report(format: ExportFormat = "csv", threshold: Decimal = Query(CTR_THRESHOLD, gt=0),
+                      db: Session = Depends(get_db)):
+    return _export(iter_ctr_report(db, threshold), AUDIT_TRAIL_FIELDS, format, "ctr_report")
+
+
+@router.get("/screening", dependencies=[Depends(require_worker_secret)])
+def export_screening_report(format: ExportFormat = "csv", include_pass: bool = False,
+                            db: Session = Depends(get_db)):
+    return _export(iter_screening_report(db, include_pass), SCREENING_FIELDS, format, "screening_report")
@@ -2,21 +2,23 @@ import uuid as _uuid
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from decimal import Decimal
 from typing import Optional
 
-from app.database import get_db
-from app.dependencies import get_current_user
+from app.database import get_async_db, get_db
+from app.dependencies import get_current_user, get_current_user_async, idempotency, rate_limit
 from app.models.bank_account import BankAccount
 from app.models.transaction import Transaction
 from app.models.user import User
+from app.services.idempotency import IdempotentRequest
+from app.services.principal_cache import Principal
 from app.schemas.ledger import WalletBalanceResponse
 from app.services.consumer_payment_service import consumer_pay
 from app.services.wallet_service import get_wallet_balance, wallet_credit
-from app.services.event_service import log_event
-from app.services.bank.mock_bank import mock_bank_service
 from app.services.bank.schemas import TransferRequest
+from app.services.settlement_service import submit_transfer
 
 router = APIRouter(tags=["consumer"])
 
@@ -29,11 +31,12 @@ class ConsumerPayRequest(BaseModel):
     preferred_rail: Optional[str] = None
 
 
-@router.post("/consumer/pay")
+@router.post("/consumer/pay", dependencies=[Depends(rate_limit)])
 def consumer_pay_endpoint(
     payload: ConsumerPayRequest,
+    idem: IdempotentRequest = Depends(idempotency),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if current_user.role != "user":
         raise HTTPException(
@@ -41,7 +44,7 @@ def consumer_pay_endpoint(
             detail="Only consumers can make wallet payments",
         )
     try:
-        return consumer_pay(
+        return idem.save(consumer_pay(
             db,
             current_user.id,
             merchant_id=payload.merchant_id,
@@ -49,17 +52,17 @@ def consumer_pay_endpoint(
             idempotency_key=payload.idempotency_key,
             description=payload.description,
             preferred_rail=payload.preferred_rail,
-        )
+        ))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/consumer/wallet/balance", response_model=WalletBalanceResponse)
-def get_consumer_balance(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+async def get_consumer_balance(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
 ):
-    balance = get_wallet_balance(db, current_user.id)
+    balance = await db.run_sync(get_wallet_balance, current_user.id)
     return WalletBalanceResponse(user_id=current_user.id, balance=balance)
 
 
@@ -67,7 +70,7 @@ def get_consumer_balance(
 def get_consumer_user_info(
     user_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Look up a consumer user by ID — used by the pay flow to handle user IDs as payment targets."""
     user = db.query(User).filter(User.id == user_id, User.role == "user").first()
@@ -80,7 +83,7 @@ def get_consumer_user_info(
 def topup_wallet(
     amount: Decimal,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Internal/test endpoint — credits wallet directly with no funding source."""
     if amount <= 0:
@@ -102,7 +105,7 @@ class WalletFundResponse(BaseModel):
     user_id: str
     balance: Decimal
     transaction_status: str
-    reference_id: str
+    reference_id: Optional[str] = None  # None until the bank accepts (async mode)
     failure_reason: Optional[str] = None
 
 
@@ -110,7 +113,7 @@ class WalletFundResponse(BaseModel):
 def fund_wallet(
     payload: WalletFundRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     """Fund wallet by initiating a mock ACH pull from a verified bank account."""
     if current_user.role != "user":
@@ -142,53 +145,37 @@ def fund_wallet(
 
     idempotency_key = str(_uuid.uuid4())
 
-    # Initiate ACH pull via mock bank
-    transfer_request = TransferRequest(
-        sender_account_id=account.id,
-        receiver_account_id="payrails-platform",
-        amount=payload.amount,
-        rail="ach",
-        idempotency_key=idempotency_key,
-        memo="Wallet funding",
-    )
-    result = mock_bank_service.initiate_ach(transfer_request)
-
-    # Record transaction for audit trail
+    # Record the transaction as processing; settlement credits the wallet
     txn = Transaction(
         sender_user_id=current_user.id,
         sender_bank_account_id=account.id,
         amount=payload.amount,
         currency="USD",
         rail="ach",
-        status=result.status,
+        status="processing",
         idempotency_key=idempotency_key,
-        reference_id=result.reference_id,
-        failure_reason=result.failure_reason,
         description="Wallet funded via ACH",
     )
     db.add(txn)
     db.commit()
     db.refresh(txn)
 
-    if result.status == "completed":
-        wallet_credit(
-            db, current_user.id, payload.amount, txn.id,
-            description=f"Wallet funded via ACH from {account.bank_name or account.routing_number}",
-        )
-        log_event(db, "wallet.funded", "consumer_router", txn.id, {
-            "amount": str(payload.amount),
-            "bank_account_id": account.id,
-        })
-    else:
-        log_event(db, "wallet.fund_failed", "consumer_router", txn.id, {
-            "reason": result.failure_reason,
-        })
+    # Initiate ACH pull via the bank (inline, or in the background in async mode)
+    transfer_request = TransferRequest(
+        sender_account_id=account.id,
+        receiver_account_id="payrails-platform",
+        amount=payload.amount,
+        rail="ach",
+        idempotency_key=idempotency_key,
+        memo="Wallet funding",
+    )
+    txn = submit_transfer(db, txn, transfer_request)
 
     balance = get_wallet_balance(db, current_user.id)
     return WalletFundResponse(
         user_id=current_user.id,
         balance=balance,
-        transaction_status=result.status,
-        reference_id=result.reference_id,
-        failure_reason=result.failure_reason,
+        transaction_status=txn.status,
+        reference_id=txn.reference_id,
+        failure_reason=txn.failure_reason,
     )
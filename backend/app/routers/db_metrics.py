@@ -0,0 +1,15 @@
+"""Connection-pool metrics for operators and autoscaling dashboards.
+
+Guarded by the same X-Worker-Secret as the other /tasks/* endpoints.
+"""
+from fastapi import APIRouter, Depends
+
+from app.database import async_pool_metrics, pool_metrics
+from app.routers.stablecoin_worker import require_worker_secret
+
+router = APIRouter(prefix="/tasks/db", tags=["db-metrics"])
+
+
+@router.get("/pool", dependencies=[Depends(require_worker_secret)])
+def pool():
+    return {**pool_metrics.snapshot(), "async": async_pool_metrics.snapshot()}
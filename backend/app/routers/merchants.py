@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.dependencies import get_current_user
-from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.bank_account import BankAccount
 from app.models.bank_config import BankConfig
 from app.schemas.merchant import MerchantCreate, MerchantUpdate, MerchantResponse, KYBSubmit
@@ -49,7 +49,7 @@ router = APIRouter(prefix="/merchants", tags=["merchants"])
 def create_merchant_endpoint(
     payload: MerchantCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     return create_merchant(db, payload)
 
@@ -58,7 +58,7 @@ def create_merchant_endpoint(
 def get_merchant_status(
     merchant_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     result = get_merchant(db, merchant_id)
     if not result:
@@ -71,7 +71,7 @@ def update_merchant_endpoint(
     merchant_id: str,
     payload: MerchantUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     result = update_merchant(db, merchant_id, payload)
     if not result:
@@ -84,7 +84,7 @@ def submit_kyb_endpoint(
     merchant_id: str,
     payload: KYBSubmit,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     try:
         return submit_kyb(db, merchant_id, payload)
@@ -97,7 +97,7 @@ def add_bank_account(
     merchant_id: str,
     payload: BankAccountCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if not validate_routing_number(payload.routing_number):
         raise HTTPException(
@@ -146,7 +146,7 @@ def add_bank_account(
 def list_bank_accounts(
     merchant_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     accounts = db.query(BankAccount).filter(BankAccount.merchant_id == merchant_id).all()
     result = []
@@ -177,7 +177,7 @@ def verify_micro_deposits_endpoint(
     account_id: str,
     payload: MicroDepositVerify,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     account = (
         db.query(BankAccount)
@@ -226,7 +226,7 @@ def verify_instant_endpoint(
     merchant_id: str,
     account_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     account = (
         db.query(BankAccount)
@@ -0,0 +1,24 @@
+"""Worker endpoints for the notification outbox.
+
+The in-process dispatcher drains the outbox continuously; these endpoints let
+a scheduler force a drain (e.g. when the dispatcher is disabled) and expose
+dispatcher metrics. Guarded by the same X-Worker-Secret as /tasks/settle.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.routers.stablecoin_worker import require_worker_secret
+from app.services.notification_service import dispatcher
+
+router = APIRouter(prefix="/tasks/notifications", tags=["notification-worker"])
+
+
+@router.post("/dispatch", dependencies=[Depends(require_worker_secret)])
+def dispatch(db: Session = Depends(get_db)):
+    return {"dispatched": dispatcher.drain(db)}
+
+
+@router.get("/metrics", dependencies=[Depends(require_worker_secret)])
+def metrics(db: Session = Depends(get_db)):
+    return dispatcher.metrics(db)
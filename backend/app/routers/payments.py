@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 
-from app.database import get_db
-from app.dependencies import get_current_user
-from app.models.user import User
+from app.database import get_async_db, get_db
+from app.dependencies import get_current_user, get_current_user_async, idempotency, rate_limit
+from app.services.idempotency import IdempotentRequest
+from app.services.principal_cache import Principal
 from app.schemas.transaction import PaymentCreate, PaymentResponse, PaymentListResponse
 from app.schemas.ledger import BalanceResponse
 from app.services.payment_service import create_payment, get_payment, list_payments, cancel_payment
@@ -13,11 +15,13 @@ from app.services.ledger_service import get_balance
 router = APIRouter(prefix="/payments", tags=["payments"])
 
 
-@router.post("", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
+@router.post("", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(rate_limit)])
 def send_payment(
     payload: PaymentCreate,
+    idem: IdempotentRequest = Depends(idempotency),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if current_user.role != "merchant_admin":
         raise HTTPException(
@@ -25,7 +29,7 @@ def send_payment(
             detail="Only merchant admins can initiate B2B payments",
         )
     try:
-        return create_payment(db, payload)
+        return idem.save(create_payment(db, payload))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -34,31 +38,37 @@ def send_payment(
 def check_balance(
     merchant_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     balance = get_balance(db, merchant_id)
     return BalanceResponse(merchant_id=merchant_id, balance=balance)
 
 
 @router.get("", response_model=PaymentListResponse)
-def get_payments(
+async def get_payments(
     merchant_id: Optional[str] = Query(None),
     user_id: Optional[str] = Query(None),
     status_filter: Optional[str] = Query(None, alias="status"),
     rail: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    cursor: Optional[str] = Query(None),
+    include_total: Optional[bool] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
 ):
-    return list_payments(db, merchant_id, user_id, status_filter, rail, page, page_size)
+    try:
+        return await db.run_sync(list_payments, merchant_id, user_id, status_filter, rail,
+                                 page, page_size, cursor, include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse)
 def get_payment_by_id(
     payment_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     result = get_payment(db, payment_id)
     if not result:
@@ -70,7 +80,7 @@ def get_payment_by_id(
 def cancel_payment_endpoint(
     payment_id: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     try:
         return cancel_payment(db, payment_id)
@@ -81,10 +91,11 @@ def cancel_payment_endpoint(
 @router.post("/payouts", response_model=PaymentResponse, status_code=status.HTTP_201_CREATED)
 def create_payout(
     payload: PaymentCreate,
+    idem: IdempotentRequest = Depends(idempotency),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     try:
-        return create_payment(db, payload)
+        return idem.save(create_payment(db, payload))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
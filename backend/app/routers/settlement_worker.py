@@ -0,0 +1,21 @@
+"""Worker endpoint for bank settlement recovery.
+
+A scheduler calls /tasks/settlement/resubmit periodically so transfers left
+`processing` without a bank reference (a lost async job, a failed bank call)
+are sent to the bank again. Guarded by the same X-Worker-Secret as /tasks/settle.
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.routers.stablecoin_worker import require_worker_secret
+from app.services.settlement_service import resubmit_stale_transfers
+
+router = APIRouter(prefix="/tasks/settlement", tags=["settlement-worker"])
+
+
+@router.post("/resubmit", dependencies=[Depends(require_worker_secret)])
+def resubmit(limit: Optional[int] = Query(None, ge=1, le=1000), db: Session = Depends(get_db)):
+    return resubmit_stale_transfers(db, limit)
@@ -9,40 +9,28 @@ in the service layer.
 from decimal import Decimal
 from typing import Optional, Tuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.config import settings
-from app.database import get_db
-from app.dependencies import get_current_user
+from app.database import get_async_db, get_db
+from app.dependencies import get_current_user, get_current_user_async, rate_limit
 from app.models.crypto_account import CryptoAccount
 from app.models.kyc_record import KycRecord
 from app.models.transaction import Transaction
-from app.models.user import User
 from app.services import stablecoin_service as sc
 from app.services.chain_config import is_supported_network
 from app.services.ledger_service import get_balance
-from app.services.rate_limiter import rate_limiter
+from app.services.principal_cache import Principal
 from app.services.screening_service import ScreeningBlockedError
 from app.services.units import from_base_units
 from app.services.wallet_service import get_wallet_balance
+from app.utils.pagination import paginate
 
 SUPPORTED_ASSETS = ("USDC", "USD1")
 
 
-def rate_limit(request: Request, current_user: User = Depends(get_current_user)) -> None:
-    """Per-user, per-route fixed-window rate limit (config-driven)."""
-    if not settings.RATE_LIMIT_ENABLED:
-        return
-    key = f"{current_user.id}:{request.url.path}"
-    if not rate_limiter.allow(
-        key, settings.RATE_LIMIT_MAX_REQUESTS, settings.RATE_LIMIT_WINDOW_SECONDS
-    ):
-        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                            detail="Rate limit exceeded")
-
-
 router = APIRouter(prefix="/stablecoin", tags=["stablecoin"], dependencies=[Depends(rate_limit)])
 
 
@@ -80,13 +68,13 @@ class SendRequest(BaseModel):
 
 # --------------------------------------------------------------- helpers
 
-def _require_stablecoin_account(user: User) -> None:
+def _require_stablecoin_account(user: Principal) -> None:
     if user.role not in ("user", "merchant_admin"):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail="Stablecoin access requires a consumer or merchant account")
 
 
-def _owner(user: User) -> Tuple[str, Optional[str]]:
+def _owner(user: Principal) -> Tuple[str, Optional[str]]:
     """Returns (acting_user_id, owner_merchant_id). merchant_id is set for
     merchant_admin logins (balance on the merchant entity) and None for consumers."""
     _require_stablecoin_account(user)
@@ -149,14 +137,14 @@ def _guard(fn):
 # --------------------------------------------------------------- KYC
 
 @router.post("/kyc")
-def submit_kyc(payload: KycRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def submit_kyc(payload: KycRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     _require_stablecoin_account(current_user)
     record = sc.ensure_kyc(db, current_user.id, payload.model_dump())
     return {"user_id": current_user.id, "status": record.status}
 
 
 @router.get("/kyc")
-def get_kyc(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_kyc(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     _require_stablecoin_account(current_user)
     record = db.query(KycRecord).filter(KycRecord.user_id == current_user.id).first()
     return {"user_id": current_user.id, "status": record.status if record else "not_started"}
@@ -165,7 +153,7 @@ def get_kyc(db: Session = Depends(get_db), current_user: User = Depends(get_curr
 # --------------------------------------------------------------- accounts
 
 @router.post("/accounts")
-def create_account(payload: AccountRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_account(payload: AccountRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     uid, mid = _owner(current_user)
     _validate_asset(payload.asset_code)
     _validate_network(payload.network)
@@ -180,7 +168,7 @@ def create_account(payload: AccountRequest, db: Session = Depends(get_db), curre
 
 
 @router.get("/accounts")
-def list_accounts(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def list_accounts(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     uid, mid = _owner(current_user)
     q = db.query(CryptoAccount).filter(CryptoAccount.merchant_id == mid) if mid \
         else db.query(CryptoAccount).filter(CryptoAccount.user_id == uid, CryptoAccount.merchant_id.is_(None))
@@ -194,22 +182,23 @@ def list_accounts(db: Session = Depends(get_db), current_user: User = Depends(ge
 # --------------------------------------------------------------- balances
 
 @router.get("/balances")
-def balances(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def balances(db: AsyncSession = Depends(get_async_db),
+                   current_user: Principal = Depends(get_current_user_async)):
     uid, mid = _owner(current_user)
+    amounts = await db.run_sync(
+        lambda s: [(asset, _owner_balance(s, asset, uid, mid)) for asset in SUPPORTED_ASSETS]
+    )
     return {
         "user_id": uid,
         "merchant_id": mid,
-        "balances": [
-            {"asset_code": asset, "balance": str(_owner_balance(db, asset, uid, mid))}
-            for asset in SUPPORTED_ASSETS
-        ],
+        "balances": [{"asset_code": asset, "balance": str(amount)} for asset, amount in amounts],
     }
 
 
 # --------------------------------------------------------------- ramps / send
 
 @router.post("/onramp")
-def onramp(payload: OnrampRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def onramp(payload: OnrampRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     uid, mid = _owner(current_user)
     _validate_asset(payload.asset_code)
     _validate_network(payload.network)
@@ -219,7 +208,7 @@ def onramp(payload: OnrampRequest, db: Session = Depends(get_db), current_user:
 
 
 @router.post("/offramp")
-def offramp(payload: OfframpRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def offramp(payload: OfframpRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     uid, mid = _owner(current_user)
     _validate_asset(payload.asset_code)
     _validate_network(payload.network)
@@ -229,7 +218,7 @@ def offramp(payload: OfframpRequest, db: Session = Depends(get_db), current_user
 
 
 @router.post("/send")
-def send(payload: SendRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def send(payload: SendRequest, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     uid, mid = _owner(current_user)
     _validate_asset(payload.asset_code)
     _validate_network(payload.network)
@@ -243,9 +232,10 @@ def send(payload: SendRequest, db: Session = Depends(get_db), current_user: User
 
 # --------------------------------------------------------------- history
 
-@router.get("/transactions")
-def transactions(asset_code: Optional[str] = None, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    uid, mid = _owner(current_user)
+_HISTORY_PAGE_SIZE = 100
+
+def _history_page(db: Session, uid: str, mid: Optional[str], asset_code: Optional[str],
+                  limit: Optional[int], cursor: Optional[str]) -> dict:
     q = db.query(Transaction).filter(Transaction.settlement_type == "onchain")
     if mid:
         q = q.filter((Transaction.sender_merchant_id == mid) | (Transaction.receiver_merchant_id == mid))
@@ -253,5 +243,29 @@ def transactions(asset_code: Optional[str] = None, db: Session = Depends(get_db)
         q = q.filter((Transaction.sender_user_id == uid) | (Transaction.receiver_user_id == uid))
     if asset_code:
         q = q.filter(Transaction.asset_code == asset_code)
-    txns = q.order_by(Transaction.created_at.desc()).all()
-    return [_tx_out(tx) for tx in txns]
+    if limit is None and cursor is None:
+        return {"items": q.order_by(Transaction.created_at.desc(), Transaction.id.desc()).all(), "next_cursor": None}
+    return paginate(q, page_size=limit or _HISTORY_PAGE_SIZE, keyset=(Transaction.created_at, Transaction.id),
+                    cursor=cursor, with_total=False)
+
+
+@router.get("/transactions")
+async def transactions(
+    response: Response,
+    asset_code: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    """On-chain history, newest first. Unpaginated unless `limit` or `cursor`
+    is given (a cursor alone pages by 100); when more rows exist the
+    X-Next-Cursor response header carries the cursor for the next page."""
+    uid, mid = _owner(current_user)
+    try:
+        result = await db.run_sync(_history_page, uid, mid, asset_code, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if result["next_cursor"]:
+        response.headers["X-Next-Cursor"] = result["next_cursor"]
+    return [_tx_out(tx) for tx in result["items"]]
@@ -3,17 +3,23 @@
 Mirrors /webhooks/bank but for the regulated stablecoin partner. Verifies the
 signature via the provider, dedupes by event_id (webhook_events), and dispatches
 to the service layer. Public endpoint, protected by signature verification.
+
+With WEBHOOK_INGEST_MODE=queue the event is only appended to webhook_inbox
+(deduped by event_id in the insert) and acknowledged; see webhook_inbox.
+
+/webhooks/stablecoin/batch takes a JSON array (partner backfills) and applies
+it in bulk, in one transaction, in either mode.
 """
 from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database import get_db
-from app.models.webhook_event import WebhookEvent
-from app.services.event_service import log_event
 from app.services.stablecoin import get_stablecoin_provider
-from app.services.stablecoin_service import handle_partner_event
+from app.services.webhook_inbox import (
+    STABLECOIN, enqueue, process_stablecoin_event, process_stablecoin_events, stablecoin_ordering_key,
+)
 from app.services.webhook_security import verify_hmac
 
 router = APIRouter(prefix="/webhooks", tags=["stablecoin-webhooks"])
@@ -43,19 +49,29 @@ async def receive_stablecoin_webhook(request: Request, db: Session = Depends(get
     if not event_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing event_id")
 
-    # Idempotency: skip if this event_id was already recorded.
-    if db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).first():
-        return {"status": "already_processed"}
+    # The ORM work below blocks; run it on the threadpool, not the event loop.
+    if settings.WEBHOOK_INGEST_MODE == "queue":
+        accepted = await run_in_threadpool(enqueue, db, STABLECOIN, event_id, event_type,
+                                           stablecoin_ordering_key(event), raw_body.decode())
+        return {"status": "accepted" if accepted else "duplicate"}
+    return await run_in_threadpool(process_stablecoin_event, db, event)
+
+
+@router.post("/stablecoin/batch")
+async def receive_stablecoin_webhook_batch(request: Request, db: Session = Depends(get_db)):
+    raw_body = await request.body()
 
-    outcome = handle_partner_event(db, event)
+    if not _verify_signature(request, raw_body):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook signature")
+
+    try:
+        events = get_stablecoin_provider().parse_webhook_events(raw_body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array of events")
+    if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array of events")
 
     try:
-        db.add(WebhookEvent(provider="mock", event_id=event_id, event_type=event_type))
-        db.commit()
-    except IntegrityError:
-        # Concurrent delivery recorded it first; safe to treat as processed.
-        db.rollback()
-        return {"status": "already_processed"}
-
-    log_event(db, f"webhook.stablecoin.{event_type}", "stablecoin_webhooks", event_id, {"outcome": outcome})
-    return {"status": "processed", "outcome": outcome}
+        return await run_in_threadpool(process_stablecoin_events, db, events)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -4,12 +4,17 @@ Designed to be invoked by Cloud Scheduler / Cloud Tasks (not end users). Guarded
 by a shared secret header (X-Worker-Secret); in production the scheduler injects
 it. Fails closed when the secret is unset.
 """
-from fastapi import APIRouter, Depends, Header, HTTPException, status
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database import get_db
-from app.services.stablecoin_service import poll_pending_settlements, run_reconciliation
+from app.models.reconciliation import ReconciliationDrift, ReconciliationRun
+from app.services.reconciliation_service import run_reconciliation
+from app.services.stablecoin_service import poll_pending_settlements
+from app.utils.pagination import paginate
 
 router = APIRouter(prefix="/tasks", tags=["stablecoin-worker"])
 
@@ -21,20 +26,65 @@ def require_worker_secret(x_worker_secret: str = Header(default="")) -> None:
 
 
 @router.post("/settle", dependencies=[Depends(require_worker_secret)])
-def settle(db: Session = Depends(get_db)):
-    settled = poll_pending_settlements(db)
-    return {"settled": settled}
+def settle(cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    """Advance pending on-chain transfers. When the run's budget is spent before
+    the pending set is exhausted, `next_cursor` resumes where it stopped."""
+    try:
+        return poll_pending_settlements(db, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _amount(value) -> Optional[str]:
+    return None if value is None else f"{value.normalize():f}"
+
+
+def _run_summary(run: ReconciliationRun) -> dict:
+    return {
+        "run_id": run.id,
+        "mode": run.mode,
+        "status": run.status,
+        "accounts": run.accounts_checked,
+        "drifted": run.drifted,
+        "errors": run.errors,
+    }
 
 
 @router.post("/reconcile", dependencies=[Depends(require_worker_secret)])
-def reconcile(db: Session = Depends(get_db)):
-    reports = run_reconciliation(db)
-    drifted = [r for r in reports if not r["reconciled"]]
+def reconcile(incremental: bool = False, run_id: Optional[str] = None, db: Session = Depends(get_db)):
+    """Reconcile crypto accounts against the partner. A run still "running"
+    when the budget is spent continues with `?run_id=`; drift rows are read
+    from /tasks/reconcile/{run_id}/drifts."""
+    try:
+        run = run_reconciliation(db, incremental=incremental, run_id=run_id)
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reconciliation run not found")
+    return _run_summary(run)
+
+
+@router.get("/reconcile/{run_id}/drifts", dependencies=[Depends(require_worker_secret)])
+def reconcile_drifts(run_id: str, page: int = Query(1, ge=1), page_size: int = Query(100, ge=1, le=1000),
+                     db: Session = Depends(get_db)):
+    run = db.get(ReconciliationRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reconciliation run not found")
+    query = db.query(ReconciliationDrift).filter(ReconciliationDrift.run_id == run_id) \
+        .order_by(ReconciliationDrift.asset_code, ReconciliationDrift.crypto_account_id)
+    result = paginate(query, page=page, page_size=page_size)
     return {
-        "accounts": len(reports),
-        "drifted": len(drifted),
+        **_run_summary(run),
+        "page": result["page"],
+        "has_more": result["has_more"],
         "reports": [
-            {"user_id": r["user_id"], "asset_code": r["asset_code"], "drift": str(r["drift"])}
-            for r in drifted
+            {
+                "user_id": d.user_id,
+                "merchant_id": d.merchant_id,
+                "asset_code": d.asset_code,
+                "internal_balance": _amount(d.internal_balance),
+                "external_balance": _amount(d.external_balance),
+                "drift": _amount(d.drift),
+                "error": d.error,
+            }
+            for d in result["items"]
         ],
     }
@@ -5,12 +5,14 @@ from decimal import Decimal
 from typing import Optional
 
 from app.database import get_db
-from app.dependencies import get_current_user
+from app.dependencies import get_current_user, idempotency
+from app.services.idempotency import IdempotentRequest
 from app.models.user import User
+from app.services.principal_cache import Principal
 from app.models.transaction import Transaction
-from app.services.wallet_service import get_wallet_balance, wallet_debit, wallet_credit
-from app.services.ledger_service import get_balance, record_debit
-from app.services import description_service, notification_service
+from app.services.wallet_service import get_wallet_balance
+from app.services.ledger_service import get_balance, merchant_leg, post_journal, wallet_leg
+from app.services import description_service, notification_service, unit_of_work
 
 router = APIRouter(tags=["wallet"])
 
@@ -25,8 +27,9 @@ class WalletSendRequest(BaseModel):
 @router.post("/wallet/send")
 def wallet_send(
     payload: WalletSendRequest,
+    idem: IdempotentRequest = Depends(idempotency),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
     if current_user.role not in ("user", "merchant_admin"):
         raise HTTPException(
@@ -79,6 +82,11 @@ def wallet_send(
                 detail="Insufficient merchant balance",
             )
 
+    # AI-generated description, before any write so no lock is held across it
+    generated_desc = description_service.generate_description(
+        receiver.email, float(amount), "wallet", payload.description
+    )
+
     # Create transaction record
     txn = Transaction(
         sender_user_id=current_user.id if current_user.role == "user" else None,
@@ -90,43 +98,42 @@ def wallet_send(
         rail="wallet",
         status="completed",
         idempotency_key=payload.idempotency_key,
+        description=generated_desc,
     )
     db.add(txn)
-    db.commit()
-    db.refresh(txn)
+    db.flush()
 
     # Debit sender
     if current_user.role == "user":
-        wallet_debit(db, current_user.id, amount, txn.id, f"Sent to {receiver.email}")
+        debit = wallet_leg(current_user.id, "debit", amount, f"Sent to {receiver.email}", check_funds=True)
     else:
-        record_debit(
-            db, current_user.merchant_id, amount, txn.id,
-            f"Sent to consumer {receiver.email}",
+        debit = merchant_leg(
+            current_user.merchant_id, "debit", amount,
+            f"Sent to consumer {receiver.email}", check_funds=True,
         )
 
     # Credit receiver
     sender_label = current_user.email or current_user.merchant_id or "unknown"
-    wallet_credit(
-        db, payload.receiver_user_id, amount, txn.id,
-        f"Received from {sender_label}",
-    )
-
-    # AI-generated description
-    generated_desc = description_service.generate_description(
-        receiver.email, float(amount), "wallet", payload.description
-    )
-    txn.description = generated_desc
-    db.commit()
+    credit = wallet_leg(payload.receiver_user_id, "credit", amount, f"Received from {sender_label}")
+
+    # Transaction row, both legs and the receiver's notification commit
+    # together; a balance that changed since the check above rejects the
+    # whole transfer.
+    try:
+        with unit_of_work.transition(db):
+            post_journal(db, [debit, credit], txn.id)
+            notification_service.notify_transaction(
+                db, payload.receiver_user_id, txn.id, "completed",
+                float(amount), receiver.email, "wallet", generated_desc,
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-    # Notify receiver
-    notification_service.notify_transaction(
-        db, payload.receiver_user_id, txn.id, "completed",
-        float(amount), receiver.email, "wallet", generated_desc,
-    )
+    description_service.enrich_later(txn.id, generated_desc, receiver.email, float(amount), "wallet")
 
-    return {
+    return idem.save({
         "transaction_id": txn.id,
         "status": txn.status,
         "amount": str(txn.amount),
         "description": txn.description,
-    }
+    })
@@ -0,0 +1,24 @@
+"""Worker endpoints for the webhook inbox (WEBHOOK_INGEST_MODE=queue).
+
+The in-process InboxWorker drains the inbox continuously; these endpoints let
+a scheduler force a drain and expose inbox metrics (backlog, dead events).
+Guarded by the same X-Worker-Secret as /tasks/settle.
+"""
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.database import get_db
+from app.routers.stablecoin_worker import require_worker_secret
+from app.services.webhook_inbox import inbox_worker
+
+router = APIRouter(prefix="/tasks/webhooks", tags=["webhook-worker"])
+
+
+@router.post("/drain", dependencies=[Depends(require_worker_secret)])
+def drain(db: Session = Depends(get_db)):
+    return {"handled": inbox_worker.drain(db)}
+
+
+@router.get("/metrics", dependencies=[Depends(require_worker_secret)])
+def metrics(db: Session = Depends(get_db)):
+    return inbox_worker.metrics(db)
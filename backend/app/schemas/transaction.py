@@ -49,6 +49,8 @@ class PaymentListQuery(BaseModel):
 
 class PaymentListResponse(BaseModel):
     items: List[PaymentResponse]
-    total: int
+    total: Optional[int] = None  # omitted for cursor pages unless include_total=true
     page: int
     page_size: int
+    next_cursor: Optional[str] = None  # pass as ?cursor= to fetch the next page
+    has_more: bool = False
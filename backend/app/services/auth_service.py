@@ -1,24 +1,104 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Callable, Optional
+
 import bcrypt
 from jose import jwt, JWTError
 
 from app.config import settings
 
 
+class PasswordHasherBusy(Exception):
+    """Every hashing slot is taken; the caller should retry later (HTTP 429)."""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a small dedicated pool instead of the request threadpool.
+
+    At most `workers` hashes run at once and at most `max_pending` more wait;
+    beyond that submissions fail fast with PasswordHasherBusy, so a login
+    burst is shed instead of starving every other endpoint. Async callers
+    await the result without holding a thread; sync callers block on it.
+    """
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+        self._workers = workers
+        self._max_pending = max_pending
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[threading.BoundedSemaphore] = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pool is None:
+                workers = self._workers or settings.PASSWORD_HASH_WORKERS
+                pending = settings.PASSWORD_HASH_MAX_PENDING if self._max_pending is None else self._max_pending
+                self._slots = threading.BoundedSemaphore(workers + pending)
+                self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        self._start()
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        future = self._pool.submit(fn, *args)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password: str) -> str:
+        return self._submit(_hash, password, settings.BCRYPT_ROUNDS).result()
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._submit(_verify, password, hashed).result()
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.wrap_future(self._submit(_hash, password, settings.BCRYPT_ROUNDS))
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await asyncio.wrap_future(self._submit(_verify, password, hashed))
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+password_hasher = PasswordHasher()
+
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    return password_hasher.hash(password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(
-        plain_password.encode("utf-8"), hashed_password.encode("utf-8")
-    )
+    return password_hasher.verify(plain_password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True if the hash was made with a bcrypt cost other than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != settings.BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire, "type": "access"})
+    now = datetime.utcnow()
+    expire = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({"exp": expire, "iat": now, "type": "access"})
     return jwt.encode(to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
 
 
@@ -0,0 +1,202 @@
+"""Materialized per-owner, per-asset balances.
+
+Every ledger write (ledger_service.post_journal) locks and updates the owner's
+row in the same DB transaction as the Ledger insert, so get_owner_balance is a
+single-row lookup regardless of how many entries an owner has. The ledger
+remains the source of truth: the rebuild/verify helpers recompute balances
+from it with one grouped aggregate.
+
+Run from backend/ with:
+    python -m app.services.balance_service verify
+    python -m app.services.balance_service rebuild
+"""
+import argparse
+import sys
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, func, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.balance import Balance
+from app.models.ledger import Ledger
+from app.services.units import from_base_units, to_base_units
+from app.utils.batching import chunked
+
+MERCHANT = "merchant"
+USER = "user"
+
+OwnerKey = Tuple[str, str, str]  # (owner_type, owner_id, asset_code)
+
+
+def lock_balance(db: Session, owner_type: str, owner_id: str, asset_code: str) -> Balance:
+    """Fetch the owner's balance row with SELECT ... FOR UPDATE, creating it if missing.
+
+    Holding the row lock until commit serializes concurrent postings against
+    the same owner on Postgres. A racing first insert for a brand-new owner
+    hits the unique constraint inside a savepoint and re-reads the winner's row.
+    """
+    query = db.query(Balance).filter(
+        Balance.owner_type == owner_type,
+        Balance.owner_id == owner_id,
+        Balance.asset_code == asset_code,
+    ).with_for_update()
+    row = query.first()
+    if row is not None:
+        return row
+    try:
+        with db.begin_nested():
+            row = Balance(owner_type=owner_type, owner_id=owner_id, asset_code=asset_code,
+                          balance_base_units=0)
+            db.add(row)
+    except IntegrityError:
+        row = query.first()
+    return row
+
+
+def lock_balances(db: Session, keys: Iterable[OwnerKey]) -> Dict[OwnerKey, Balance]:
+    """lock_balance for many owners at once (bulk postings).
+
+    Rows are locked with one SELECT ... FOR UPDATE per owner type and chunk of
+    (owner_id, asset_code) pairs, in the same (owner_type, owner_id, asset)
+    order post_journal uses, and the missing rows are inserted together.
+    """
+    keys = sorted(set(keys))
+    rows: Dict[OwnerKey, Balance] = {}
+    for owner_type in sorted({key[0] for key in keys}):
+        pairs = [(owner_id, asset_code) for kind, owner_id, asset_code in keys if kind == owner_type]
+        for chunk in chunked(pairs):
+            locked = db.query(Balance).filter(
+                Balance.owner_type == owner_type,
+                tuple_(Balance.owner_id, Balance.asset_code).in_(chunk),
+            ).order_by(Balance.owner_id, Balance.asset_code).with_for_update()
+            for row in locked:
+                rows[(owner_type, row.owner_id, row.asset_code)] = row
+
+    missing = [key for key in keys if key not in rows]
+    if missing:
+        created = [Balance(owner_type=owner_type, owner_id=owner_id, asset_code=asset_code, balance_base_units=0)
+                   for owner_type, owner_id, asset_code in missing]
+        try:
+            with db.begin_nested():
+                db.add_all(created)
+            rows.update(zip(missing, created))
+        except IntegrityError:
+            # Some owner was created concurrently; fall back to one at a time.
+            for key in missing:
+                rows[key] = lock_balance(db, *key)
+    return rows
+
+
+def get_owner_balance(db: Session, owner_type: str, owner_id: str, asset_code: str = "USD") -> Decimal:
+    """Current balance for an owner in an asset (0 when the owner has no entries)."""
+    units = db.query(Balance.balance_base_units).filter(
+        Balance.owner_type == owner_type,
+        Balance.owner_id == owner_id,
+        Balance.asset_code == asset_code,
+    ).scalar()
+    if units is None:
+        return Decimal("0")
+    return from_base_units(int(units), asset_code)
+
+
+# ------------------------------------------------------------ rebuild / verify
+
+def ledger_totals(db: Session, before: Optional[datetime] = None) -> Dict[OwnerKey, Decimal]:
+    """Recompute every owner's balance from the ledger with grouped aggregates.
+
+    Mirrors the legacy per-owner SUM: USD sums the Decimal `amount` column
+    (older USD rows predate the base-unit columns), other assets sum
+    `amount_base_units`. With `before`, only entries created earlier count
+    (the archival job's closing balances).
+    """
+    signed_amount = case((Ledger.entry_type == "credit", Ledger.amount), else_=-Ledger.amount)
+    signed_units = case(
+        (Ledger.entry_type == "credit", Ledger.amount_base_units), else_=-Ledger.amount_base_units,
+    )
+    totals: Dict[OwnerKey, Decimal] = {}
+    for owner_type, owner_col in ((MERCHANT, Ledger.merchant_id), (USER, Ledger.user_id)):
+        query = db.query(
+            owner_col, Ledger.asset_code, func.sum(signed_amount), func.sum(signed_units),
+        ).filter(owner_col.isnot(None))
+        if before is not None:
+            query = query.filter(Ledger.created_at < before)
+        rows = query.group_by(owner_col, Ledger.asset_code).all()
+        for owner_id, asset_code, amount_sum, units_sum in rows:
+            if asset_code == "USD":
+                total = Decimal(str(amount_sum)) if amount_sum is not None else Decimal("0")
+            else:
+                total = from_base_units(int(units_sum or 0), asset_code)
+            totals[(owner_type, owner_id, asset_code)] = total
+    return totals
+
+
+def verify_balances(db: Session) -> List[dict]:
+    """Compare materialized balances to the ledger; returns one report per mismatch."""
+    expected = ledger_totals(db)
+    actual = {
+        (b.owner_type, b.owner_id, b.asset_code): from_base_units(int(b.balance_base_units or 0), b.asset_code)
+        for b in db.query(Balance).all()
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        ledger_balance = expected.get(key, Decimal("0"))
+        materialized = actual.get(key, Decimal("0"))
+        if ledger_balance != materialized:
+            owner_type, owner_id, asset_code = key
+            drift.append({
+                "owner_type": owner_type,
+                "owner_id": owner_id,
+                "asset_code": asset_code,
+                "ledger_balance": ledger_balance,
+                "materialized_balance": materialized,
+                "drift": materialized - ledger_balance,
+            })
+    return drift
+
+
+def rebuild_balances(db: Session) -> int:
+    """Overwrite the balances table from the ledger. Returns the number of rows changed."""
+    expected = ledger_totals(db)
+    existing = {(b.owner_type, b.owner_id, b.asset_code): b for b in db.query(Balance).all()}
+    changed = 0
+    for key in set(expected) | set(existing):
+        owner_type, owner_id, asset_code = key
+        units = to_base_units(expected.get(key, Decimal("0")), asset_code)
+        row = existing.get(key)
+        if row is None:
+            db.add(Balance(owner_type=owner_type, owner_id=owner_id, asset_code=asset_code,
+                           balance_base_units=units))
+            changed += 1
+        elif int(row.balance_base_units or 0) != units:
+            row.balance_base_units = units
+            changed += 1
+    db.commit()
+    return changed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild or verify materialized balances against the ledger.")
+    parser.add_argument("command", choices=("verify", "rebuild"))
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            print(f"Rebuilt balances: {rebuild_balances(db)} row(s) changed")
+        drift = verify_balances(db)
+        for d in drift:
+            print(f"DRIFT {d['owner_type']}:{d['owner_id']} {d['asset_code']} "
+                  f"ledger={d['ledger_balance']} materialized={d['materialized_balance']}")
+        print("Balances verified" if not drift else f"{len(drift)} balance(s) out of sync")
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,13 @@ import uuid
 import random
 import time
 from decimal import Decimal
-from typing import Dict
+from typing import Optional
 
+from app.config import settings
 from app.services.bank.interface import BankServiceInterface
 from app.services.bank.schemas import TransferRequest, TransferResponse, BalanceResponse
+from app.utils.memory import cache_stats
+from app.utils.ttl_cache import TTLCache
 
 RAIL_LIMITS = {
     "fednow": Decimal("500000"),
@@ -17,10 +20,29 @@ RAIL_LIMITS = {
 ERROR_RATE = 0.05  # 5% error simulation
 
 
+class _Transfer:
+    """Compact stored transfer; both stores share one record per transfer."""
+    __slots__ = ("reference_id", "status", "rail", "amount", "failure_reason")
+
+    def __init__(self, reference_id: str, status: str, rail: str, amount: Decimal,
+                 failure_reason: Optional[str] = None) -> None:
+        self.reference_id = reference_id
+        self.status = status
+        self.rail = rail
+        self.amount = amount
+        self.failure_reason = failure_reason
+
+    def to_response(self) -> TransferResponse:
+        return TransferResponse(reference_id=self.reference_id, status=self.status, rail=self.rail,
+                                amount=self.amount, failure_reason=self.failure_reason)
+
+
 class MockBankService(BankServiceInterface):
-    def __init__(self):
-        self._transfers: Dict[str, TransferResponse] = {}
-        self._idempotency_cache: Dict[str, TransferResponse] = {}
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None):
+        maxsize = settings.MOCK_PROVIDER_CACHE_SIZE if maxsize is None else maxsize
+        ttl = settings.MOCK_PROVIDER_CACHE_TTL_SECONDS if ttl is None else ttl
+        self._transfers = TTLCache(maxsize=maxsize, ttl=ttl)          # reference_id -> _Transfer
+        self._idempotency_cache = TTLCache(maxsize=maxsize, ttl=ttl)  # idempotency_key -> _Transfer
 
     def _simulate_delay(self, rail: str):
         delays = {"fednow": 0.1, "rtp": 0.1, "ach": 0.5, "card": 0.2}
@@ -37,26 +59,27 @@ class MockBankService(BankServiceInterface):
 
     def initiate_transfer(self, request: TransferRequest) -> TransferResponse:
         # Idempotency check
-        if request.idempotency_key in self._idempotency_cache:
-            return self._idempotency_cache[request.idempotency_key]
+        record = self._idempotency_cache.get(request.idempotency_key)
+        if record is not None:
+            return record.to_response()
 
         # Limit check
         if not self._check_limit(request.rail, request.amount):
-            response = TransferResponse(
+            record = _Transfer(
                 reference_id=str(uuid.uuid4()),
                 status="failed",
                 rail=request.rail,
                 amount=request.amount,
                 failure_reason=f"Amount exceeds {request.rail} limit of ${RAIL_LIMITS[request.rail]}",
             )
-            self._idempotency_cache[request.idempotency_key] = response
-            return response
+            self._idempotency_cache.set(request.idempotency_key, record)
+            return record.to_response()
 
         self._simulate_delay(request.rail)
 
         # Simulate random error
         if self._simulate_error():
-            response = TransferResponse(
+            record = _Transfer(
                 reference_id=str(uuid.uuid4()),
                 status="failed",
                 rail=request.rail,
@@ -64,26 +87,29 @@ class MockBankService(BankServiceInterface):
                 failure_reason="Bank processing error (simulated)",
             )
         else:
-            response = TransferResponse(
+            record = _Transfer(
                 reference_id=str(uuid.uuid4()),
                 status="completed",
                 rail=request.rail,
                 amount=request.amount,
             )
 
-        self._transfers[response.reference_id] = response
-        self._idempotency_cache[request.idempotency_key] = response
-        return response
+        self._transfers.set(record.reference_id, record)
+        self._idempotency_cache.set(request.idempotency_key, record)
+        return record.to_response()
 
     def get_transfer_status(self, reference_id: str) -> TransferResponse:
-        if reference_id in self._transfers:
-            return self._transfers[reference_id]
+        """The stored transfer, or status "not_found" (never "failed") for one
+        that never existed or has been evicted from the bounded store."""
+        record = self._transfers.get(reference_id)
+        if record is not None:
+            return record.to_response()
         return TransferResponse(
             reference_id=reference_id,
             status="not_found",
             rail="unknown",
             amount=Decimal("0"),
-            failure_reason="Transfer not found",
+            failure_reason="Transfer not found or expired",
         )
 
     def get_balance(self, account_id: str) -> BalanceResponse:
@@ -99,6 +125,13 @@ class MockBankService(BankServiceInterface):
     def send_rfp(self, request: TransferRequest) -> TransferResponse:
         return self.initiate_transfer(request)
 
+    def memory_stats(self, record_bytes: bool = True) -> dict:
+        """Size, hit/miss/eviction counters and approximate bytes per store."""
+        return {
+            "transfers": cache_stats(self._transfers, record_bytes),
+            "idempotency": cache_stats(self._idempotency_cache, record_bytes),
+        }
+
 
 # Singleton instance
 mock_bank_service = MockBankService()
@@ -15,7 +15,7 @@ class TransferRequest(BaseModel):
 
 class TransferResponse(BaseModel):
     reference_id: str
-    status: str  # pending, processing, completed, failed
+    status: str  # pending, processing, completed, failed, not_found
     rail: str
     amount: Decimal
     failure_reason: Optional[str] = None
@@ -3,15 +3,12 @@ from sqlalchemy.orm import Session
 
 from app.models.merchant import Merchant
 from app.models.transaction import Transaction
-from app.models.bank_config import BankConfig
-from app.services.rail_selector import select_rail
-from app.services.bank.mock_bank import mock_bank_service
+from app.services.rail_selector import rail_router
 from app.services.bank.schemas import TransferRequest
-from app.models.user import User
-from app.services.wallet_service import wallet_debit, wallet_credit, get_wallet_balance
-from app.services.ledger_service import record_credit
+from app.services.wallet_service import get_wallet_balance
 from app.services.event_service import log_event
-from app.services import description_service, notification_service
+from app.services.settlement_service import submit_transfer
+from app.services import description_service, unit_of_work
 
 
 def consumer_pay(
@@ -42,20 +39,16 @@ def consumer_pay(
     if balance < amount:
         raise ValueError("Insufficient wallet balance")
 
-    # Get bank config for rail selection
-    bank_config = db.query(BankConfig).filter(BankConfig.is_active == True).first()
-    if not bank_config:
-        raise ValueError("No active bank configuration found")
-
-    # Select rail
-    rail = select_rail(
-        amount=amount,
-        supported_rails=bank_config.supported_rails,
-        preferred_rail=preferred_rail,
-    )
+    # Select rail from the active bank config's compiled routing table
+    rail = rail_router.select_rail(db, amount, preferred_rail=preferred_rail)
     if not rail:
         raise ValueError("No suitable payment rail available for this amount")
 
+    # Generate AI description
+    generated_desc = description_service.generate_description(
+        merchant.name, float(amount), rail, description, merchant_id=merchant.id
+    )
+
     # Create transaction
     txn = Transaction(
         sender_user_id=user_id,
@@ -65,16 +58,21 @@ def consumer_pay(
         rail=rail,
         status="processing",
         idempotency_key=idempotency_key,
+        description=generated_desc,
     )
-    db.add(txn)
-    db.commit()
+    with unit_of_work.transition(db):
+        db.add(txn)
+        db.flush()
+        log_event(db, "consumer_payment.initiated", "consumer_payment_service", txn.id, {
+            "rail": rail, "amount": str(amount), "user_id": user_id,
+        })
     db.refresh(txn)
 
-    log_event(db, "consumer_payment.initiated", "consumer_payment_service", txn.id, {
-        "rail": rail, "amount": str(amount), "user_id": user_id,
-    })
+    description_service.enrich_later(
+        txn.id, generated_desc, merchant.name, float(amount), rail, merchant_id=merchant.id
+    )
 
-    # Call mock bank
+    # Settle through the bank: inline, or in the background in async mode.
     transfer_request = TransferRequest(
         sender_account_id=user_id,
         receiver_account_id=merchant_id,
@@ -82,56 +80,7 @@ def consumer_pay(
         rail=rail,
         idempotency_key=idempotency_key,
     )
-
-    result = mock_bank_service.initiate_transfer(transfer_request)
-
-    # Update transaction with result
-    txn.reference_id = result.reference_id
-    txn.status = result.status
-    txn.failure_reason = result.failure_reason
-    db.commit()
-
-    # Generate AI description
-    generated_desc = description_service.generate_description(
-        merchant.name, float(amount), rail, description
-    )
-    txn.description = generated_desc
-    db.commit()
-
-    # If completed, update ledger entries
-    if result.status == "completed":
-        # 0.05% discount for FedNow/RTP rails
-        if rail in ("fednow", "rtp"):
-            settled_amount = (amount * Decimal("0.9995")).quantize(Decimal("0.01"))
-        else:
-            settled_amount = amount
-        txn.amount = settled_amount
-        db.commit()
-        wallet_debit(db, user_id, settled_amount, txn.id, generated_desc)
-        record_credit(db, merchant_id, settled_amount, txn.id, f"Payment from consumer {user_id}")
-
-        # If receiver merchant is linked to a consumer user, also credit their wallet
-        # so the money is visible in their wallet balance immediately
-        receiver_consumer = db.query(User).filter(
-            User.merchant_id == merchant_id, User.role == "user"
-        ).first()
-        if receiver_consumer:
-            wallet_credit(db, receiver_consumer.id, settled_amount, txn.id,
-                          f"Payment received from {user_id}")
-            txn.receiver_user_id = receiver_consumer.id
-
-        db.commit()
-        log_event(db, "consumer_payment.completed", "consumer_payment_service", txn.id)
-    elif result.status == "failed":
-        log_event(db, "consumer_payment.failed", "consumer_payment_service", txn.id, {
-            "reason": result.failure_reason,
-        })
-
-    # Send notification to consumer user
-    notification_service.notify_transaction(
-        db, user_id, txn.id, txn.status,
-        float(txn.amount), merchant.name, rail, txn.description,
-    )
+    txn = submit_transfer(db, txn, transfer_request)
 
     return {
         "transaction_id": txn.id,
@@ -1,37 +1,295 @@
+"""AI-generated transaction descriptions, kept off the payment hot path.
+
+Lookup order for a payment without a user-provided description:
+
+1. Bounded LRU/TTL cache keyed by (merchant id, rail, amount bucket).
+2. Per-merchant template store, precomputed in the background
+   (refresh_templates) so the first payment to a merchant is also a hit, and
+   re-run every DESCRIPTION_TEMPLATE_REFRESH_SECONDS; templates that a refresh
+   did not renew expire after two intervals.
+3. The provider (Claude, or the deterministic stub). In async fill-in mode
+   (DESCRIPTION_ASYNC_FILL) this step is skipped: the fallback text is
+   returned immediately and enrich_later() replaces it once generated.
+
+A failing provider is skipped for DESCRIPTION_FAILURE_COOLDOWN_SECONDS so an
+unreachable API costs one timeout, not one per payment. update_merchant drops
+a merchant's cached and precomputed text (invalidate_merchant), so a rename is
+not described under the old name.
+"""
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Protocol
+
+from sqlalchemy.orm import Session
+
 from app.config import settings
+from app.utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+# Upper bounds (USD) of the amount buckets used for cache keys and prompts.
+AMOUNT_BUCKETS = (10, 50, 100, 500, 1000, 5000, 25000)
 
-def generate_description(
-    merchant_name: str,
-    amount: float,
-    rail: str,
-    user_provided: str | None = None,
-) -> str:
-    if user_provided:
-        return user_provided
 
-    try:
-        import anthropic
+class DescriptionProvider(Protocol):
+    def describe(self, merchant_name: str, rail: str, amount_hint: str) -> str: ...
+
+
+class AnthropicProvider:
+    """Claude-backed provider; one client per process, short timeout, no SDK retries."""
+
+    model = "claude-haiku-4-5-20251001"
+
+    def __init__(self) -> None:
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            import anthropic
 
-        client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
-        message = client.messages.create(
-            model="claude-haiku-4-5-20251001",
+            self._client = anthropic.Anthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                timeout=settings.DESCRIPTION_TIMEOUT_SECONDS,
+                max_retries=0,
+            )
+        return self._client
+
+    def describe(self, merchant_name: str, rail: str, amount_hint: str) -> str:
+        message = self._get_client().messages.create(
+            model=self.model,
             max_tokens=60,
             messages=[
                 {
                     "role": "user",
                     "content": (
                         f"Generate a brief (10-15 word) realistic transaction description "
-                        f"for a ${amount:.2f} payment to {merchant_name} via {rail}. "
+                        f"for a {amount_hint} payment to {merchant_name} via {rail}. "
                         f"Be specific to the merchant type. Reply with only the description, no quotes."
                     ),
                 }
             ],
         )
         return message.content[0].text.strip()
-    except Exception as e:
-        logger.warning("description_service: Claude API call failed: %s", e)
-        return f"Payment to {merchant_name} via {rail.upper()}"
+
+
+class StubProvider:
+    """Deterministic offline provider for tests and local development."""
+
+    def describe(self, merchant_name: str, rail: str, amount_hint: str) -> str:
+        return f"{merchant_name} purchase ({amount_hint}) via {rail.upper()}"
+
+
+def amount_bucket(amount: float) -> int:
+    for upper in AMOUNT_BUCKETS:
+        if amount < upper:
+            return upper
+    return 0  # open-ended top bucket
+
+
+def _amount_hint(bucket: Optional[int]) -> str:
+    if bucket is None:
+        return "typical"
+    if bucket == 0:
+        return f"${AMOUNT_BUCKETS[-1]:,}+"
+    return f"under ${bucket:,}"
+
+
+def fallback_description(merchant_name: str, rail: str) -> str:
+    return f"Payment to {merchant_name} via {rail.upper()}"
+
+
+class DescriptionEngine:
+    def __init__(self, provider: Optional[DescriptionProvider] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._provider = provider
+        self._clock = clock
+        self.cache = TTLCache(
+            maxsize=settings.DESCRIPTION_CACHE_SIZE, ttl=settings.DESCRIPTION_CACHE_TTL_SECONDS, clock=clock,
+        )
+        # (merchant_id, rail) -> description; renewed by every refresh.
+        self.templates = TTLCache(
+            maxsize=settings.DESCRIPTION_CACHE_SIZE, ttl=2 * settings.DESCRIPTION_TEMPLATE_REFRESH_SECONDS,
+            clock=clock,
+        )
+        self._disabled_until = 0.0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._refresh_stop = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    @property
+    def provider(self) -> Optional[DescriptionProvider]:
+        if self._provider is None:
+            name = settings.DESCRIPTION_PROVIDER
+            if name == "stub":
+                self._provider = StubProvider()
+            elif name == "anthropic" or (name == "auto" and settings.ANTHROPIC_API_KEY):
+                self._provider = AnthropicProvider()
+        return self._provider
+
+    def _call_provider(self, merchant_name: str, rail: str, bucket: Optional[int]) -> Optional[str]:
+        provider = self.provider
+        if provider is None or self._clock() < self._disabled_until:
+            return None
+        try:
+            return provider.describe(merchant_name, rail, _amount_hint(bucket))
+        except Exception as e:
+            logger.warning("description_service: provider call failed: %s", e)
+            self._disabled_until = self._clock() + settings.DESCRIPTION_FAILURE_COOLDOWN_SECONDS
+            return None
+
+    def lookup(self, merchant_name: str, rail: str, amount: float,
+               merchant_id: Optional[str] = None) -> Optional[str]:
+        """Cached or precomputed description, without calling the provider.
+
+        Keyed by merchant_id; counterparties without one (wallet users) by name.
+        """
+        key = merchant_id or merchant_name
+        cached = self.cache.get((key, rail, amount_bucket(amount)))
+        if cached is not None:
+            return cached
+        return self.templates.get((key, rail))
+
+    def generate(self, merchant_name: str, rail: str, amount: float,
+                 merchant_id: Optional[str] = None) -> Optional[str]:
+        """Call the provider and cache the result; None if unavailable."""
+        bucket = amount_bucket(amount)
+        text = self._call_provider(merchant_name, rail, bucket)
+        if text:
+            self.cache.set((merchant_id or merchant_name, rail, bucket), text)
+        return text
+
+    def invalidate_merchant(self, merchant_id: str) -> None:
+        """Forget a merchant's cached and precomputed descriptions (rename, etc.)."""
+        self.cache.discard_where(lambda key: key[0] == merchant_id)
+        self.templates.discard_where(lambda key: key[0] == merchant_id)
+
+    def refresh_templates(self, db: Session) -> int:
+        """Precompute one description per (active merchant, supported rail)."""
+        from app.models.bank_config import BankConfig
+        from app.models.merchant import Merchant
+
+        config = db.query(BankConfig).filter(BankConfig.is_active == True).first()
+        rails = [r.strip() for r in (config.supported_rails if config else "").split(",") if r.strip()]
+        merchants = db.query(Merchant.id, Merchant.name).filter(Merchant.onboarding_status == "active").all()
+        stored = 0
+        for merchant_id, name in merchants:
+            for rail in rails:
+                text = self._call_provider(name, rail, None)
+                if text:
+                    self.templates.set((merchant_id, rail), text)
+                    stored += 1
+        return stored
+
+    def start_template_refresh(self, session_factory: Callable[[], Session]) -> None:
+        """Run refresh_templates now and then every DESCRIPTION_TEMPLATE_REFRESH_SECONDS."""
+        def run():
+            while True:
+                db = session_factory()
+                try:
+                    stored = self.refresh_templates(db)
+                    logger.info("description_service: precomputed %d merchant templates", stored)
+                except Exception as e:
+                    logger.warning("description_service: template refresh failed: %s", e)
+                finally:
+                    db.close()
+                if self._refresh_stop.wait(settings.DESCRIPTION_TEMPLATE_REFRESH_SECONDS):
+                    return
+
+        with self._pool_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_stop.clear()
+            self._refresh_thread = threading.Thread(target=run, name="describe-templates", daemon=True)
+            self._refresh_thread.start()
+
+    # -- async fill-in --
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="describe")
+            return self._pool
+
+    def submit_enrichment(self, session_factory: Callable[[], Session], txn_id: str,
+                          merchant_name: str, amount: float, rail: str,
+                          merchant_id: Optional[str] = None) -> None:
+        """Run enrich_transaction on the background pool."""
+        self._get_pool().submit(self.enrich_transaction, session_factory, txn_id,
+                                merchant_name, amount, rail, merchant_id)
+
+    def enrich_transaction(self, session_factory: Callable[[], Session], txn_id: str,
+                           merchant_name: str, amount: float, rail: str,
+                           merchant_id: Optional[str] = None) -> None:
+        text = (self.lookup(merchant_name, rail, amount, merchant_id)
+                or self.generate(merchant_name, rail, amount, merchant_id))
+        if not text:
+            return
+        from app.models.transaction import Transaction
+
+        db = session_factory()
+        try:
+            # Only replace the placeholder; never overwrite an edited description.
+            db.query(Transaction).filter(
+                Transaction.id == txn_id,
+                Transaction.description == fallback_description(merchant_name, rail),
+            ).update({"description": text}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("description_service: enrichment of %s failed: %s", txn_id, e)
+        finally:
+            db.close()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._refresh_stop.set()
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+description_engine = DescriptionEngine()
+
+
+def generate_description(
+    merchant_name: str,
+    amount: float,
+    rail: str,
+    user_provided: str | None = None,
+    merchant_id: str | None = None,
+) -> str:
+    if user_provided:
+        return user_provided
+
+    text = description_engine.lookup(merchant_name, rail, amount, merchant_id)
+    if text is None and not settings.DESCRIPTION_ASYNC_FILL:
+        text = description_engine.generate(merchant_name, rail, amount, merchant_id)
+    return text or fallback_description(merchant_name, rail)
+
+
+def enrich_later(
+    txn_id: str,
+    description: str,
+    merchant_name: str,
+    amount: float,
+    rail: str,
+    session_factory: Optional[Callable[[], Session]] = None,
+    merchant_id: Optional[str] = None,
+) -> None:
+    """In async fill-in mode, replace a fallback description in the background."""
+    if not settings.DESCRIPTION_ASYNC_FILL or description != fallback_description(merchant_name, rail):
+        return
+    if session_factory is None:
+        from app.database import SessionLocal
+
+        session_factory = SessionLocal
+    description_engine.submit_enrichment(session_factory, txn_id, merchant_name, amount, rail, merchant_id)
+
+
+def refresh_templates_in_background() -> None:
+    from app.database import SessionLocal
+
+    description_engine.start_template_refresh(SessionLocal)
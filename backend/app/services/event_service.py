@@ -1,9 +1,196 @@
+"""Audit event log.
+
+log_event never costs a commit of its own when the caller is mid-unit-of-work:
+if the session has unflushed or flushed-but-uncommitted writes, the event is
+added to that transaction and commits (or rolls back) with it.
+
+Otherwise it depends on EVENT_LOG_MODE:
+- "sync" (default): insert and commit on the caller's session.
+- "async": append to the in-process EventSink, which bulk-inserts buffered
+  events on a background thread every EVENT_LOG_FLUSH_INTERVAL_SECONDS or
+  EVENT_LOG_BATCH_SIZE events. The buffer is bounded; a full buffer is
+  flushed inline by the producer instead of dropping events. A failed write
+  keeps its rows for retry, backing off from the flush interval up to
+  EVENT_LOG_RETRY_MAX_SECONDS; only if the database stays down long enough
+  for the retry backlog to exceed EVENT_LOG_BUFFER_SIZE are the oldest rows
+  dropped (and logged). stop() (app shutdown, and atexit) flushes what is left.
+"""
+import atexit
 import json
-from typing import Optional
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+from sqlalchemy import event as sa_event, insert
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.event_log import EventLog
 
+logger = logging.getLogger(__name__)
+
+_WRITES_KEY = "event_service.has_writes"
+
+
+@sa_event.listens_for(Session, "after_flush")
+def _mark_writes(session, flush_context):
+    session.info[_WRITES_KEY] = True
+
+
+@sa_event.listens_for(Session, "after_transaction_end")
+def _clear_writes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_WRITES_KEY, None)
+
+
+def has_open_writes(db: Session) -> bool:
+    """True if the session holds writes that its owner has yet to commit."""
+    return bool(db.new or db.dirty or db.deleted or db.info.get(_WRITES_KEY))
+
+
+def _event_row(event_type: str, source: str, reference_id: Optional[str], payload: Optional[dict]) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "event_type": event_type,
+        "source": source,
+        "reference_id": reference_id,
+        "payload": json.dumps(payload) if payload else None,
+        "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+    }
+
+
+class EventSink:
+    """Bounded in-process buffer of event rows, bulk-inserted in the background."""
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 max_buffer: Optional[int] = None, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None, clock=time.monotonic) -> None:
+        self._session_factory = session_factory
+        max_buffer = max_buffer or settings.EVENT_LOG_BUFFER_SIZE
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=max_buffer)
+        self._batch_size = batch_size or settings.EVENT_LOG_BATCH_SIZE
+        self._flush_interval = flush_interval or settings.EVENT_LOG_FLUSH_INTERVAL_SECONDS
+        self._clock = clock
+        # Rows whose write failed, oldest first; retried before new rows.
+        self._retry: "deque[dict]" = deque()
+        self._max_retry = max_buffer
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.flushes = 0
+        self.written = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def _new_session(self) -> Session:
+        if self._session_factory is not None:
+            return self._session_factory()
+        from app.database import SessionLocal
+        return SessionLocal()
+
+    def emit(self, row: dict) -> None:
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            # Buffer full (writer behind or DB slow): flush inline, then retry.
+            self.flush()
+            self._queue.put(row)
+        if self._queue.qsize() >= self._batch_size:
+            self._wake.set()
+
+    def _drain(self) -> List[dict]:
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def flush(self, force: bool = False) -> int:
+        """Bulk-insert everything buffered; returns the number of rows written.
+
+        While backing off after a failed write, rows are moved to the retry
+        backlog (freeing the buffer) without touching the database, unless
+        `force` is set.
+        """
+        with self._flush_lock:
+            rows = list(self._retry) + self._drain()
+            self._retry.clear()
+            if not rows:
+                return 0
+            if not force and self._clock() < self._retry_at:
+                self._requeue(rows)
+                return 0
+            db = self._new_session()
+            try:
+                for start in range(0, len(rows), self._batch_size):
+                    db.execute(insert(EventLog), rows[start:start + self._batch_size])
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                self.failures += 1
+                self._backoff = min(max(self._backoff * 2, self._flush_interval), settings.EVENT_LOG_RETRY_MAX_SECONDS)
+                self._retry_at = self._clock() + self._backoff
+                self._requeue(rows)
+                logger.warning("event_service: failed to write %d events, retrying in %.1fs: %s",
+                               len(rows), self._backoff, e)
+                return 0
+            finally:
+                db.close()
+            self._backoff = self._retry_at = 0.0
+            self.flushes += 1
+            self.written += len(rows)
+            return len(rows)
+
+    def _requeue(self, rows: List[dict]) -> None:
+        overflow = len(rows) - self._max_retry
+        if overflow > 0:
+            self.dropped += overflow
+            logger.error("event_service: retry backlog full, dropping %d oldest events", overflow)
+            rows = rows[overflow:]
+        self._retry.extend(rows)
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._retry)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=self._flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="event-log-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush(force=True)
+
+
+event_sink = EventSink()
+atexit.register(event_sink.stop)
+
 
 def log_event(
     db: Session,
@@ -12,12 +199,14 @@ def log_event(
     reference_id: Optional[str] = None,
     payload: Optional[dict] = None,
 ):
-    event = EventLog(
-        event_type=event_type,
-        source=source,
-        reference_id=reference_id,
-        payload=json.dumps(payload) if payload else None,
-    )
+    if has_open_writes(db):
+        event = EventLog(**_event_row(event_type, source, reference_id, payload))
+        db.add(event)
+        return event
+    if settings.EVENT_LOG_MODE == "async":
+        event_sink.emit(_event_row(event_type, source, reference_id, payload))
+        return None
+    event = EventLog(**_event_row(event_type, source, reference_id, payload))
     db.add(event)
     db.commit()
     return event
@@ -0,0 +1,213 @@
+"""Shared idempotency for the payment endpoints.
+
+A request carrying an idempotency key first reserves (owner, endpoint, key) in
+the idempotency_keys table, then runs, then stores its response there. A retry
+is answered from the stored response without re-running anything:
+
+- from a per-process TTL/LRU cache of completed responses when it is warm;
+- by waiting on the first request when it is still running in this process
+  (in-flight coalescing), then reading the cache it fills;
+- otherwise from the table, polling while another instance holds the key.
+
+Only successful responses are stored, and only once they are final: a
+response whose "status" is still pending or processing (async settlement)
+releases its key instead, so a retry re-runs the endpoint and is answered by
+the service's own Transaction.idempotency_key check from the current row
+rather than from a stale snapshot. A request that fails releases its key so a
+corrected retry can run. A reservation whose holder died is taken over once
+`locked_until` passes; the services' own checks still stop a second execution
+in that case.
+
+The store commits and rolls back the session it is given; the `idempotency`
+dependency passes one of its own, never the endpoint's.
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.idempotency_key import IdempotencyKey
+from app.utils.ttl_cache import TTLCache
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+# Response statuses that may still change; such responses are not stored.
+UNSETTLED_STATUSES = ("pending", "processing")
+
+Scope = Tuple[str, str, str]  # (owner, endpoint, key)
+
+_POLL_SECONDS = 0.05
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: int
+    body: Any
+
+
+class IdempotentReplay(Exception):
+    """A retry answered from the stored response (turned into that response by main)."""
+
+    def __init__(self, response: StoredResponse) -> None:
+        super().__init__("Idempotent replay")
+        self.response = response
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request body."""
+
+
+class IdempotencyInProgress(Exception):
+    """The first request with this key is still running; retry shortly."""
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _row_filter(scope: Scope):
+    owner, endpoint, key = scope
+    return (IdempotencyKey.owner == owner, IdempotencyKey.endpoint == endpoint, IdempotencyKey.key == key)
+
+
+class IdempotencyStore:
+    def __init__(self) -> None:
+        self._cache = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE,
+                               ttl=settings.IDEMPOTENCY_CACHE_TTL_SECONDS)
+        self._inflight: Dict[Scope, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, scope: Scope, request_hash: str) -> Optional[StoredResponse]:
+        stored = self._cache.get(scope)
+        if stored is not None and stored.request_hash != request_hash:
+            raise IdempotencyConflict()
+        return stored
+
+    def _finish(self, scope: Scope) -> None:
+        with self._lock:
+            event = self._inflight.pop(scope, None)
+        if event is not None:
+            event.set()
+
+    def reserve(self, db: Session, scope: Scope, request_hash: str) -> Optional[StoredResponse]:
+        """The stored response for a completed key, or None once the caller
+        holds the key and must run the request, then `complete` or `release`."""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            stored = self._cached(scope, request_hash)
+            if stored is not None:
+                return stored
+            with self._lock:
+                event = self._inflight.get(scope)
+                if event is None:
+                    self._inflight[scope] = threading.Event()
+            if event is None:
+                break
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                raise IdempotencyInProgress()
+            # The first request finished: its response is cached now, or it
+            # released the key and the next pass may claim it.
+
+        try:
+            stored = self._claim(db, scope, request_hash, deadline)
+        except BaseException:
+            self._finish(scope)
+            raise
+        if stored is not None:
+            self._finish(scope)
+        return stored
+
+    def _claim(self, db: Session, scope: Scope, request_hash: str, deadline: float) -> Optional[StoredResponse]:
+        owner, endpoint, key = scope
+        while True:
+            now = _utcnow()
+            locked_until = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+            row = db.query(IdempotencyKey).filter(*_row_filter(scope)).first()
+            if row is None:
+                try:
+                    with db.begin_nested():
+                        db.add(IdempotencyKey(owner=owner, endpoint=endpoint, key=key, request_hash=request_hash,
+                                              status=IN_PROGRESS, locked_until=locked_until))
+                except IntegrityError:
+                    continue  # another instance reserved it first; read its row
+                db.commit()
+                return None
+            if row.request_hash != request_hash:
+                db.rollback()
+                raise IdempotencyConflict()
+            if row.status == COMPLETED:
+                stored = StoredResponse(row.request_hash, row.response_status, json.loads(row.response_body))
+                db.rollback()
+                self._cache.set(scope, stored)
+                return stored
+            if row.locked_until is None or row.locked_until < now:
+                # The holder died mid-request; take the key over unless someone else just did.
+                taken = db.query(IdempotencyKey).filter(
+                    IdempotencyKey.id == row.id, IdempotencyKey.locked_until == row.locked_until,
+                ).update({IdempotencyKey.locked_until: locked_until}, synchronize_session=False)
+                db.commit()
+                if taken:
+                    return None
+                continue
+            db.rollback()  # end the read so the next poll sees the holder's commit
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress()
+            time.sleep(_POLL_SECONDS)
+
+    def complete(self, db: Session, scope: Scope, request_hash: str, status_code: int, body: Any) -> None:
+        """Store the response of the request holding `scope` and wake its duplicates."""
+        try:
+            db.query(IdempotencyKey).filter(*_row_filter(scope)).update({
+                IdempotencyKey.status: COMPLETED,
+                IdempotencyKey.response_status: status_code,
+                IdempotencyKey.response_body: json.dumps(body),
+                IdempotencyKey.completed_at: _utcnow(),
+                IdempotencyKey.locked_until: None,
+            }, synchronize_session=False)
+            db.commit()
+            self._cache.set(scope, StoredResponse(request_hash, status_code, body))
+        finally:
+            self._finish(scope)
+
+    def release(self, db: Session, scope: Scope) -> None:
+        """Give up a key whose request failed, so a retry runs it afresh."""
+        try:
+            db.rollback()
+            db.query(IdempotencyKey).filter(*_row_filter(scope), IdempotencyKey.status == IN_PROGRESS) \
+                .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            self._finish(scope)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+class IdempotentRequest:
+    """Handed to an endpoint by the `idempotency` dependency; the endpoint
+    returns `idem.save(result)` so the dependency can store the response
+    (unless it is not final yet, see UNSETTLED_STATUSES)."""
+
+    def __init__(self, scope: Optional[Scope], request_hash: str, status_code: int) -> None:
+        self.scope = scope
+        self.request_hash = request_hash
+        self.status_code = status_code
+        self.response: Any = None
+        self.saved = False
+
+    def save(self, result: Any) -> Any:
+        self.response = jsonable_encoder(result)
+        self.saved = not (isinstance(self.response, dict) and self.response.get("status") in UNSETTLED_STATUSES)
+        return result
+
+
+idempotency_store = IdempotencyStore()
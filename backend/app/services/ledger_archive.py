@@ -0,0 +1,214 @@
+"""Monthly partitions and archival for the append-only ledger and event_logs tables.
+
+On Postgres both tables are RANGE-partitioned by month on created_at (see
+migration e1f2a3b4c5d6); `ensure_partitions` creates the upcoming months ahead
+of time so new rows never land in the DEFAULT partition. SQLite has no
+partitions; the same archival job keeps its tables small instead.
+
+`archive_closed_periods` moves every month older than the hot window into a
+compressed `archive_snapshots` row and removes it from the live table (on
+Postgres by dropping the month's partition). For the ledger it writes, at the
+start of the next month, one carried-forward opening-balance entry per owner
+and asset, so summing the live ledger (ledger_totals, verify/rebuild) is still
+exact while only hot months are scanned. Materialized balances are unchanged.
+
+Run from backend/ with:
+    python -m app.services.ledger_archive partitions
+    python -m app.services.ledger_archive archive
+"""
+import argparse
+import hashlib
+import json
+import sys
+import zlib
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Iterator, List, Optional
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.archive_snapshot import ArchiveSnapshot
+from app.models.event_log import EventLog
+from app.models.ledger import Ledger
+from app.services import unit_of_work
+from app.services.balance_service import MERCHANT, ledger_totals
+from app.services.ledger_service import _new_entry
+
+PARTITIONED_TABLES = ("ledger", "event_logs")
+_MODELS = {"ledger": Ledger, "event_logs": EventLog}
+_HOT_MONTHS = {"ledger": lambda: settings.LEDGER_HOT_MONTHS,
+               "event_logs": lambda: settings.EVENT_LOG_HOT_MONTHS}
+
+
+def month_start(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(start: datetime, months: int) -> datetime:
+    index = start.year * 12 + start.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, start: datetime) -> str:
+    return f"{table}_y{start:%Y}m{start:%m}"
+
+
+def partition_ddl(table: str, start: datetime) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{add_months(start, 1):%Y-%m-%d}')"
+    )
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def ensure_partitions(db: Session, now: Optional[datetime] = None,
+                      months_ahead: Optional[int] = None) -> List[str]:
+    """Create this month's and the next `months_ahead` partitions. No-op off Postgres."""
+    if not _is_postgres(db):
+        return []
+    months_ahead = settings.PARTITION_PREMAKE_MONTHS if months_ahead is None else months_ahead
+    current = month_start(now or _utcnow())
+    created = []
+    for table in PARTITIONED_TABLES:
+        for offset in range(months_ahead + 1):
+            start = add_months(current, offset)
+            db.execute(text(partition_ddl(table, start)))
+            created.append(partition_name(table, start))
+    db.commit()
+    return created
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot archive value of type {type(value).__name__}")
+
+
+def _compress_rows(rows: Iterator[dict]):
+    """zlib-compressed JSON lines, the SHA-256 of the raw bytes, and the row count."""
+    compressor, digest, count, chunks = zlib.compressobj(9), hashlib.sha256(), 0, []
+    for row in rows:
+        line = json.dumps(row, default=_json_default, sort_keys=True).encode("utf-8") + b"\n"
+        digest.update(line)
+        chunks.append(compressor.compress(line))
+        count += 1
+    chunks.append(compressor.flush())
+    return b"".join(chunks), digest.hexdigest(), count
+
+
+def read_snapshot(snapshot: ArchiveSnapshot) -> List[dict]:
+    """The archived rows, after checking them against the stored checksum."""
+    raw = zlib.decompress(snapshot.payload)
+    if hashlib.sha256(raw).hexdigest() != snapshot.checksum:
+        raise ValueError(f"Archive snapshot {snapshot.id} failed its checksum")
+    return [json.loads(line) for line in raw.splitlines()]
+
+
+def _carry_forward(db: Session, period_end: datetime) -> int:
+    """Write one opening-balance entry per owner/asset for everything before period_end."""
+    opening = []
+    for (owner_type, owner_id, asset_code), total in sorted(ledger_totals(db, before=period_end).items()):
+        if total == 0:
+            continue
+        entry = _new_entry(
+            merchant_id=owner_id if owner_type == MERCHANT else None,
+            user_id=None if owner_type == MERCHANT else owner_id,
+            entry_type="credit" if total > 0 else "debit", amount=abs(total), new_balance=total,
+            asset_code=asset_code, transaction_id=None,
+            description=f"Opening balance carried forward to {period_end:%Y-%m}",
+        )
+        entry.created_at = period_end
+        opening.append(entry)
+    db.add_all(opening)
+    return len(opening)
+
+
+def _drop_partition(db: Session, table: str, start: datetime) -> None:
+    name = partition_name(table, start)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        db.execute(text(f"DROP TABLE {name}"))
+
+
+def _archive_month(db: Session, table: str, start: datetime) -> Optional[dict]:
+    model = _MODELS[table]
+    end = add_months(start, 1)
+    in_period = (model.created_at >= start, model.created_at < end)
+    with unit_of_work.transition(db):
+        rows = db.execute(
+            select(model.__table__).where(*in_period).order_by(model.created_at, model.id)
+            .execution_options(yield_per=1000)
+        ).mappings()
+        payload, checksum, count = _compress_rows(dict(row) for row in rows)
+        if count == 0:
+            return None  # nothing before this month is live either, so nothing to carry
+        opening = _carry_forward(db, end) if table == "ledger" else 0
+        db.add(ArchiveSnapshot(table_name=table, period_start=start, period_end=end, row_count=count,
+                               opening_entries=opening, payload=payload, checksum=checksum))
+        db.flush()
+        if _is_postgres(db):
+            _drop_partition(db, table, start)
+        # Rows of this month that were not in a dedicated partition (SQLite, or
+        # Postgres' DEFAULT partition).
+        db.execute(delete(model).where(*in_period))
+    return {"table": table, "period": f"{start:%Y-%m}", "rows": count,
+            "opening_entries": opening, "compressed_bytes": len(payload)}
+
+
+def archive_closed_periods(db: Session, now: Optional[datetime] = None) -> List[dict]:
+    """Archive every month older than the table's hot window, oldest first.
+
+    Each month is its own transaction; a failure leaves earlier months
+    archived and the failing month untouched.
+    """
+    current = month_start(now or _utcnow())
+    archived = []
+    for table in PARTITIONED_TABLES:
+        model = _MODELS[table]
+        cutoff = add_months(current, -_HOT_MONTHS[table]())
+        oldest = db.query(func.min(model.created_at)).filter(model.created_at < cutoff).scalar()
+        if oldest is None:
+            continue
+        start = month_start(oldest)
+        while start < cutoff:
+            result = _archive_month(db, table, start)
+            if result is not None:
+                archived.append(result)
+            start = add_months(start, 1)
+    return archived
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Manage ledger/event_logs partitions and archives.")
+    parser.add_argument("command", choices=("partitions", "archive"))
+    args = parser.parse_args(argv)
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "partitions":
+            created = ensure_partitions(db)
+            print(f"Ensured {len(created)} partition(s)" if created else "Not on Postgres; nothing to do")
+            return 0
+        for result in archive_closed_periods(db):
+            print(f"ARCHIVED {result['table']} {result['period']}: {result['rows']} row(s), "
+                  f"{result['opening_entries']} opening entr(ies), {result['compressed_bytes']} bytes")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,46 @@
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional, Tuple
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case
 
 from app.models.ledger import Ledger
+from app.services.balance_service import MERCHANT, USER, get_owner_balance, lock_balance, lock_balances
+from app.services import unit_of_work
 from app.services.units import to_base_units, from_base_units
 
 
+class JournalLeg(BaseModel):
+    """One side of a journal posting against a merchant or consumer-wallet owner."""
+    owner_type: str  # MERCHANT | USER
+    owner_id: str
+    entry_type: str  # debit | credit
+    amount: Decimal
+    asset_code: str = "USD"
+    description: Optional[str] = None
+    # Reject the whole journal if this leg would take the owner below zero.
+    check_funds: bool = False
+
+
+def merchant_leg(merchant_id: str, entry_type: str, amount: Decimal, description: Optional[str] = None,
+                 asset_code: str = "USD", check_funds: bool = False) -> JournalLeg:
+    return JournalLeg(owner_type=MERCHANT, owner_id=merchant_id, entry_type=entry_type, amount=amount,
+                      asset_code=asset_code, description=description, check_funds=check_funds)
+
+
+def wallet_leg(user_id: str, entry_type: str, amount: Decimal, description: Optional[str] = None,
+               asset_code: str = "USD", check_funds: bool = False) -> JournalLeg:
+    return JournalLeg(owner_type=USER, owner_id=user_id, entry_type=entry_type, amount=amount,
+                      asset_code=asset_code, description=description, check_funds=check_funds)
+
+
 def get_balance(db: Session, merchant_id: str, asset_code: str = "USD") -> Decimal:
     """Balance for a merchant in a given asset.
 
-    USD sums the legacy Decimal `amount` column (exact at 2 decimals); other
-    assets sum integer `amount_base_units` and convert back. Always filtered by
+    Reads the materialized `balances` row maintained alongside every ledger
+    write, so the cost is constant regardless of ledger size. Always keyed by
     asset so USD and stablecoin balances never mix.
     """
-    col = Ledger.amount if asset_code == "USD" else Ledger.amount_base_units
-    result = db.query(
-        func.sum(case((Ledger.entry_type == "credit", col), else_=-col))
-    ).filter(
-        Ledger.merchant_id == merchant_id,
-        Ledger.asset_code == asset_code,
-    ).scalar()
-    if result is None:
-        return Decimal("0")
-    if asset_code == "USD":
-        return Decimal(str(result))
-    return from_base_units(int(result), asset_code)
+    return get_owner_balance(db, MERCHANT, merchant_id, asset_code)
 
 
 def _new_entry(
@@ -49,6 +64,99 @@ def _new_entry(
     )
 
 
+def post_journal(
+    db: Session,
+    legs: List[JournalLeg],
+    transaction_id: Optional[str] = None,
+    commit: bool = True,
+) -> List[Ledger]:
+    """Write every leg of a transfer atomically, in one DB transaction.
+
+    The balance rows of all owners involved are locked (SELECT ... FOR UPDATE)
+    in a deterministic order before anything is written, so concurrent
+    postings against the same owner serialize instead of racing on a stale
+    read, and two journals touching the same pair of owners cannot deadlock.
+    Funds checks run against the locked balances before any leg is applied, so
+    a rejected journal writes nothing.
+
+    With commit=False (or inside a unit_of_work transition) the legs are
+    flushed but left for the caller to commit alongside its own changes.
+    """
+    _validate_legs(legs)
+    keys = sorted({(leg.owner_type, leg.owner_id, leg.asset_code) for leg in legs})
+    rows = {key: lock_balance(db, *key) for key in keys}
+    entries = _apply_legs(rows, legs, transaction_id)
+    db.add_all(entries)
+    if commit:
+        unit_of_work.commit(db)
+    else:
+        db.flush()
+    return entries
+
+
+def post_journals(
+    db: Session,
+    journals: List[Tuple[List[JournalLeg], Optional[str]]],
+    commit: bool = True,
+) -> List[List[Ledger]]:
+    """post_journal for many (legs, transaction_id) journals in one go.
+
+    Every balance row involved is locked up front with lock_balances, then
+    the journals are applied in order, each funds-checked against the running
+    balances exactly as consecutive post_journal calls would be. A rejected
+    journal raises and, like post_journal, leaves the caller to roll back.
+    """
+    for legs, _ in journals:
+        _validate_legs(legs)
+    rows = lock_balances(db, {(leg.owner_type, leg.owner_id, leg.asset_code)
+                              for legs, _ in journals for leg in legs})
+    posted = [_apply_legs(rows, legs, transaction_id) for legs, transaction_id in journals]
+    db.add_all([entry for entries in posted for entry in entries])
+    if commit:
+        unit_of_work.commit(db)
+    else:
+        db.flush()
+    return posted
+
+
+def _validate_legs(legs: List[JournalLeg]) -> None:
+    if not legs:
+        raise ValueError("Journal must have at least one leg")
+    for leg in legs:
+        if leg.entry_type not in ("debit", "credit"):
+            raise ValueError(f"Invalid entry type: {leg.entry_type}")
+        if leg.amount <= 0:
+            raise ValueError("Journal leg amount must be positive")
+
+
+def _apply_legs(rows: dict, legs: List[JournalLeg], transaction_id: Optional[str]) -> List[Ledger]:
+    """Funds-check one journal against the locked rows, then update them and build its entries."""
+    net = {(leg.owner_type, leg.owner_id, leg.asset_code): 0 for leg in legs}
+    for leg in legs:
+        units = to_base_units(leg.amount, leg.asset_code)
+        net[(leg.owner_type, leg.owner_id, leg.asset_code)] += units if leg.entry_type == "credit" else -units
+    for leg in legs:
+        key = (leg.owner_type, leg.owner_id, leg.asset_code)
+        if leg.check_funds and int(rows[key].balance_base_units or 0) + net[key] < 0:
+            raise ValueError("Insufficient wallet balance" if leg.owner_type == USER else "Insufficient balance")
+
+    entries = []
+    for leg in legs:
+        row = rows[(leg.owner_type, leg.owner_id, leg.asset_code)]
+        units = to_base_units(leg.amount, leg.asset_code)
+        row.balance_base_units = int(row.balance_base_units or 0) + (
+            units if leg.entry_type == "credit" else -units
+        )
+        entries.append(_new_entry(
+            merchant_id=leg.owner_id if leg.owner_type == MERCHANT else None,
+            user_id=leg.owner_id if leg.owner_type == USER else None,
+            entry_type=leg.entry_type, amount=leg.amount,
+            new_balance=from_base_units(int(row.balance_base_units), leg.asset_code),
+            asset_code=leg.asset_code, transaction_id=transaction_id, description=leg.description,
+        ))
+    return entries
+
+
 def record_debit(
     db: Session,
     merchant_id: str,
@@ -56,17 +164,10 @@ def record_debit(
     transaction_id: Optional[str] = None,
     description: Optional[str] = None,
     asset_code: str = "USD",
+    check_funds: bool = False,
 ) -> Ledger:
-    current_balance = get_balance(db, merchant_id, asset_code)
-    entry = _new_entry(
-        merchant_id=merchant_id, user_id=None, entry_type="debit",
-        amount=amount, new_balance=current_balance - amount, asset_code=asset_code,
-        transaction_id=transaction_id, description=description,
-    )
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
-    return entry
+    leg = merchant_leg(merchant_id, "debit", amount, description, asset_code, check_funds=check_funds)
+    return post_journal(db, [leg], transaction_id)[0]
 
 
 def record_credit(
@@ -77,16 +178,8 @@ def record_credit(
     description: Optional[str] = None,
     asset_code: str = "USD",
 ) -> Ledger:
-    current_balance = get_balance(db, merchant_id, asset_code)
-    entry = _new_entry(
-        merchant_id=merchant_id, user_id=None, entry_type="credit",
-        amount=amount, new_balance=current_balance + amount, asset_code=asset_code,
-        transaction_id=transaction_id, description=description,
-    )
-    db.add(entry)
-    db.commit()
-    db.refresh(entry)
-    return entry
+    leg = merchant_leg(merchant_id, "credit", amount, description, asset_code)
+    return post_journal(db, [leg], transaction_id)[0]
 
 
 def _entry_amount(entry: Ledger) -> Decimal:
@@ -1,9 +1,36 @@
-from typing import Optional
+from typing import Dict, Iterable, Optional
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.merchant import Merchant
 from app.schemas.merchant import MerchantCreate, MerchantUpdate, MerchantResponse, KYBSubmit
+from app.services import description_service
 from app.services.event_service import log_event
+from app.utils.ttl_cache import TTLCache
+
+# Process-level merchant display-name cache (MERCHANT_NAME_CACHE_ENABLED).
+# Invalidated by update_merchant; other instances see renames after the TTL.
+merchant_name_cache = TTLCache(maxsize=settings.MERCHANT_NAME_CACHE_SIZE,
+                               ttl=settings.MERCHANT_NAME_CACHE_TTL_SECONDS)
+
+
+def get_merchant_names(db: Session, merchant_ids: Iterable[str]) -> Dict[str, str]:
+    """Resolve merchant display names with at most one IN query."""
+    ids = {m for m in merchant_ids if m}
+    names: Dict[str, str] = {}
+    if settings.MERCHANT_NAME_CACHE_ENABLED:
+        for merchant_id in ids:
+            name = merchant_name_cache.get(merchant_id)
+            if name is not None:
+                names[merchant_id] = name
+    missing = ids - names.keys()
+    if missing:
+        rows = db.query(Merchant.id, Merchant.name).filter(Merchant.id.in_(missing)).all()
+        for merchant_id, name in rows:
+            names[merchant_id] = name
+            if settings.MERCHANT_NAME_CACHE_ENABLED:
+                merchant_name_cache.set(merchant_id, name)
+    return names
 
 
 def create_merchant(db: Session, payload: MerchantCreate) -> MerchantResponse:
@@ -39,6 +66,8 @@ def update_merchant(db: Session, merchant_id: str, payload: MerchantUpdate) -> O
 
     db.commit()
     db.refresh(merchant)
+    merchant_name_cache.pop(merchant.id)
+    description_service.description_engine.invalidate_merchant(merchant.id)
     log_event(db, "merchant.updated", "merchant_service", merchant.id)
     return MerchantResponse.model_validate(merchant)
 
@@ -1,15 +1,36 @@
+"""Transaction notifications (email via SMTP relay, SMS via Brevo).
+
+notify_transaction only renders the messages and writes them to the
+notification_outbox table, so a payment request never waits on an SMTP
+handshake or the Brevo API. NotificationDispatcher drains the outbox in
+batches on a background thread, over one persistent SMTP connection and one
+keep-alive httpx.Client, retrying failed sends with exponential backoff.
+Delivery is at-least-once: a crash between send and commit resends the batch.
+"""
 import logging
 import smtplib
 import ssl
-from datetime import datetime, timezone
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from typing import Callable, Optional
+
 from sqlalchemy.orm import Session
 
 from app.config import settings
+from app.models.notification_outbox import NotificationOutbox
+from app.services import unit_of_work
 
 logger = logging.getLogger(__name__)
 
+BREVO_SMS_URL = "https://api.brevo.com/v3/transactionalSMS/sms"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 def notify_transaction(
     db: Session,
@@ -27,103 +48,137 @@ def notify_transaction(
     if not user:
         return
 
-    _send_email(
-        to_email=user.email,
-        name=user.email,
-        status=status,
-        amount=amount,
-        merchant_name=merchant_name,
-        rail=rail,
-        description=description,
-    )
+    queued = 0
+    if settings.SMTP_USERNAME and settings.SMTP_PASSWORD:
+        subject, html_content = _render_email(
+            name=user.email, status=status, amount=amount,
+            merchant_name=merchant_name, rail=rail, description=description,
+        )
+        db.add(NotificationOutbox(
+            channel="email", recipient=user.email, subject=subject, body=html_content,
+            transaction_id=txn_id, next_attempt_at=_utcnow(),
+        ))
+        queued += 1
+    else:
+        logger.debug("notification_service: SMTP credentials not configured, skipping email")
 
     if user.phone:
-        _send_sms(
-            to_phone=user.phone,
-            status=status,
-            amount=amount,
-            merchant_name=merchant_name,
-        )
+        if settings.BREVO_API_KEY:
+            db.add(NotificationOutbox(
+                channel="sms", recipient=user.phone,
+                body=_render_sms(status=status, amount=amount, merchant_name=merchant_name),
+                transaction_id=txn_id, next_attempt_at=_utcnow(),
+            ))
+            queued += 1
+        else:
+            logger.debug("notification_service: BREVO_API_KEY not configured, skipping SMS")
+
+    if queued:
+        # Inside a settlement transition the rows commit with it.
+        unit_of_work.commit(db)
+        dispatcher.record("enqueued", queued)
+        unit_of_work.after_commit(db, dispatcher.wake)
 
 
-def _send_email(
-    to_email: str,
+def _render_email(
     name: str,
     status: str,
     amount: float,
     merchant_name: str,
     rail: str,
     description: str | None,
-) -> None:
-    if not settings.SMTP_USERNAME or not settings.SMTP_PASSWORD:
-        logger.debug("notification_service: SMTP credentials not configured, skipping email")
-        return
+) -> tuple[str, str]:
+    timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    subject = f"Transaction {status.upper()}: ${amount:,.2f} to {merchant_name}"
+    html_content = f"""
+    <html><body>
+    <h2>PayRails Transaction Notification</h2>
+    <p>Hello {name},</p>
+    <p>Your transaction has been <strong>{status}</strong>.</p>
+    <table style="border-collapse:collapse;width:100%">
+      <tr><td style="padding:8px;border:1px solid #ddd"><strong>Amount</strong></td>
+          <td style="padding:8px;border:1px solid #ddd">${amount:,.2f}</td></tr>
+      <tr><td style="padding:8px;border:1px solid #ddd"><strong>Merchant</strong></td>
+          <td style="padding:8px;border:1px solid #ddd">{merchant_name}</td></tr>
+      <tr><td style="padding:8px;border:1px solid #ddd"><strong>Rail</strong></td>
+          <td style="padding:8px;border:1px solid #ddd">{rail.upper()}</td></tr>
+      <tr><td style="padding:8px;border:1px solid #ddd"><strong>Status</strong></td>
+          <td style="padding:8px;border:1px solid #ddd">{status}</td></tr>
+      {"<tr><td style='padding:8px;border:1px solid #ddd'><strong>Description</strong></td><td style='padding:8px;border:1px solid #ddd'>" + description + "</td></tr>" if description else ""}
+      <tr><td style="padding:8px;border:1px solid #ddd"><strong>Timestamp</strong></td>
+          <td style="padding:8px;border:1px solid #ddd">{timestamp}</td></tr>
+    </table>
+    <p style="color:#888;font-size:12px;margin-top:24px">
+      MVP Demo Environment — All transactions are simulated.
+    </p>
+    </body></html>
+    """
+    return subject, html_content
 
-    try:
-        timestamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-        subject = f"Transaction {status.upper()}: ${amount:,.2f} to {merchant_name}"
-        html_content = f"""
-        <html><body>
-        <h2>PayRails Transaction Notification</h2>
-        <p>Hello {name},</p>
-        <p>Your transaction has been <strong>{status}</strong>.</p>
-        <table style="border-collapse:collapse;width:100%">
-          <tr><td style="padding:8px;border:1px solid #ddd"><strong>Amount</strong></td>
-              <td style="padding:8px;border:1px solid #ddd">${amount:,.2f}</td></tr>
-          <tr><td style="padding:8px;border:1px solid #ddd"><strong>Merchant</strong></td>
-              <td style="padding:8px;border:1px solid #ddd">{merchant_name}</td></tr>
-          <tr><td style="padding:8px;border:1px solid #ddd"><strong>Rail</strong></td>
-              <td style="padding:8px;border:1px solid #ddd">{rail.upper()}</td></tr>
-          <tr><td style="padding:8px;border:1px solid #ddd"><strong>Status</strong></td>
-              <td style="padding:8px;border:1px solid #ddd">{status}</td></tr>
-          {"<tr><td style='padding:8px;border:1px solid #ddd'><strong>Description</strong></td><td style='padding:8px;border:1px solid #ddd'>" + description + "</td></tr>" if description else ""}
-          <tr><td style="padding:8px;border:1px solid #ddd"><strong>Timestamp</strong></td>
-              <td style="padding:8px;border:1px solid #ddd">{timestamp}</td></tr>
-        </table>
-        <p style="color:#888;font-size:12px;margin-top:24px">
-          MVP Demo Environment — All transactions are simulated.
-        </p>
-        </body></html>
-        """
-
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = f"{settings.SENDER_NAME} <{settings.FROM_ADDR}>"
-        msg["To"] = to_email
-        msg.attach(MIMEText(html_content, "html"))
 
+def _render_sms(status: str, amount: float, merchant_name: str) -> str:
+    return f"PayRails: Your ${amount:,.2f} payment to {merchant_name} {status}."
+
+
+# ----------------------------------------------------------------- transports
+
+class SmtpConnection:
+    """One logged-in SMTP session reused across sends; reconnects once when dropped."""
+
+    def __init__(self, factory: Optional[Callable[[], smtplib.SMTP]] = None) -> None:
+        self._factory = factory or self._connect
+        self._server: Optional[smtplib.SMTP] = None
+        self.connects = 0
+
+    @staticmethod
+    def _connect() -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
         if settings.SMTP_USE_TLS:
-            context = ssl.create_default_context()
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls(context=context)
-                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-                server.sendmail(settings.FROM_ADDR, to_email, msg.as_string())
-        else:
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-                server.sendmail(settings.FROM_ADDR, to_email, msg.as_string())
+            server.starttls(context=ssl.create_default_context())
+        server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+        return server
 
-        logger.info("Email sent to %s for txn status=%s", to_email, status)
-    except Exception as e:
-        logger.warning("notification_service: email send failed: %s", e)
+    def sendmail(self, from_addr: str, to_addr: str, message: str) -> None:
+        for attempt in (1, 2):
+            if self._server is None:
+                self._server = self._factory()
+                self.connects += 1
+            try:
+                self._server.sendmail(from_addr, to_addr, message)
+                return
+            except smtplib.SMTPServerDisconnected:
+                # Relay closed an idle connection; reconnect once and resend.
+                self._server = None
+                if attempt == 2:
+                    raise
 
+    def close(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
 
-def _send_sms(
-    to_phone: str,
-    status: str,
-    amount: float,
-    merchant_name: str,
-) -> None:
-    if not settings.BREVO_API_KEY:
-        logger.debug("notification_service: BREVO_API_KEY not configured, skipping SMS")
-        return
 
+def _send_email(smtp: SmtpConnection, to_email: str, subject: str, html_content: str) -> None:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = f"{settings.SENDER_NAME} <{settings.FROM_ADDR}>"
+    msg["To"] = to_email
+    msg.attach(MIMEText(html_content, "html"))
     try:
-        import httpx
+        smtp.sendmail(settings.FROM_ADDR, to_email, msg.as_string())
+    except Exception as e:
+        logger.warning("notification_service: email send failed: %s", e)
+        raise
+    logger.info("Email sent to %s", to_email)
+
 
-        message = f"PayRails: Your ${amount:,.2f} payment to {merchant_name} {status}."
-        response = httpx.post(
-            "https://api.brevo.com/v3/transactionalSMS/sms",
+def _send_sms(client, to_phone: str, message: str) -> None:
+    try:
+        response = client.post(
+            BREVO_SMS_URL,
             json={
                 "sender": settings.BREVO_SMS_SENDER,
                 "recipient": to_phone,
@@ -133,10 +188,9 @@ def _send_sms(
                 "api-key": settings.BREVO_API_KEY,
                 "Content-Type": "application/json",
             },
-            timeout=10,
         )
         response.raise_for_status()
-        logger.info("SMS sent to %s for status=%s", to_phone, status)
+        logger.info("SMS sent to %s", to_phone)
     except Exception as e:
         response_body = getattr(getattr(e, 'response', None), 'text', None)
         if response_body:
@@ -146,3 +200,176 @@ def _send_sms(
             )
         else:
             logger.warning("notification_service: SMS send failed: %s", e)
+        raise
+
+
+# ----------------------------------------------------------------- dispatcher
+
+class NotificationDispatcher:
+    """Drains notification_outbox in batches on a background thread.
+
+    Also usable synchronously (dispatch_batch) from the /tasks worker endpoint
+    or tests. Counters are process-local; see metrics().
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 smtp: Optional[SmtpConnection] = None, http_client=None) -> None:
+        self._session_factory = session_factory
+        self._smtp = smtp
+        self._http_client = http_client
+        self._send_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {
+            "enqueued": 0, "sent": 0, "failed": 0, "retried": 0, "dead": 0, "batches": 0,
+        }
+        self._last_batch_seconds = 0.0
+
+    # -- transports (lazy, shared across batches) --
+
+    def _get_smtp(self) -> SmtpConnection:
+        if self._smtp is None:
+            self._smtp = SmtpConnection()
+        return self._smtp
+
+    def _get_http_client(self):
+        if self._http_client is None:
+            import httpx
+
+            self._http_client = httpx.Client(
+                timeout=10, limits=httpx.Limits(max_keepalive_connections=5),
+            )
+        return self._http_client
+
+    # -- metrics --
+
+    def record(self, counter: str, n: int = 1) -> None:
+        with self._counter_lock:
+            self._counters[counter] += n
+
+    def metrics(self, db: Optional[Session] = None) -> dict:
+        with self._counter_lock:
+            snapshot = dict(self._counters)
+        snapshot["last_batch_seconds"] = round(self._last_batch_seconds, 4)
+        snapshot["smtp_connects"] = self._smtp.connects if self._smtp else 0
+        snapshot["running"] = bool(self._thread and self._thread.is_alive())
+        if db is not None:
+            snapshot["pending"] = db.query(NotificationOutbox).filter(
+                NotificationOutbox.status == "pending"
+            ).count()
+        return snapshot
+
+    # -- dispatch --
+
+    def _retry_delay(self, attempts: int) -> timedelta:
+        seconds = settings.NOTIFICATION_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+        return timedelta(seconds=min(seconds, settings.NOTIFICATION_RETRY_MAX_SECONDS))
+
+    def _deliver(self, row: NotificationOutbox) -> None:
+        if row.channel == "email":
+            _send_email(self._get_smtp(), row.recipient, row.subject or "", row.body)
+        elif row.channel == "sms":
+            _send_sms(self._get_http_client(), row.recipient, row.body)
+        else:
+            raise ValueError(f"Unknown notification channel: {row.channel}")
+
+    def dispatch_batch(self, db: Session, limit: Optional[int] = None) -> int:
+        """Send up to `limit` due notifications. Returns the number handled."""
+        with self._send_lock:
+            started = time.monotonic()
+            now = _utcnow()
+            query = (
+                db.query(NotificationOutbox)
+                .filter(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now)
+                .order_by(NotificationOutbox.next_attempt_at)
+                .limit(limit or settings.NOTIFICATION_BATCH_SIZE)
+            )
+            if db.get_bind().dialect.name == "postgresql":
+                # Several instances may drain the same outbox.
+                query = query.with_for_update(skip_locked=True)
+            rows = query.all()
+            if not rows:
+                db.rollback()
+                return 0
+
+            for row in rows:
+                row.attempts += 1
+                try:
+                    self._deliver(row)
+                except Exception as e:
+                    row.last_error = str(e)[:500]
+                    self.record("failed")
+                    if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+                        row.status = "dead"
+                        self.record("dead")
+                    else:
+                        row.next_attempt_at = now + self._retry_delay(row.attempts)
+                        self.record("retried")
+                else:
+                    row.status = "sent"
+                    row.sent_at = _utcnow()
+                    row.last_error = None
+                    self.record("sent")
+            db.commit()
+            self.record("batches")
+            self._last_batch_seconds = time.monotonic() - started
+            return len(rows)
+
+    def drain(self, db: Session) -> int:
+        """Dispatch batches until nothing is due."""
+        total = 0
+        while True:
+            handled = self.dispatch_batch(db)
+            if not handled:
+                return total
+            total += handled
+
+    # -- background thread --
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _new_session(self) -> Session:
+        if self._session_factory is not None:
+            return self._session_factory()
+        from app.database import SessionLocal
+        return SessionLocal()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=settings.NOTIFICATION_POLL_SECONDS)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            db = self._new_session()
+            try:
+                self.drain(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning("notification_service: dispatch failed: %s", e)
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        if self._smtp is not None:
+            self._smtp.close()
+        if self._http_client is not None:
+            self._http_client.close()
+            self._http_client = None
+
+
+dispatcher = NotificationDispatcher()
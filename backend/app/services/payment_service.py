@@ -1,50 +1,71 @@
-from decimal import Decimal
 from typing import Optional, Tuple, List
 from sqlalchemy.orm import Session
 
 from app.models.transaction import Transaction
 from app.models.merchant import Merchant
 from app.models.user import User
-from app.models.bank_config import BankConfig
 from app.schemas.transaction import PaymentCreate, PaymentResponse, PaymentListResponse
-from app.services.rail_selector import select_rail
-from app.services.bank.mock_bank import mock_bank_service
+from app.services.rail_selector import rail_router
 from app.services.bank.schemas import TransferRequest
-from app.services.ledger_service import record_debit, record_credit
-from app.services.wallet_service import wallet_credit
 from app.services.event_service import log_event
-from app.services import description_service, notification_service
+from app.services.merchant_service import get_merchant_names
+from app.services.settlement_service import submit_transfer
+from app.services import description_service, unit_of_work
+from app.utils.pagination import paginate
+
+
+def _user_display_name(user: User) -> str:
+    name_parts = [n for n in (user.first_name, user.last_name) if n]
+    return " ".join(name_parts) if name_parts else user.email
+
+
+def _enrich_responses(db: Session, txns: List[Transaction]) -> List[PaymentResponse]:
+    """Populate sender_name and receiver_name for a page of transactions.
+
+    All merchant and user ids on the page are resolved up front with one IN
+    query per table (merchant names may come from the process cache), so the
+    cost is constant in the page size.
+    """
+    merchant_ids = set()
+    user_ids = set()
+    for txn in txns:
+        if txn.sender_merchant_id:
+            merchant_ids.add(txn.sender_merchant_id)
+        elif txn.sender_user_id:
+            user_ids.add(txn.sender_user_id)
+        if txn.receiver_merchant_id:
+            merchant_ids.add(txn.receiver_merchant_id)
+        elif txn.receiver_user_id:
+            user_ids.add(txn.receiver_user_id)
+
+    merchant_names = get_merchant_names(db, merchant_ids)
+    user_names = {}
+    if user_ids:
+        users = db.query(User).filter(User.id.in_(user_ids)).all()
+        user_names = {u.id: _user_display_name(u) for u in users}
+
+    responses = []
+    for txn in txns:
+        sender_name = None
+        if txn.sender_merchant_id:
+            sender_name = merchant_names.get(txn.sender_merchant_id, txn.sender_merchant_id)
+        elif txn.sender_user_id:
+            sender_name = user_names.get(txn.sender_user_id, txn.sender_user_id)
+
+        receiver_name = None
+        if txn.receiver_merchant_id:
+            receiver_name = merchant_names.get(txn.receiver_merchant_id, txn.receiver_merchant_id)
+        elif txn.receiver_user_id:
+            receiver_name = user_names.get(txn.receiver_user_id, txn.receiver_user_id)
+
+        resp = PaymentResponse.model_validate(txn)
+        responses.append(resp.model_copy(update={"sender_name": sender_name, "receiver_name": receiver_name}))
+    return responses
 
 
 def _enrich_response(db: Session, txn: Transaction) -> PaymentResponse:
     """Populate sender_name and receiver_name from DB lookups."""
-    resp = PaymentResponse.model_validate(txn)
-
-    sender_name = None
-    if txn.sender_merchant_id:
-        m = db.query(Merchant).filter(Merchant.id == txn.sender_merchant_id).first()
-        sender_name = m.name if m else txn.sender_merchant_id
-    elif txn.sender_user_id:
-        u = db.query(User).filter(User.id == txn.sender_user_id).first()
-        if u:
-            name_parts = [n for n in (u.first_name, u.last_name) if n]
-            sender_name = " ".join(name_parts) if name_parts else u.email
-        else:
-            sender_name = txn.sender_user_id
-
-    receiver_name = None
-    if txn.receiver_merchant_id:
-        m = db.query(Merchant).filter(Merchant.id == txn.receiver_merchant_id).first()
-        receiver_name = m.name if m else txn.receiver_merchant_id
-    elif txn.receiver_user_id:
-        u = db.query(User).filter(User.id == txn.receiver_user_id).first()
-        if u:
-            name_parts = [n for n in (u.first_name, u.last_name) if n]
-            receiver_name = " ".join(name_parts) if name_parts else u.email
-        else:
-            receiver_name = txn.receiver_user_id
-
-    return resp.model_copy(update={"sender_name": sender_name, "receiver_name": receiver_name})
+    return _enrich_responses(db, [txn])[0]
 
 
 def create_payment(db: Session, payload: PaymentCreate) -> PaymentResponse:
@@ -66,20 +87,16 @@ def create_payment(db: Session, payload: PaymentCreate) -> PaymentResponse:
     if not receiver or receiver.onboarding_status != "active":
         raise ValueError("Receiver merchant not found or not active")
 
-    # Get bank config for rail selection
-    bank_config = db.query(BankConfig).filter(BankConfig.is_active == True).first()
-    if not bank_config:
-        raise ValueError("No active bank configuration found")
-
-    # Select rail
-    rail = select_rail(
-        amount=payload.amount,
-        supported_rails=bank_config.supported_rails,
-        preferred_rail=payload.preferred_rail,
-    )
+    # Select rail from the active bank config's compiled routing table
+    rail = rail_router.select_rail(db, payload.amount, preferred_rail=payload.preferred_rail)
     if not rail:
         raise ValueError("No suitable payment rail available for this amount")
 
+    # Generate AI description (user-provided takes priority)
+    generated_desc = description_service.generate_description(
+        receiver.name, float(payload.amount), rail, payload.description, merchant_id=receiver.id
+    )
+
     # Create transaction record
     txn = Transaction(
         sender_merchant_id=payload.sender_merchant_id,
@@ -91,16 +108,22 @@ def create_payment(db: Session, payload: PaymentCreate) -> PaymentResponse:
         rail=rail,
         status="processing",
         idempotency_key=payload.idempotency_key,
+        description=generated_desc,
     )
-    db.add(txn)
-    db.commit()
+    with unit_of_work.transition(db):
+        db.add(txn)
+        db.flush()
+        log_event(db, "payment.initiated", "payment_service", txn.id, {
+            "rail": rail, "amount": str(payload.amount),
+        })
     db.refresh(txn)
 
-    log_event(db, "payment.initiated", "payment_service", txn.id, {
-        "rail": rail, "amount": str(payload.amount),
-    })
+    description_service.enrich_later(
+        txn.id, generated_desc, receiver.name, float(payload.amount), rail, merchant_id=receiver.id
+    )
 
-    # Call mock bank
+    # Settle through the bank: inline, or in the background in async mode.
+    # Ledger legs, events and notifications are applied by settlement_service.
     transfer_request = TransferRequest(
         sender_account_id=payload.sender_bank_account_id or sender.id,
         receiver_account_id=payload.receiver_bank_account_id or receiver.id,
@@ -108,59 +131,7 @@ def create_payment(db: Session, payload: PaymentCreate) -> PaymentResponse:
         rail=rail,
         idempotency_key=payload.idempotency_key,
     )
-
-    result = mock_bank_service.initiate_transfer(transfer_request)
-
-    # Update transaction with result
-    txn.reference_id = result.reference_id
-    txn.status = result.status
-    txn.failure_reason = result.failure_reason
-    db.commit()
-
-    # Generate AI description (user-provided takes priority)
-    generated_desc = description_service.generate_description(
-        receiver.name, float(payload.amount), rail, payload.description
-    )
-    txn.description = generated_desc
-    db.commit()
-
-    # If completed, create ledger entries
-    if result.status == "completed":
-        # 0.05% discount for FedNow/RTP rails
-        if rail in ("fednow", "rtp"):
-            settled_amount = (payload.amount * Decimal("0.9995")).quantize(Decimal("0.01"))
-        else:
-            settled_amount = payload.amount
-        txn.amount = settled_amount
-        db.commit()
-        record_debit(db, payload.sender_merchant_id, settled_amount, txn.id, "Payment sent")
-        record_credit(db, payload.receiver_merchant_id, settled_amount, txn.id, "Payment received")
-
-        # If receiver merchant is linked to a consumer user, also credit their wallet
-        receiver_consumer = db.query(User).filter(
-            User.merchant_id == payload.receiver_merchant_id, User.role == "user"
-        ).first()
-        if receiver_consumer:
-            wallet_credit(db, receiver_consumer.id, settled_amount, txn.id,
-                          f"Payment received from merchant {payload.sender_merchant_id}")
-            txn.receiver_user_id = receiver_consumer.id
-            db.commit()
-
-        log_event(db, "payment.completed", "payment_service", txn.id)
-    elif result.status == "failed":
-        log_event(db, "payment.failed", "payment_service", txn.id, {
-            "reason": result.failure_reason,
-        })
-
-    # Send notification to sender user (if applicable)
-    sender_user = db.query(User).filter(User.merchant_id == payload.sender_merchant_id).first()
-    if sender_user:
-        notification_service.notify_transaction(
-            db, sender_user.id, txn.id, txn.status,
-            float(txn.amount), receiver.name, rail, txn.description,
-        )
-
-    db.refresh(txn)
+    txn = submit_transfer(db, txn, transfer_request)
     return _enrich_response(db, txn)
 
 
@@ -179,7 +150,16 @@ def list_payments(
     rail_filter: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    cursor: Optional[str] = None,
+    include_total: Optional[bool] = None,
 ) -> PaymentListResponse:
+    """List payments newest-first.
+
+    The first page and any `cursor` page use keyset pagination on
+    (created_at, id); `page` > 1 without a cursor falls back to OFFSET. The
+    total is counted for offset pages unless include_total is False, and for
+    cursor pages only when include_total is True.
+    """
     query = db.query(Transaction)
 
     if merchant_id:
@@ -197,19 +177,22 @@ def list_payments(
     if rail_filter:
         query = query.filter(Transaction.rail == rail_filter)
 
-    total = query.count()
-    items = (
-        query.order_by(Transaction.created_at.desc())
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+    if include_total is None:
+        include_total = not cursor
+    if cursor or page == 1:
+        result = paginate(query, page, page_size, keyset=(Transaction.created_at, Transaction.id),
+                          cursor=cursor, with_total=include_total)
+    else:
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+        result = paginate(query, page, page_size, with_total=include_total)
 
     return PaymentListResponse(
-        items=[_enrich_response(db, t) for t in items],
-        total=total,
+        items=_enrich_responses(db, result["items"]),
+        total=result["total"],
         page=page,
         page_size=page_size,
+        next_cursor=result["next_cursor"],
+        has_more=result["has_more"],
     )
 
 
@@ -220,9 +203,15 @@ def cancel_payment(db: Session, payment_id: str) -> PaymentResponse:
     if txn.status not in ("pending", "processing"):
         raise ValueError(f"Cannot cancel transaction in status: {txn.status}")
 
-    txn.status = "cancelled"
+    # Conditional on the status so a settlement finalizing concurrently is
+    # never overwritten (nor overwrites the cancel).
+    cancelled = db.query(Transaction).filter(
+        Transaction.id == txn.id, Transaction.status.in_(("pending", "processing")),
+    ).update({Transaction.status: "cancelled"}, synchronize_session=False)
     db.commit()
     db.refresh(txn)
+    if not cancelled:
+        raise ValueError(f"Cannot cancel transaction in status: {txn.status}")
 
     log_event(db, "payment.cancelled", "payment_service", txn.id)
     return _enrich_response(db, txn)
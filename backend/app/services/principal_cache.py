@@ -0,0 +1,78 @@
+"""Authenticated-principal snapshots for the request auth path.
+
+get_current_user resolves a token to a Principal (id, role, merchant_id,
+email) instead of a live User row. Snapshots are cached per process, keyed by
+(user id, token iat), so repeat requests with the same token skip the User
+query; a fresh login (new iat) always re-reads the row.
+
+Anything that changes a user's email, role or credentials must call
+invalidate_principal(user_id): it drops the cached snapshots and stops signed
+claims issued before that moment from being trusted. Other instances only see
+the change when their entries expire (AUTH_PRINCIPAL_CACHE_TTL_SECONDS).
+
+With AUTH_TRUST_TOKEN_CLAIMS, tokens that carry role and merchant_id claims
+(issued by /auth/login and /auth/refresh) are turned into a Principal with no
+DB lookup at all.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils.ttl_cache import TTLCache
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: str
+    role: str
+    merchant_id: Optional[str]
+    email: str
+
+
+principal_cache = TTLCache(maxsize=settings.AUTH_PRINCIPAL_CACHE_SIZE,
+                           ttl=settings.AUTH_PRINCIPAL_CACHE_TTL_SECONDS)
+
+# user id -> unix time of the last invalidation; claims issued at or before
+# it are not trusted.
+_not_before: Dict[str, float] = {}
+_not_before_lock = threading.Lock()
+
+
+def _key(claims: dict) -> tuple:
+    return claims["sub"], claims.get("iat")
+
+
+def _from_claims(claims: dict) -> Optional[Principal]:
+    if not settings.AUTH_TRUST_TOKEN_CLAIMS:
+        return None
+    if not {"role", "merchant_id", "email", "iat"} <= claims.keys():
+        return None
+    if claims["iat"] <= _not_before.get(claims["sub"], 0):
+        return None
+    return Principal(claims["sub"], claims["role"], claims["merchant_id"], claims["email"])
+
+
+def lookup(claims: dict) -> Optional[Principal]:
+    """Principal for a verified access token's claims, if known without a DB read."""
+    return principal_cache.get(_key(claims)) or _from_claims(claims)
+
+
+def remember(user, claims: dict) -> Principal:
+    principal = Principal(user.id, user.role, user.merchant_id, user.email)
+    principal_cache.set(_key(claims), principal)
+    return principal
+
+
+def invalidate_principal(user_id: str) -> None:
+    with _not_before_lock:
+        _not_before[user_id] = time.time()
+    principal_cache.discard_where(lambda key: key[0] == user_id)
+
+
+def reset() -> None:
+    """Forget every snapshot and invalidation mark (tests)."""
+    with _not_before_lock:
+        _not_before.clear()
+    principal_cache.clear()
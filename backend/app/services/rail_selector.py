@@ -1,31 +1,183 @@
+"""Rail selection for bank payments.
+
+`rail_router` keeps the active BankConfig rows compiled into an immutable
+routing table: per config, its supported rails in RAIL_PRIORITY order with
+their limits (the config's fednow/rtp/ach_limit columns, RAIL_LIMITS where a
+column is unset or for card). Payments route against the first active config
+without touching bank_configs. The table is rebuilt after a commit that
+inserted, updated or deleted a BankConfig in this process, and otherwise
+every RAIL_ROUTING_CACHE_TTL_SECONDS (changes made by other instances, bulk
+updates).
+
+With RAIL_ROUTING_STRATEGY="scored" the eligible rails are ranked by
+settlement cost (the instant-rail discount) plus the per-rail bank call
+latency observed by settlement_service, instead of by fixed priority. A
+preferred rail within its limit always wins.
+"""
+import threading
+import time
+from dataclasses import dataclass
 from decimal import Decimal
-from typing import Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 
+from app.config import settings
+from app.models.bank_config import BankConfig
 from app.services.bank.mock_bank import RAIL_LIMITS
 
 # Priority order: FedNow → RTP → ACH → Card
 RAIL_PRIORITY = ["fednow", "rtp", "ach", "card"]
 
+# Per-config limit columns; rails without one use RAIL_LIMITS.
+_LIMIT_COLUMNS = {"fednow": "fednow_limit", "rtp": "rtp_limit", "ach": "ach_limit"}
+
+# Settlement cost in basis points: instant rails settle at INSTANT_RAIL_RATE.
+RAIL_COST_BPS = {"fednow": 5, "rtp": 5, "ach": 0, "card": 0}
+
+_LATENCY_SMOOTHING = 0.2  # EWMA weight of the newest observation
+_DIRTY_KEY = "rail_routes_dirty"
+
+
+@dataclass(frozen=True)
+class Route:
+    """One bank config's supported rails, in priority order, with their limits."""
+    config_id: Optional[str]
+    rails: Tuple[Tuple[str, Decimal], ...]
+    limits: Mapping[str, Decimal]
+
+    def eligible(self, amount: Decimal) -> Tuple[str, ...]:
+        return tuple(rail for rail, limit in self.rails if amount <= limit)
+
+
+def compile_route(supported_rails: str, limits: Optional[Mapping[str, Optional[Decimal]]] = None,
+                  config_id: Optional[str] = None) -> Route:
+    """Parse a supported_rails CSV once and pair each rail with its limit."""
+    available = {r.strip() for r in (supported_rails or "").split(",")}
+    rails = []
+    for rail in RAIL_PRIORITY:
+        limit = (limits or {}).get(rail)
+        if limit is None:
+            limit = RAIL_LIMITS.get(rail)
+        if rail in available and limit:
+            rails.append((rail, Decimal(str(limit))))
+    return Route(config_id, tuple(rails), MappingProxyType(dict(rails)))
+
+
+def _config_route(config: BankConfig) -> Route:
+    limits = {rail: getattr(config, column) for rail, column in _LIMIT_COLUMNS.items()}
+    return compile_route(config.supported_rails, limits, config.id)
+
 
 def select_rail(
     amount: Decimal,
     supported_rails: str,
     preferred_rail: Optional[str] = None,
+    limits: Optional[Mapping[str, Optional[Decimal]]] = None,
 ) -> Optional[str]:
-    available = [r.strip() for r in supported_rails.split(",")]
+    """Highest-priority rail (or the preferred one) whose limit covers the amount."""
+    return _choose(compile_route(supported_rails, limits), amount, preferred_rail, None)
 
+
+def _choose(route: Route, amount: Decimal, preferred_rail: Optional[str],
+            latencies: Optional[Mapping[str, float]]) -> Optional[str]:
     # If a preferred rail is specified and valid, try it first
-    if preferred_rail and preferred_rail in available:
-        limit = RAIL_LIMITS.get(preferred_rail)
-        if limit and amount <= limit:
-            return preferred_rail
+    limit = route.limits.get(preferred_rail) if preferred_rail else None
+    if limit is not None and amount <= limit:
+        return preferred_rail
+
+    eligible = route.eligible(amount)
+    if not eligible:
+        return None
+    if latencies is None:
+        return eligible[0]
+    observed = [latencies[rail] for rail in eligible if rail in latencies]
+    default_ms = sum(observed) / len(observed) if observed else 0.0
+
+    def score(rail: str) -> float:
+        return (RAIL_COST_BPS.get(rail, 0) * settings.RAIL_ROUTING_COST_WEIGHT
+                + latencies.get(rail, default_ms) * settings.RAIL_ROUTING_LATENCY_WEIGHT)
+
+    return min(eligible, key=score)  # ties keep priority order
+
+
+class RailRouter:
+    def __init__(self, clock=time.monotonic) -> None:
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._routes: Optional[Tuple[Route, ...]] = None
+        self._loaded_at = 0.0
+        self._latency_ms: Dict[str, float] = {}
+
+    def routes(self, db: Session) -> Tuple[Route, ...]:
+        """The compiled table, reloaded from `db` when invalidated or past its TTL."""
+        routes = self._routes
+        if routes is not None and self._clock() - self._loaded_at < settings.RAIL_ROUTING_CACHE_TTL_SECONDS:
+            return routes
+        configs = (
+            db.query(BankConfig)
+            .filter(BankConfig.is_active == True)  # noqa: E712
+            .order_by(BankConfig.created_at, BankConfig.id)
+            .all()
+        )
+        routes = tuple(_config_route(config) for config in configs)
+        with self._lock:
+            self._routes, self._loaded_at = routes, self._clock()
+        return routes
+
+    def select_rail(self, db: Session, amount: Decimal, preferred_rail: Optional[str] = None) -> Optional[str]:
+        """Rail for a payment under the first active config.
+
+        Raises ValueError when no bank config is active.
+        """
+        routes = self.routes(db)
+        if not routes:
+            raise ValueError("No active bank configuration found")
+        latencies = self.latencies() if settings.RAIL_ROUTING_STRATEGY == "scored" else None
+        return _choose(routes[0], amount, preferred_rail, latencies)
+
+    def observe(self, rail: str, seconds: float) -> None:
+        """Fold one bank call's latency into the rail's moving average."""
+        ms = seconds * 1000
+        with self._lock:
+            previous = self._latency_ms.get(rail)
+            self._latency_ms[rail] = ms if previous is None else previous + _LATENCY_SMOOTHING * (ms - previous)
+
+    def latencies(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._latency_ms)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._routes = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes = None
+            self._latency_ms.clear()
+
+
+rail_router = RailRouter()
+
+
+def _mark_dirty(mapper, connection, target) -> None:
+    session = object_session(target)
+    if session is not None:
+        session.info[_DIRTY_KEY] = True
+
+
+for _event_name in ("after_insert", "after_update", "after_delete"):
+    event.listen(BankConfig, _event_name, _mark_dirty)
+
+
+@event.listens_for(Session, "after_commit")
+def _rebuild_after_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        rail_router.invalidate()
 
-    # Fall through priority order
-    for rail in RAIL_PRIORITY:
-        if rail not in available:
-            continue
-        limit = RAIL_LIMITS.get(rail)
-        if limit and amount <= limit:
-            return rail
 
-    return None
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
@@ -1,27 +1,202 @@
-"""Simple in-memory fixed-window rate limiter.
+"""Pluggable rate limiters: sliding-window log, token bucket and fixed window.
 
-Per-instance only (state is not shared across Cloud Run instances); adequate as a
-first line of abuse prevention. Production should front this with a shared store
-(Redis / Memorystore) or an API gateway for global limits.
+Every limiter answers `allow(key, max_requests, window_seconds)` and `clear()`.
+The in-memory implementations are per-instance and sweep idle keys once their
+window has passed, so memory tracks active clients rather than every client
+ever seen. RedisRateLimiter runs the same algorithms as single Lua scripts (or
+INCR for the fixed window) against a shared Redis, which makes limits global
+across Cloud Run instances.
+
+`rate_limiter` is built from RATE_LIMIT_BACKEND / RATE_LIMIT_ALGORITHM.
 """
+import logging
+import threading
 import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("sliding_window", "token_bucket", "fixed_window")
+
 
+class _InMemoryLimiter(ABC):
+    """Lock-guarded per-key state with a periodic sweep of expired keys."""
+
+    sweep_interval = 1.0
 
-class FixedWindowRateLimiter:
     def __init__(self):
-        self._hits = {}  # key -> (window_start, count)
+        self._state = {}  # key -> (expires_at, algorithm state)
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
 
-    def allow(self, key: str, max_requests: int, window_seconds: int, now: float = None) -> bool:
+    def allow(self, key: str, max_requests: int, window_seconds: float, now: float = None) -> bool:
         now = time.time() if now is None else now
-        window_start, count = self._hits.get(key, (now, 0))
-        if now - window_start >= window_seconds:
-            window_start, count = now, 0
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            _, state = self._state.get(key, (None, None))
+            allowed, state, expires_at = self._step(state, max_requests, window_seconds, now)
+            self._state[key] = (expires_at, state)
+            return allowed
+
+    @abstractmethod
+    def _step(self, state, max_requests: int, window_seconds: float, now: float):
+        """Returns (allowed, new state, when the key can be forgotten)."""
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, (expires_at, _) in self._state.items() if expires_at <= now]
+        for key in expired:
+            del self._state[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def clear(self) -> None:
+        with self._lock:
+            self._state.clear()
+            self._next_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+
+class SlidingWindowRateLimiter(_InMemoryLimiter):
+    """At most max_requests in any window_seconds span; no boundary bursts."""
+
+    def _step(self, hits, max_requests, window_seconds, now):
+        hits = hits if hits is not None else deque()
+        while hits and hits[0] <= now - window_seconds:
+            hits.popleft()
+        allowed = len(hits) < max_requests
+        if allowed:
+            hits.append(now)
+        return allowed, hits, (hits[-1] if hits else now) + window_seconds
+
+
+class TokenBucketRateLimiter(_InMemoryLimiter):
+    """Bursts up to max_requests, refilled at max_requests per window_seconds."""
+
+    def _step(self, bucket, max_requests, window_seconds, now):
+        tokens, updated = bucket if bucket is not None else (float(max_requests), now)
+        rate = max_requests / window_seconds
+        tokens = min(float(max_requests), tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Once the bucket has refilled, forgetting it is the same as keeping it.
+        return allowed, (tokens, now), now + (max_requests - tokens) / rate
+
+
+class FixedWindowRateLimiter(_InMemoryLimiter):
+    """Counter reset every window_seconds; allows up to 2x at window edges."""
+
+    def _step(self, window, max_requests, window_seconds, now):
+        window_start, count = window if window is not None else (None, 0)
+        current = now - now % window_seconds  # aligned, like the Redis variant
+        if window_start != current:
+            window_start, count = current, 0
         count += 1
-        self._hits[key] = (window_start, count)
+        return count <= max_requests, (window_start, count), window_start + window_seconds
+
+
+_SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[4])
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return 1
+"""
+
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local capacity = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * capacity / window)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 1000))
+return allowed
+"""
+
+
+class RedisRateLimiter:
+    """Shared limiter on any Redis-protocol server (Redis, Memorystore, fakeredis).
+
+    Each decision is one atomic round trip. If Redis is unreachable the
+    request is allowed and the error logged: losing the limiter must not take
+    payments down with it.
+    """
+
+    def __init__(self, client, algorithm: str = "sliding_window", prefix: str = "ratelimit"):
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+        self._client = client
+        self.algorithm = algorithm
+        self.prefix = prefix
+        self._scripts = {
+            "sliding_window": client.register_script(_SLIDING_WINDOW_LUA),
+            "token_bucket": client.register_script(_TOKEN_BUCKET_LUA),
+        }
+
+    def allow(self, key: str, max_requests: int, window_seconds: float, now: float = None) -> bool:
+        now = time.time() if now is None else now
+        try:
+            if self.algorithm == "fixed_window":
+                return self._fixed_window(key, max_requests, window_seconds, now)
+            script = self._scripts[self.algorithm]
+            args = [now, window_seconds, max_requests]
+            if self.algorithm == "sliding_window":
+                args.append(uuid.uuid4().hex)  # unique ZSET member per hit
+            return bool(script(keys=[f"{self.prefix}:{key}"], args=args))
+        except Exception:
+            logger.warning("Rate limiter backend unavailable; allowing request", exc_info=True)
+            return True
+
+    def _fixed_window(self, key, max_requests, window_seconds, now) -> bool:
+        redis_key = f"{self.prefix}:{key}:{int(now // window_seconds)}"
+        pipe = self._client.pipeline()
+        pipe.incr(redis_key)
+        pipe.expire(redis_key, int(window_seconds) + 1)
+        count, _ = pipe.execute()
         return count <= max_requests
 
     def clear(self) -> None:
-        self._hits.clear()
+        keys = list(self._client.scan_iter(match=f"{self.prefix}:*"))
+        if keys:
+            self._client.delete(*keys)
+
+
+_IN_MEMORY = {
+    "sliding_window": SlidingWindowRateLimiter,
+    "token_bucket": TokenBucketRateLimiter,
+    "fixed_window": FixedWindowRateLimiter,
+}
+
+
+def build_rate_limiter():
+    """The limiter selected by RATE_LIMIT_BACKEND and RATE_LIMIT_ALGORITHM."""
+    algorithm = settings.RATE_LIMIT_ALGORITHM
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown rate limit algorithm: {algorithm}")
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        import redis  # optional; only needed for the shared backend
+
+        client = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL, socket_timeout=0.25)
+        return RedisRateLimiter(client, algorithm)
+    return _IN_MEMORY[algorithm]()
 
 
-rate_limiter = FixedWindowRateLimiter()
+rate_limiter = build_rate_limiter()
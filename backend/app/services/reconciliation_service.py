@@ -3,24 +3,57 @@
 The core audit artifact for stablecoins: drift between what PayRails' ledger says
 an owner (consumer wallet or merchant) holds and what the custodial partner
 reports must be zero.
+
+`run_reconciliation` is the engine behind /tasks/reconcile. It walks
+crypto_accounts in id order, RECONCILIATION_BATCH_SIZE at a time: one query
+joins each chunk's accounts to their materialized balances, the partner
+balances are fetched in concurrent get_balances batches, and the chunk's drift
+rows and the run's checkpoint are committed together. A run that spends its
+time budget stays "running" and resumes from its checkpoint. Incremental runs
+only look at owners whose balance moved (or whose account was opened) since
+the last clean run started; drift that appears only on the partner side is
+left to the next full run.
 """
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
 from typing import Optional
 
+from sqlalchemy import and_, case, func, or_, select
 from sqlalchemy.orm import Session
 
+from app.config import settings
+from app.models.balance import Balance
+from app.models.crypto_account import CryptoAccount
+from app.models.reconciliation import ReconciliationDrift, ReconciliationRun
+from app.services import unit_of_work
+from app.services.balance_service import MERCHANT, USER
 from app.services.ledger_service import get_balance
 from app.services.stablecoin import get_stablecoin_provider
+from app.services.units import from_base_units
 from app.services.wallet_service import get_wallet_balance
 
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+COMPLETED = "completed"
+
 
 def reconcile_owner(db: Session, asset_code: str, partner_account_id: str,
-                    user_id: Optional[str] = None, merchant_id: Optional[str] = None) -> dict:
-    """Compare an owner's internal balance vs the partner-reported balance."""
-    provider = get_stablecoin_provider()
+                    user_id: Optional[str] = None, merchant_id: Optional[str] = None,
+                    external_balance: Optional[Decimal] = None) -> dict:
+    """Compare an owner's internal balance vs the partner-reported balance.
+
+    Pass external_balance when it was already fetched in a batch; otherwise
+    the partner is asked for this one account.
+    """
     internal = get_balance(db, merchant_id, asset_code) if merchant_id \
         else get_wallet_balance(db, user_id, asset_code)
-    external = Decimal(str(provider.get_balance(partner_account_id, asset_code)))
+    if external_balance is None:
+        external_balance = get_stablecoin_provider().get_balance(partner_account_id, asset_code)
+    external = Decimal(str(external_balance))
     drift = internal - external
     return {
         "user_id": user_id,
@@ -36,3 +69,124 @@ def reconcile_owner(db: Session, asset_code: str, partner_account_id: str,
 def reconcile_wallet(db: Session, user_id: str, asset_code: str, partner_account_id: str) -> dict:
     """Backward-compatible consumer-wallet reconciliation."""
     return reconcile_owner(db, asset_code, partner_account_id, user_id=user_id)
+
+
+def last_clean_run(db: Session) -> Optional[ReconciliationRun]:
+    """The most recent completed run that found no drift and no errors."""
+    return db.query(ReconciliationRun).filter(
+        ReconciliationRun.status == COMPLETED,
+        ReconciliationRun.drifted == 0,
+        ReconciliationRun.errors == 0,
+    ).order_by(ReconciliationRun.started_at.desc()).first()
+
+
+def _account_chunk(db: Session, run: ReconciliationRun, size: int) -> list:
+    """The next `size` accounts after the run's cursor, each with its internal balance."""
+    owner_type = case((CryptoAccount.merchant_id.isnot(None), MERCHANT), else_=USER)
+    owner_id = func.coalesce(CryptoAccount.merchant_id, CryptoAccount.user_id)
+    query = (
+        select(CryptoAccount.id, CryptoAccount.user_id, CryptoAccount.merchant_id,
+               CryptoAccount.asset_code, CryptoAccount.partner_account_id, Balance.balance_base_units)
+        .outerjoin(Balance, and_(Balance.owner_type == owner_type, Balance.owner_id == owner_id,
+                                 Balance.asset_code == CryptoAccount.asset_code))
+        .order_by(CryptoAccount.id)
+        .limit(size)
+    )
+    if run.cursor is not None:
+        query = query.where(CryptoAccount.id > run.cursor)
+    if run.baseline_run_id is not None:
+        # Compared in SQL so both sides use the database's own timestamp format.
+        since = select(ReconciliationRun.started_at).where(
+            ReconciliationRun.id == run.baseline_run_id).scalar_subquery()
+        query = query.where(or_(Balance.updated_at >= since, CryptoAccount.created_at >= since))
+    return db.execute(query).all()
+
+
+def _fetch_balances(provider, rows) -> dict:
+    """Partner balances for `rows`, keyed by (partner_account_id, asset_code).
+
+    One get_balances call per asset per max_batch_size accounts,
+    RECONCILIATION_CONCURRENCY calls at a time. A failed call maps its
+    accounts to the exception it raised.
+    """
+    by_asset = defaultdict(list)
+    for row in rows:
+        by_asset[row.asset_code].append(row.partner_account_id)
+    size = max(1, provider.max_batch_size)
+    chunks = [(asset_code, ids[i:i + size])
+              for asset_code, ids in sorted(by_asset.items())
+              for i in range(0, len(ids), size)]
+    results = {}
+    workers = max(1, min(settings.RECONCILIATION_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reconcile") as pool:
+        futures = {pool.submit(provider.get_balances, ids, asset_code): (asset_code, ids)
+                   for asset_code, ids in chunks}
+        for future in as_completed(futures):
+            asset_code, ids = futures[future]
+            try:
+                balances = future.result()
+            except Exception as exc:  # one partner error must not sink the chunk
+                balances = dict.fromkeys(ids, exc)
+            for acct_id in ids:
+                results[(acct_id, asset_code)] = balances.get(
+                    acct_id, LookupError(f"No balance returned for {acct_id}"))
+    return results
+
+
+def _reconcile_chunk(db: Session, run: ReconciliationRun, rows, external: dict) -> None:
+    for row in rows:
+        internal = from_base_units(int(row.balance_base_units or 0), row.asset_code)
+        result = external[(row.partner_account_id, row.asset_code)]
+        drift = ReconciliationDrift(
+            run_id=run.id, crypto_account_id=row.id, user_id=row.user_id, merchant_id=row.merchant_id,
+            asset_code=row.asset_code, partner_account_id=row.partner_account_id, internal_balance=internal,
+        )
+        if isinstance(result, Exception):
+            logger.warning("Partner balance unavailable for crypto account %s: %s", row.id, result)
+            drift.error = f"{type(result).__name__}: {result}"
+            run.errors += 1
+        else:
+            drift.external_balance = Decimal(str(result))
+            drift.drift = internal - drift.external_balance
+            if drift.drift == 0:
+                continue
+            run.drifted += 1
+        db.add(drift)
+    run.accounts_checked += len(rows)
+    run.cursor = rows[-1].id
+
+
+def run_reconciliation(db: Session, incremental: bool = False, run_id: Optional[str] = None,
+                       time_budget_seconds: Optional[float] = None) -> ReconciliationRun:
+    """Start a reconciliation run (or resume `run_id`) and work until done or out of time.
+
+    Each chunk is one transaction, so an interrupted run keeps every chunk it
+    finished. Raises LookupError for an unknown run_id; a finished run is
+    returned unchanged.
+    """
+    budget = settings.RECONCILIATION_TIME_BUDGET_SECONDS if time_budget_seconds is None else time_budget_seconds
+    deadline = time.monotonic() + budget
+    if run_id is not None:
+        run = db.get(ReconciliationRun, run_id)
+        if run is None:
+            raise LookupError(f"Reconciliation run {run_id} not found")
+    else:
+        baseline = last_clean_run(db) if incremental else None
+        run = ReconciliationRun(mode="incremental" if incremental else "full",
+                                baseline_run_id=baseline.id if baseline else None)
+        db.add(run)
+        unit_of_work.commit(db)
+
+    provider = get_stablecoin_provider()
+    size = settings.RECONCILIATION_BATCH_SIZE
+    while run.status == RUNNING and time.monotonic() < deadline:
+        rows = _account_chunk(db, run, size)
+        external = _fetch_balances(provider, rows) if rows else {}
+        with unit_of_work.transition(db):
+            if rows:
+                _reconcile_chunk(db, run, rows, external)
+            if len(rows) < size:
+                run.status = COMPLETED
+                run.finished_at = func.now()
+    db.refresh(run)
+    return run
@@ -2,64 +2,169 @@
 
 Read-only exports that feed regulatory reporting (SAR/CTR/1099-DA, MTL call
 reports). USD stablecoins are treated ~1:1 with USD for thresholding.
+
+The iter_* functions stream rows from a server-side cursor (yield_per
+EXPORT_BATCH_SIZE) and select only the exported columns, so an export holds
+one batch in memory however many rows it covers; `csv_lines` / `ndjson_lines`
+turn them into chunks for a StreamingResponse. The list-returning functions
+are kept for callers that want everything at once.
 """
+import csv
+import io
+import json
+from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Iterable, Iterator, List, Optional
 
+from sqlalchemy import case, func, or_, select
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.sanctions_screening import SanctionsScreening
 from app.models.transaction import Transaction
-from app.services.units import from_base_units
+from app.services.units import ASSET_DECIMALS, DEFAULT_DECIMALS, from_base_units, to_base_units
 
 CTR_THRESHOLD = Decimal("10000")  # USD-equivalent
 
+AUDIT_TRAIL_FIELDS = [
+    "transaction_id", "direction", "asset_code", "amount", "network", "onchain_tx_hash",
+    "partner_transfer_id", "onchain_status", "status", "sender_user_id", "receiver_user_id", "created_at",
+]
+SCREENING_FIELDS = ["id", "transaction_id", "address", "provider", "result", "risk_score"]
+
+_AUDIT_COLUMNS = (
+    Transaction.id, Transaction.direction, Transaction.asset_code, Transaction.amount,
+    Transaction.amount_base_units, Transaction.settlement_network, Transaction.onchain_tx_hash,
+    Transaction.partner_transfer_id, Transaction.onchain_status, Transaction.status,
+    Transaction.sender_user_id, Transaction.receiver_user_id, Transaction.created_at,
+)
 
-def _tx_amount(tx: Transaction) -> Decimal:
+
+def _tx_amount(tx) -> Decimal:
     if tx.amount is not None:
         return Decimal(str(tx.amount))
     return from_base_units(int(tx.amount_base_units or 0), tx.asset_code or "USD")
 
 
+def _audit_row(tx) -> dict:
+    return {
+        "transaction_id": tx.id,
+        "direction": tx.direction,
+        "asset_code": tx.asset_code,
+        "amount": _tx_amount(tx),
+        "network": tx.settlement_network,
+        "onchain_tx_hash": tx.onchain_tx_hash,
+        "partner_transfer_id": tx.partner_transfer_id,
+        "onchain_status": tx.onchain_status,
+        "status": tx.status,
+        "sender_user_id": tx.sender_user_id,
+        "receiver_user_id": tx.receiver_user_id,
+        "created_at": tx.created_at.isoformat() if tx.created_at else None,
+    }
+
+
+def _stream(db: Session, query) -> Iterator:
+    return iter(db.execute(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)))
+
+
+def _onchain_query(asset_code: Optional[str] = None):
+    query = select(*_AUDIT_COLUMNS).where(Transaction.settlement_type == "onchain")
+    if asset_code:
+        query = query.where(Transaction.asset_code == asset_code)
+    return query.order_by(Transaction.created_at, Transaction.id)
+
+
+def _threshold_clause(threshold: Decimal):
+    """`amount >= threshold` in SQL, mirroring _tx_amount: the USD `amount`
+    column when set, else `amount_base_units` against the threshold scaled to
+    each asset's decimals."""
+    units = case(
+        {code: to_base_units(threshold, code) for code in ASSET_DECIMALS},
+        value=func.coalesce(Transaction.asset_code, "USD"),
+        else_=int(Decimal(str(threshold)).scaleb(DEFAULT_DECIMALS)),
+    )
+    return or_(
+        Transaction.amount >= threshold,
+        (Transaction.amount.is_(None)) & (func.coalesce(Transaction.amount_base_units, 0) >= units),
+    )
+
+
+def iter_onchain_audit_trail(db: Session, asset_code: Optional[str] = None) -> Iterator[dict]:
+    """Every on-chain transaction with its ledger-linking identifiers, oldest first."""
+    for tx in _stream(db, _onchain_query(asset_code)):
+        yield _audit_row(tx)
+
+
+def iter_ctr_report(db: Session, threshold: Decimal = CTR_THRESHOLD) -> Iterator[dict]:
+    """On-chain transactions at/above the CTR reporting threshold, filtered in SQL."""
+    for tx in _stream(db, _onchain_query().where(_threshold_clause(threshold))):
+        yield _audit_row(tx)
+
+
+def iter_screening_report(db: Session, include_pass: bool = False) -> Iterator[dict]:
+    """Sanctions/KYT screening results (review/block by default)."""
+    query = select(SanctionsScreening.id, SanctionsScreening.transaction_id, SanctionsScreening.address,
+                   SanctionsScreening.provider, SanctionsScreening.result, SanctionsScreening.risk_score)
+    if not include_pass:
+        query = query.where(SanctionsScreening.result != "pass")
+    for s in _stream(db, query.order_by(SanctionsScreening.screened_at, SanctionsScreening.id)):
+        yield {
+            "id": s.id,
+            "transaction_id": s.transaction_id,
+            "address": s.address,
+            "provider": s.provider,
+            "result": s.result,
+            "risk_score": Decimal(str(s.risk_score)) if s.risk_score is not None else None,
+        }
+
+
 def onchain_audit_trail(db: Session, asset_code: Optional[str] = None) -> list:
     """Every on-chain transaction with its ledger-linking identifiers."""
-    q = db.query(Transaction).filter(Transaction.settlement_type == "onchain")
-    if asset_code:
-        q = q.filter(Transaction.asset_code == asset_code)
-    rows = []
-    for tx in q.order_by(Transaction.created_at).all():
-        rows.append({
-            "transaction_id": tx.id,
-            "direction": tx.direction,
-            "asset_code": tx.asset_code,
-            "amount": _tx_amount(tx),
-            "network": tx.settlement_network,
-            "onchain_tx_hash": tx.onchain_tx_hash,
-            "partner_transfer_id": tx.partner_transfer_id,
-            "onchain_status": tx.onchain_status,
-            "status": tx.status,
-            "sender_user_id": tx.sender_user_id,
-            "receiver_user_id": tx.receiver_user_id,
-            "created_at": tx.created_at.isoformat() if tx.created_at else None,
-        })
-    return rows
+    return list(iter_onchain_audit_trail(db, asset_code))
 
 
 def ctr_report(db: Session, threshold: Decimal = CTR_THRESHOLD) -> list:
     """On-chain transactions at/above the CTR reporting threshold."""
-    return [r for r in onchain_audit_trail(db) if r["amount"] >= threshold]
+    return list(iter_ctr_report(db, threshold))
 
 
 def screening_report(db: Session, include_pass: bool = False) -> list:
     """Sanctions/KYT screening results (review/block by default)."""
-    q = db.query(SanctionsScreening)
-    if not include_pass:
-        q = q.filter(SanctionsScreening.result != "pass")
-    return [{
-        "id": s.id,
-        "transaction_id": s.transaction_id,
-        "address": s.address,
-        "provider": s.provider,
-        "result": s.result,
-        "risk_score": Decimal(str(s.risk_score)) if s.risk_score is not None else None,
-    } for s in q.order_by(SanctionsScreening.screened_at).all()]
+    return list(iter_screening_report(db, include_pass))
+
+
+# ------------------------------------------------------------------ encoders
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot export value of type {type(value).__name__}")
+
+
+def _chunks(rows: Iterable[dict], encode, header: str = "") -> Iterator[str]:
+    """Encoded rows, EXPORT_BATCH_SIZE per yielded chunk (header first)."""
+    buffer: List[str] = [header] if header else []
+    for row in rows:
+        buffer.append(encode(row))
+        if len(buffer) >= settings.EXPORT_BATCH_SIZE:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    return _chunks(rows, lambda row: json.dumps(row, default=_json_default) + "\n")
+
+
+def csv_lines(rows: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    def encode(row: dict) -> str:
+        out = io.StringIO()
+        csv.writer(out).writerow("" if row[f] is None else row[f] for f in fields)
+        return out.getvalue()
+
+    header = io.StringIO()
+    csv.writer(header).writerow(fields)
+    return _chunks(rows, encode, header.getvalue())
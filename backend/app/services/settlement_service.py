@@ -0,0 +1,346 @@
+"""Bank-rail settlement: drive a transfer through the bank and finalize it.
+
+Every way a bank result can arrive -- inline in the request (sync mode), from
+the background settlement executor (async mode), or via /webhooks/bank --
+goes through finalize_bank_transfer, so status, ledger legs, audit events and
+notifications are applied identically and at most once.
+
+In async mode (BANK_SETTLEMENT_ASYNC) the payment is persisted as `processing`
+and returned immediately; a bounded thread pool makes the (slow, blocking)
+BankServiceInterface call and finalizes on its own DB session, so request
+latency no longer depends on rail latency. Before calling the bank a job
+commits `bank_submitted_at` on the row; the bank's reference is stored even
+when finalizing fails, so its webhook can still find the row.
+
+The executor's queue lives in memory and a bank call can fail outright, so a
+`processing` transfer can be left without a bank reference. /tasks/settlement/
+resubmit (resubmit_stale_transfers) sends such rows to the bank again once
+BANK_SETTLEMENT_RESUBMIT_AFTER_SECONDS have passed since submission (or
+creation, if the job never started); the transfer's idempotency key makes the
+bank return the original transfer if it had already been made.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.bank_account import BankAccount
+from app.models.merchant import Merchant
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.services import notification_service, unit_of_work
+from app.services.bank.interface import BankServiceInterface
+from app.services.bank.mock_bank import mock_bank_service
+from app.services.bank.schemas import TransferRequest
+from app.services.event_service import log_event
+from app.services.ledger_service import JournalLeg, merchant_leg, post_journal, wallet_leg
+from app.services.rail_selector import RAIL_PRIORITY, rail_router
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# 0.05% discount for instant rails.
+INSTANT_RAILS = ("fednow", "rtp")
+INSTANT_RAIL_RATE = Decimal("0.9995")
+
+# flow -> (completed event, failed event, event source)
+_FLOW_EVENTS = {
+    "payment": ("payment.completed", "payment.failed", "payment_service"),
+    "consumer_payment": ("consumer_payment.completed", "consumer_payment.failed", "consumer_payment_service"),
+    "wallet_fund": ("wallet.funded", "wallet.fund_failed", "consumer_router"),
+}
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def settled_amount(amount: Decimal, rail: Optional[str]) -> Decimal:
+    if rail in INSTANT_RAILS:
+        return (amount * INSTANT_RAIL_RATE).quantize(Decimal("0.01"))
+    return amount
+
+
+def _flow(txn: Transaction) -> str:
+    if txn.sender_merchant_id:
+        return "payment"            # B2B merchant -> merchant
+    if txn.receiver_merchant_id:
+        return "consumer_payment"   # consumer wallet -> merchant
+    return "wallet_fund"            # ACH pull from the consumer's bank account
+
+
+def _settlement_legs(db: Session, txn: Transaction, amount: Decimal) -> List[JournalLeg]:
+    flow = _flow(txn)
+    if flow == "wallet_fund":
+        account = db.query(BankAccount).filter(BankAccount.id == txn.sender_bank_account_id).first()
+        source = (account.bank_name or account.routing_number) if account else "bank account"
+        return [wallet_leg(txn.sender_user_id, "credit", amount, f"Wallet funded via ACH from {source}")]
+
+    if flow == "payment":
+        legs = [
+            merchant_leg(txn.sender_merchant_id, "debit", amount, "Payment sent"),
+            merchant_leg(txn.receiver_merchant_id, "credit", amount, "Payment received"),
+        ]
+        linked_desc = f"Payment received from merchant {txn.sender_merchant_id}"
+    else:
+        legs = [
+            wallet_leg(txn.sender_user_id, "debit", amount, txn.description, check_funds=True),
+            merchant_leg(txn.receiver_merchant_id, "credit", amount, f"Payment from consumer {txn.sender_user_id}"),
+        ]
+        linked_desc = f"Payment received from {txn.sender_user_id}"
+
+    # If the receiver merchant is linked to a consumer user, also credit their
+    # wallet so the money is visible in their wallet balance immediately.
+    receiver_consumer = db.query(User).filter(
+        User.merchant_id == txn.receiver_merchant_id, User.role == "user"
+    ).first()
+    if receiver_consumer:
+        legs.append(wallet_leg(receiver_consumer.id, "credit", amount, linked_desc))
+        txn.receiver_user_id = receiver_consumer.id
+    return legs
+
+
+def _notify(db: Session, txn: Transaction) -> None:
+    flow = _flow(txn)
+    if flow == "wallet_fund":
+        return
+    merchant = db.query(Merchant).filter(Merchant.id == txn.receiver_merchant_id).first()
+    merchant_name = merchant.name if merchant else txn.receiver_merchant_id
+    if flow == "payment":
+        sender_user = db.query(User).filter(User.merchant_id == txn.sender_merchant_id).first()
+        if not sender_user:
+            return
+        user_id = sender_user.id
+    else:
+        user_id = txn.sender_user_id
+    notification_service.notify_transaction(
+        db, user_id, txn.id, txn.status,
+        float(txn.amount), merchant_name, txn.rail, txn.description,
+    )
+
+
+def finalize_bank_transfer(
+    db: Session,
+    txn: Transaction,
+    status: str,
+    failure_reason: Optional[str] = None,
+    reference_id: Optional[str] = None,
+) -> bool:
+    """Apply a bank result to a processing transaction. Returns False if it was already final.
+
+    On completion the instant-rail discount is applied. Status, ledger legs,
+    balance updates, the audit event and the notification outbox rows are one
+    unit of work and commit together.
+
+    `txn` may have been loaded before a slow bank call, so the status change is
+    claimed with a conditional UPDATE on the row: a cancel or another
+    finalization (a redelivered webhook, the async executor) that committed in
+    the meantime wins, and this call changes nothing.
+    """
+    if txn.status in FINAL_STATUSES:
+        return False
+
+    with unit_of_work.transition(db):
+        claimed = db.query(Transaction).filter(
+            Transaction.id == txn.id, Transaction.status.notin_(FINAL_STATUSES),
+        ).update({Transaction.status: status}, synchronize_session=False)
+        if not claimed:
+            db.refresh(txn)
+            return False
+
+        if reference_id:
+            txn.reference_id = reference_id
+        txn.status = status
+        txn.failure_reason = failure_reason
+        flow = _flow(txn)
+        completed_event, failed_event, source = _FLOW_EVENTS[flow]
+
+        if status == "completed":
+            amount = settled_amount(Decimal(str(txn.amount)), txn.rail)
+            try:
+                with db.begin_nested():
+                    txn.amount = amount
+                    post_journal(db, _settlement_legs(db, txn, amount), txn.id, commit=False)
+            except ValueError as e:
+                # Funds moved between acceptance and settlement: fail the
+                # payment. The savepoint undid the amount and any legs.
+                txn.status = "failed"
+                txn.failure_reason = str(e)
+                status = "failed"
+            else:
+                if flow == "wallet_fund":
+                    log_event(db, completed_event, source, txn.id, {
+                        "amount": str(amount), "bank_account_id": txn.sender_bank_account_id,
+                    })
+                else:
+                    log_event(db, completed_event, source, txn.id)
+
+        if status == "failed":
+            log_event(db, failed_event, source, txn.id, {"reason": txn.failure_reason})
+
+        if status in ("completed", "failed"):
+            _notify(db, txn)
+    return True
+
+
+def execute_transfer(
+    db: Session, txn: Transaction, request: TransferRequest,
+    bank: BankServiceInterface = mock_bank_service,
+) -> Transaction:
+    """Call the bank for a processing transaction and finalize it on `db`.
+
+    If finalizing fails, the bank's reference is still recorded (so its
+    webhook can finalize the row) before the error propagates.
+    """
+    started = time.monotonic()
+    result = bank.initiate_transfer(request)
+    rail_router.observe(request.rail, time.monotonic() - started)
+    try:
+        finalize_bank_transfer(db, txn, result.status, result.failure_reason, result.reference_id)
+    except Exception:
+        db.rollback()
+        if result.reference_id:
+            _record_reference(db, txn.id, result.reference_id)
+        raise
+    db.refresh(txn)
+    return txn
+
+
+def _record_reference(db: Session, txn_id: str, reference_id: str) -> None:
+    try:
+        db.query(Transaction).filter(Transaction.id == txn_id, Transaction.reference_id.is_(None)) \
+            .update({Transaction.reference_id: reference_id}, synchronize_session=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("settlement: could not record bank reference %s for %s", reference_id, txn_id)
+
+
+def transfer_request_for(txn: Transaction) -> TransferRequest:
+    """Rebuild the bank request a processing transaction was submitted with."""
+    flow = _flow(txn)
+    if flow == "wallet_fund":
+        return TransferRequest(sender_account_id=txn.sender_bank_account_id, receiver_account_id="payrails-platform",
+                               amount=txn.amount, rail=txn.rail, idempotency_key=txn.idempotency_key,
+                               memo="Wallet funding")
+    if flow == "payment":
+        sender = txn.sender_bank_account_id or txn.sender_merchant_id
+        receiver = txn.receiver_bank_account_id or txn.receiver_merchant_id
+    else:
+        sender, receiver = txn.sender_user_id, txn.receiver_merchant_id
+    return TransferRequest(sender_account_id=sender, receiver_account_id=receiver, amount=txn.amount,
+                           rail=txn.rail, idempotency_key=txn.idempotency_key)
+
+
+class SettlementExecutor:
+    """Bounded background pool that settles transfers off the request thread.
+
+    Each job opens its own session (the request's session is closed by the
+    time the job runs) and reloads the transaction by id.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None,
+                 max_workers: Optional[int] = None,
+                 bank: BankServiceInterface = mock_bank_service) -> None:
+        self._session_factory = session_factory
+        self._max_workers = max_workers
+        self._bank = bank
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self._max_workers or settings.BANK_SETTLEMENT_WORKERS,
+                    thread_name_prefix="settlement",
+                )
+            return self._pool
+
+    def _new_session(self) -> Session:
+        if self._session_factory is not None:
+            return self._session_factory()
+        from app.database import SessionLocal
+        return SessionLocal()
+
+    def submit(self, txn_id: str, request: TransferRequest) -> Future:
+        return self._get_pool().submit(self._run, txn_id, request)
+
+    def _run(self, txn_id: str, request: TransferRequest) -> None:
+        db = self._new_session()
+        try:
+            # Durable marker before the bank call; a cancelled or settled row is skipped.
+            claimed = db.query(Transaction).filter(
+                Transaction.id == txn_id, Transaction.status.notin_(FINAL_STATUSES),
+            ).update({Transaction.bank_submitted_at: _utcnow()}, synchronize_session=False)
+            db.commit()
+            if not claimed:
+                return
+            txn = db.query(Transaction).filter(Transaction.id == txn_id).one()
+            execute_transfer(db, txn, request, self._bank)
+        except Exception:
+            # The transaction stays `processing`. If the bank answered, its
+            # reference was recorded and the webhook finalizes the row;
+            # otherwise resubmit_stale_transfers sends it again.
+            db.rollback()
+            logger.exception("settlement: transfer %s failed to settle", txn_id)
+        finally:
+            db.close()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+settlement_executor = SettlementExecutor()
+
+
+def submit_transfer(db: Session, txn: Transaction, request: TransferRequest) -> Transaction:
+    """Settle inline (default) or hand off to the background executor (async mode)."""
+    if settings.BANK_SETTLEMENT_ASYNC:
+        settlement_executor.submit(txn.id, request)
+        return txn
+    return execute_transfer(db, txn, request)
+
+
+def resubmit_stale_transfers(db: Session, limit: Optional[int] = None) -> dict:
+    """Send stuck bank transfers to the bank again (see module docstring).
+
+    Candidates are off-chain `processing` transactions on a bank rail with no
+    bank reference whose submission (or creation) is older than
+    BANK_SETTLEMENT_RESUBMIT_AFTER_SECONDS, oldest first.
+    """
+    cutoff = _utcnow() - timedelta(seconds=settings.BANK_SETTLEMENT_RESUBMIT_AFTER_SECONDS)
+    stale = (
+        db.query(Transaction)
+        .filter(
+            Transaction.status == "processing",
+            Transaction.settlement_type == "offchain",
+            Transaction.rail.in_(RAIL_PRIORITY),
+            Transaction.reference_id.is_(None),
+            func.coalesce(Transaction.bank_submitted_at, Transaction.created_at) < cutoff,
+        )
+        .order_by(Transaction.created_at, Transaction.id)
+        .limit(limit or settings.BANK_SETTLEMENT_RESUBMIT_BATCH_SIZE)
+        .all()
+    )
+    counts = {"resubmitted": 0, "failed": 0}
+    for txn in stale:
+        try:
+            submit_transfer(db, txn, transfer_request_for(txn))
+            counts["resubmitted"] += 1
+        except Exception:
+            db.rollback()
+            counts["failed"] += 1
+            logger.exception("settlement: resubmitting transfer %s failed", txn.id)
+    return counts
@@ -1,5 +1,7 @@
+import json
 from abc import ABC, abstractmethod
 from decimal import Decimal
+from typing import Dict, List
 
 from app.services.stablecoin.schemas import (
     KycStatus,
@@ -14,8 +16,14 @@ class StablecoinProviderInterface(ABC):
 
     Mirrors app/services/bank/interface.py. USDC and USD1 share one
     implementation; the partner owns licensing, KYC/AML, custody, and settlement.
+
+    The batch lookups (get_balances, get_transfer_statuses) default to looping
+    over the single calls; partners with a bulk endpoint override them and
+    raise `max_batch_size`, which callers use to chunk their id lists.
     """
 
+    max_batch_size: int = 1
+
     # --- onboarding / KYC ---
     @abstractmethod
     def submit_kyc(self, user_id: str, payload: dict) -> str:
@@ -39,6 +47,10 @@ class StablecoinProviderInterface(ABC):
     def get_balance(self, partner_account_id: str, asset_code: str) -> Decimal:
         ...
 
+    def get_balances(self, partner_account_ids: List[str], asset_code: str) -> Dict[str, Decimal]:
+        """Balances of several accounts in one asset, keyed by partner account id."""
+        return {acct: self.get_balance(acct, asset_code) for acct in partner_account_ids}
+
     # --- ramps (USD <-> stablecoin) ---
     @abstractmethod
     def quote_onramp(self, usd_amount: Decimal, asset_code: str) -> QuoteResult:
@@ -73,6 +85,10 @@ class StablecoinProviderInterface(ABC):
     def get_transfer_status(self, partner_transfer_id: str) -> TransferResult:
         ...
 
+    def get_transfer_statuses(self, partner_transfer_ids: List[str]) -> Dict[str, TransferResult]:
+        """Statuses of several transfers, keyed by partner transfer id."""
+        return {tid: self.get_transfer_status(tid) for tid in partner_transfer_ids}
+
     # --- webhooks ---
     @abstractmethod
     def verify_webhook(self, headers: dict, raw_body: bytes) -> bool:
@@ -81,3 +97,7 @@ class StablecoinProviderInterface(ABC):
     @abstractmethod
     def parse_webhook_event(self, raw_body: bytes) -> dict:
         ...
+
+    def parse_webhook_events(self, raw_body: bytes) -> List[dict]:
+        """A batch delivery (JSON array) as normalized events."""
+        return [self.parse_webhook_event(json.dumps(item).encode()) for item in json.loads(raw_body or b"[]")]
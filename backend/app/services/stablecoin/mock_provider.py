@@ -3,11 +3,21 @@
 Mirrors app/services/bank/mock_bank.py. Behaviour is intentionally simple and
 happy-path: KYC auto-approves, ramps settle instantly at ~1:1 with a flat fee,
 and transfers return CONFIRMED. No network or randomness.
+
+Quotes, transfers and idempotency keys live in bounded TTL/LRU stores of
+compact records (MOCK_PROVIDER_CACHE_*), so a long soak run does not grow the
+process; `memory_stats()` reports what they hold. A transfer that has aged out
+reports OnchainStatus.UNKNOWN, never FAILED, so a late poll cannot fail a
+transfer that settled. Accounts, balances and KYC
+are state the ledger depends on and are kept for the life of the process.
 """
 import json
+import threading
 import uuid
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, List, Optional
+
+from app.config import settings
 
 from app.services.stablecoin.interface import StablecoinProviderInterface
 from app.services.stablecoin.schemas import (
@@ -17,19 +27,68 @@ from app.services.stablecoin.schemas import (
     QuoteResult,
     TransferResult,
 )
+from app.utils.memory import cache_stats
+from app.utils.ttl_cache import TTLCache
 
 FLAT_FEE = Decimal("0.00")           # mock: no spread
 QUOTE_EXPIRES_AT = "2099-01-01T00:00:00Z"
 
 
+class _Quote:
+    __slots__ = ("quote_id", "from_asset", "to_asset", "from_amount", "to_amount", "fee")
+
+    def __init__(self, quote_id: str, from_asset: str, to_asset: str,
+                 from_amount: Decimal, to_amount: Decimal, fee: Decimal) -> None:
+        self.quote_id = quote_id
+        self.from_asset = from_asset
+        self.to_asset = to_asset
+        self.from_amount = from_amount
+        self.to_amount = to_amount
+        self.fee = fee
+
+    def to_result(self) -> QuoteResult:
+        return QuoteResult(quote_id=self.quote_id, from_asset=self.from_asset, to_asset=self.to_asset,
+                           from_amount=self.from_amount, to_amount=self.to_amount, fee=self.fee,
+                           expires_at=QUOTE_EXPIRES_AT)
+
+
+class _Transfer:
+    """Stored transfer; the transfer and idempotency stores share one record."""
+    __slots__ = ("partner_transfer_id", "status", "onchain_tx_hash", "confirmations")
+
+    def __init__(self, partner_transfer_id: str, status: OnchainStatus,
+                 onchain_tx_hash: Optional[str], confirmations: int) -> None:
+        self.partner_transfer_id = partner_transfer_id
+        self.status = status
+        self.onchain_tx_hash = onchain_tx_hash
+        self.confirmations = confirmations
+
+    def to_result(self) -> TransferResult:
+        return TransferResult(partner_transfer_id=self.partner_transfer_id, status=self.status,
+                              onchain_tx_hash=self.onchain_tx_hash, confirmations=self.confirmations)
+
+
+def _not_found(partner_transfer_id: str) -> TransferResult:
+    return TransferResult(
+        partner_transfer_id=partner_transfer_id,
+        status=OnchainStatus.UNKNOWN,
+        failure_reason="Transfer not found or expired",
+    )
+
+
 class MockStablecoinProvider(StablecoinProviderInterface):
-    def __init__(self) -> None:
+    max_batch_size = 500
+
+    def __init__(self, maxsize: Optional[int] = None, ttl: Optional[float] = None) -> None:
+        maxsize = settings.MOCK_PROVIDER_CACHE_SIZE if maxsize is None else maxsize
+        ttl = settings.MOCK_PROVIDER_CACHE_TTL_SECONDS if ttl is None else ttl
         self._kyc: Dict[str, KycStatus] = {}
         self._accounts: Dict[str, ProviderAccount] = {}
         self._balances: Dict[str, Decimal] = {}
-        self._quotes: Dict[str, QuoteResult] = {}
-        self._transfers: Dict[str, TransferResult] = {}
-        self._idempotency: Dict[str, TransferResult] = {}
+        self._lock = threading.Lock()  # guards _accounts / _balances
+        self._quotes = TTLCache(maxsize=maxsize, ttl=ttl)       # quote_id -> _Quote
+        self._transfers = TTLCache(maxsize=maxsize, ttl=ttl)    # partner_transfer_id -> _Transfer
+        self._idempotency = TTLCache(maxsize=maxsize, ttl=ttl)  # idempotency_key -> _Transfer
 
     # --- onboarding / KYC ---
     def submit_kyc(self, user_id: str, payload: dict) -> str:
@@ -49,8 +108,9 @@ class MockStablecoinProvider(StablecoinProviderInterface):
             network=network,
             deposit_address=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}",
         )
-        self._accounts[partner_account_id] = account
-        self._balances.setdefault(partner_account_id, Decimal("0"))
+        with self._lock:
+            self._accounts[partner_account_id] = account
+            self._balances.setdefault(partner_account_id, Decimal("0"))
         return account
 
     def get_deposit_address(self, partner_account_id: str, asset_code: str, network: str) -> str:
@@ -58,7 +118,12 @@ class MockStablecoinProvider(StablecoinProviderInterface):
         return account.deposit_address if account and account.deposit_address else ""
 
     def get_balance(self, partner_account_id: str, asset_code: str) -> Decimal:
-        return self._balances.get(partner_account_id, Decimal("0"))
+        return self.get_balances([partner_account_id], asset_code)[partner_account_id]
+
+    def get_balances(self, partner_account_ids: List[str], asset_code: str) -> Dict[str, Decimal]:
+        zero = Decimal("0")
+        with self._lock:
+            return {acct: self._balances.get(acct, zero) for acct in partner_account_ids}
 
     # --- ramps ---
     def quote_onramp(self, usd_amount: Decimal, asset_code: str) -> QuoteResult:
@@ -68,17 +133,16 @@ class MockStablecoinProvider(StablecoinProviderInterface):
         return self._quote(asset_code, "USD", asset_amount)
 
     def _quote(self, from_asset: str, to_asset: str, amount: Decimal) -> QuoteResult:
-        quote = QuoteResult(
+        quote = _Quote(
             quote_id=f"quote_{uuid.uuid4().hex[:12]}",
             from_asset=from_asset,
             to_asset=to_asset,
             from_amount=amount,
             to_amount=amount - FLAT_FEE,   # mock: 1:1 minus flat fee
             fee=FLAT_FEE,
-            expires_at=QUOTE_EXPIRES_AT,
         )
-        self._quotes[quote.quote_id] = quote
-        return quote
+        self._quotes.set(quote.quote_id, quote)
+        return quote.to_result()
 
     def execute_onramp(self, quote_id: str, idempotency_key: str) -> TransferResult:
         return self._settle_quote(quote_id, idempotency_key)
@@ -87,17 +151,20 @@ class MockStablecoinProvider(StablecoinProviderInterface):
         return self._settle_quote(quote_id, idempotency_key)
 
     def _settle_quote(self, quote_id: str, idempotency_key: str) -> TransferResult:
-        if idempotency_key in self._idempotency:
-            return self._idempotency[idempotency_key]
-        result = TransferResult(
-            partner_transfer_id=f"xfer_{uuid.uuid4().hex[:12]}",
-            status=OnchainStatus.CONFIRMED,
-            onchain_tx_hash=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex}",
-            confirmations=12,
-        )
-        self._transfers[result.partner_transfer_id] = result
-        self._idempotency[idempotency_key] = result
-        return result
+        return self._confirmed_transfer(idempotency_key)
+
+    def _confirmed_transfer(self, idempotency_key: str) -> TransferResult:
+        record = self._idempotency.get(idempotency_key)
+        if record is None:
+            record = _Transfer(
+                partner_transfer_id=f"xfer_{uuid.uuid4().hex[:12]}",
+                status=OnchainStatus.CONFIRMED,
+                onchain_tx_hash=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex}",
+                confirmations=12,
+            )
+            self._transfers.set(record.partner_transfer_id, record)
+            self._idempotency.set(idempotency_key, record)
+        return record.to_result()
 
     # --- transfers ---
     def transfer(
@@ -109,26 +176,15 @@ class MockStablecoinProvider(StablecoinProviderInterface):
         amount: Decimal,
         idempotency_key: str,
     ) -> TransferResult:
-        if idempotency_key in self._idempotency:
-            return self._idempotency[idempotency_key]
-        result = TransferResult(
-            partner_transfer_id=f"xfer_{uuid.uuid4().hex[:12]}",
-            status=OnchainStatus.CONFIRMED,
-            onchain_tx_hash=f"0x{uuid.uuid4().hex}{uuid.uuid4().hex}",
-            confirmations=12,
-        )
-        self._transfers[result.partner_transfer_id] = result
-        self._idempotency[idempotency_key] = result
-        return result
+        return self._confirmed_transfer(idempotency_key)
 
     def get_transfer_status(self, partner_transfer_id: str) -> TransferResult:
-        if partner_transfer_id in self._transfers:
-            return self._transfers[partner_transfer_id]
-        return TransferResult(
-            partner_transfer_id=partner_transfer_id,
-            status=OnchainStatus.FAILED,
-            failure_reason="Transfer not found",
-        )
+        return self.get_transfer_statuses([partner_transfer_id])[partner_transfer_id]
+
+    def get_transfer_statuses(self, partner_transfer_ids: List[str]) -> Dict[str, TransferResult]:
+        records = self._transfers.get_many(partner_transfer_ids)  # one pass over the store
+        return {tid: records[tid].to_result() if tid in records else _not_found(tid)
+                for tid in partner_transfer_ids}
 
     # --- webhooks ---
     def verify_webhook(self, headers: dict, raw_body: bytes) -> bool:
@@ -137,6 +193,19 @@ class MockStablecoinProvider(StablecoinProviderInterface):
     def parse_webhook_event(self, raw_body: bytes) -> dict:
         return json.loads(raw_body or b"{}")
 
+    def parse_webhook_events(self, raw_body: bytes) -> List[dict]:
+        return json.loads(raw_body or b"[]")
+
+    # --- instrumentation ---
+    def memory_stats(self, record_bytes: bool = True) -> dict:
+        """Size, hit/miss/eviction counters and approximate bytes per bounded store."""
+        return {
+            "quotes": cache_stats(self._quotes, record_bytes),
+            "transfers": cache_stats(self._transfers, record_bytes),
+            "idempotency": cache_stats(self._idempotency, record_bytes),
+            "accounts": {"size": len(self._accounts)},
+        }
+
 
 # Singleton instance (mirrors mock_bank_service)
 mock_stablecoin_provider = MockStablecoinProvider()
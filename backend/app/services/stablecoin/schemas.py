@@ -11,6 +11,7 @@ class OnchainStatus(str, Enum):
     CONFIRMED = "confirmed"
     FAILED = "failed"
     REORGED = "reorged"
+    UNKNOWN = "unknown"  # partner has no record: never existed, or expired from its store
 
 
 class KycStatus(str, Enum):
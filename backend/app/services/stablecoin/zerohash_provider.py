@@ -7,6 +7,10 @@ transfer status, webhook signature verification) is tracked as later work.
 Config to add when implemented (Secret Manager + app.config):
   ZEROHASH_API_KEY, ZEROHASH_API_SECRET, ZEROHASH_PASSPHRASE,
   ZEROHASH_BASE_URL (sandbox vs production), ZEROHASH_WEBHOOK_SECRET.
+
+Batch lookups: override get_balances / get_transfer_statuses with the bulk
+endpoints and set max_batch_size to the API's page limit. Until then the
+interface defaults loop over the single calls.
 """
 from decimal import Decimal
 
@@ -9,23 +9,34 @@ merchant entity (merchant_id). Pass merchant_id to route the balance to the
 merchant; omit it (the default) for a consumer wallet. KYC is always keyed to the
 acting user (user_id).
 """
+import logging
+import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, List, Optional
 
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.models.transaction import Transaction
 from app.models.kyc_record import KycRecord
 from app.models.crypto_account import CryptoAccount
 from app.models.ledger import Ledger
+from app.services import unit_of_work
 from app.services.event_service import log_event
-from app.services.ledger_service import record_credit, record_debit, get_balance
+from app.services.ledger_service import (
+    JournalLeg, get_balance, merchant_leg, post_journal, post_journals, record_credit, record_debit, wallet_leg,
+)
 from app.services.screening_service import screen_address, ScreeningBlockedError
 from app.services.stablecoin import get_stablecoin_provider
 from app.services.stablecoin.schemas import KycStatus, OnchainStatus
 from app.services.units import to_base_units, from_base_units
 from app.services.wallet_service import wallet_credit, wallet_debit, get_wallet_balance
+from app.utils.batching import chunked
+from app.utils.pagination import paginate
+
+logger = logging.getLogger(__name__)
 
 
 class KycRequiredError(PermissionError):
@@ -55,9 +66,8 @@ def _credit(db: Session, amount: Decimal, asset_code: str, *, user_id=None, merc
 def _debit(db: Session, amount: Decimal, asset_code: str, *, user_id=None, merchant_id=None,
            transaction_id=None, description=None) -> Ledger:
     if merchant_id:
-        if amount > get_balance(db, merchant_id, asset_code):
-            raise ValueError("Insufficient balance")
-        return record_debit(db, merchant_id, amount, transaction_id, description, asset_code)
+        # Funds are checked against the locked balance row, as wallet_debit does.
+        return record_debit(db, merchant_id, amount, transaction_id, description, asset_code, check_funds=True)
     return wallet_debit(db, user_id, amount, transaction_id, description, asset_code)
 
 
@@ -130,7 +140,30 @@ def _create_tx(
     sender_merchant_id=None, receiver_merchant_id=None,
     description: Optional[str] = None,
 ) -> Transaction:
-    tx = Transaction(
+    tx = _new_tx(
+        direction=direction, asset_code=asset_code, amount=amount, network=network,
+        onchain_tx_hash=onchain_tx_hash, onchain_status=onchain_status, confirmations=confirmations,
+        partner_transfer_id=partner_transfer_id, status=status,
+        sender_user_id=sender_user_id, receiver_user_id=receiver_user_id,
+        sender_merchant_id=sender_merchant_id, receiver_merchant_id=receiver_merchant_id,
+        description=description,
+    )
+    db.add(tx)
+    db.commit()
+    db.refresh(tx)
+    return tx
+
+
+def _new_tx(
+    *, direction: str, asset_code: str, amount: Decimal, network: str,
+    onchain_tx_hash: Optional[str], onchain_status: str, confirmations: int,
+    partner_transfer_id: Optional[str], status: str,
+    sender_user_id=None, receiver_user_id=None,
+    sender_merchant_id=None, receiver_merchant_id=None,
+    description: Optional[str] = None,
+) -> Transaction:
+    return Transaction(
+        id=str(uuid.uuid4()),
         sender_user_id=sender_user_id, receiver_user_id=receiver_user_id,
         sender_merchant_id=sender_merchant_id, receiver_merchant_id=receiver_merchant_id,
         amount=None, amount_base_units=to_base_units(amount, asset_code),
@@ -141,10 +174,6 @@ def _create_tx(
         confirmations=confirmations, partner="mock",
         partner_transfer_id=partner_transfer_id, direction=direction, description=description,
     )
-    db.add(tx)
-    db.commit()
-    db.refresh(tx)
-    return tx
 
 
 def onramp(db: Session, user_id: str, usd_amount: Decimal, asset_code: str,
@@ -278,24 +307,45 @@ def apply_settlement_update(
     transaction, so replays (e.g. duplicate webhooks) are safe. Inbound value is
     routed to the receiver owner (merchant or user).
     """
+    if _advance_onchain(tx, status, confirmations, onchain_tx_hash):
+        # The credit can't predate the transaction; on Postgres the created_at
+        # bound prunes the lookup to the partitions since tx.created_at.
+        already = db.query(Ledger.id).filter(
+            Ledger.transaction_id == tx.id, Ledger.created_at >= tx.created_at,
+        ).first()
+        leg = _inbound_leg(tx)
+        if leg is not None and not already:
+            post_journal(db, [leg], tx.id)
+        tx.status = "completed"
+
+    unit_of_work.commit(db)
+    db.refresh(tx)
+    return tx
+
+
+def _advance_onchain(tx: Transaction, status: OnchainStatus, confirmations: int,
+                     onchain_tx_hash: Optional[str]) -> bool:
+    """Record the on-chain state; True when this update completes the transaction."""
+    if status == OnchainStatus.UNKNOWN:
+        raise ValueError("An unknown on-chain status is not a settlement update")
     tx.onchain_status = status.value
     tx.confirmations = confirmations
     if onchain_tx_hash:
         tx.onchain_tx_hash = onchain_tx_hash
+    return status == OnchainStatus.CONFIRMED and tx.status != "completed"
 
-    if status == OnchainStatus.CONFIRMED and tx.status != "completed":
-        already = db.query(Ledger).filter(Ledger.transaction_id == tx.id).first()
-        owner = tx.receiver_merchant_id or tx.receiver_user_id
-        if tx.direction in ("onramp", "deposit") and owner and not already:
-            amount = from_base_units(int(tx.amount_base_units or 0), tx.asset_code or "USD")
-            _credit(db, amount, tx.asset_code or "USD",
-                    user_id=tx.receiver_user_id, merchant_id=tx.receiver_merchant_id,
-                    transaction_id=tx.id, description=tx.description)
-        tx.status = "completed"
 
-    db.commit()
-    db.refresh(tx)
-    return tx
+def _inbound_leg(tx: Transaction) -> Optional[JournalLeg]:
+    """The credit a confirmed inbound transaction owes its receiver, if any."""
+    if tx.direction not in ("onramp", "deposit"):
+        return None
+    asset_code = tx.asset_code or "USD"
+    amount = from_base_units(int(tx.amount_base_units or 0), asset_code)
+    if tx.receiver_merchant_id:
+        return merchant_leg(tx.receiver_merchant_id, "credit", amount, tx.description, asset_code)
+    if tx.receiver_user_id:
+        return wallet_leg(tx.receiver_user_id, "credit", amount, tx.description, asset_code)
+    return None
 
 
 # ----------------------------------------------------- async processing
@@ -346,29 +396,191 @@ def handle_partner_event(db: Session, event: dict) -> str:
     return "ignored"
 
 
-def poll_pending_settlements(db: Session, limit: int = 100) -> int:
-    """Poll the partner for still-pending on-chain transfers and advance them."""
+def handle_partner_events(db: Session, events: List[dict]) -> List[str]:
+    """Batched handle_partner_event: apply many events in one transaction.
+
+    Events are grouped by type, keeping their order within a type. Deposits
+    are deduped against existing transactions, and settlement updates load
+    their transactions and existing credits, with chunked IN queries; every
+    resulting credit goes through one post_journals call and the whole batch
+    commits once. Returns each event's outcome in input order. A malformed
+    event raises ValueError before anything is written.
+    """
+    outcomes = ["ignored"] * len(events)
+    deposits, updates, kyc_updates = [], [], []
+    for index, event in enumerate(events):
+        etype = event.get("type")
+        data = event.get("data", {}) or {}
+        try:
+            if etype == "deposit.confirmed":
+                deposits.append((index, data.get("user_id"), data.get("merchant_id"), data["asset_code"],
+                                 Decimal(str(data["amount"])), data["onchain_tx_hash"],
+                                 data.get("network", "ethereum")))
+            elif etype == "transfer.updated":
+                updates.append((index, data["partner_transfer_id"], OnchainStatus(data["status"]),
+                                int(data.get("confirmations", 0)), data.get("onchain_tx_hash")))
+            elif etype == "kyc.updated":
+                kyc_updates.append((index, data["user_id"], data.get("partner_kyc_id"), KycStatus(data["status"])))
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            raise ValueError(f"Malformed event {event.get('event_id')}: {e!r}") from e
+
+    credits: List[tuple] = []  # (leg, transaction_id)
+    with unit_of_work.transition(db):
+        _apply_deposits(db, deposits, outcomes, credits)
+        _apply_settlement_updates(db, updates, outcomes, credits)
+        _apply_kyc_updates(db, kyc_updates, outcomes)
+        if credits:
+            post_journals(db, [([leg], transaction_id) for leg, transaction_id in credits])
+    return outcomes
+
+
+def _apply_deposits(db: Session, deposits: list, outcomes: List[str], credits: list) -> None:
+    hashes = list(dict.fromkeys(d[5] for d in deposits))
+    seen = set()
+    for chunk in chunked(hashes):
+        seen.update(h for (h,) in db.query(Transaction.onchain_tx_hash)
+                    .filter(Transaction.onchain_tx_hash.in_(chunk)))
+
+    for index, user_id, merchant_id, asset_code, amount, tx_hash, network in deposits:
+        outcomes[index] = "deposit_credited"
+        if tx_hash in seen:
+            continue  # idempotent by onchain_tx_hash, as credit_deposit
+        seen.add(tx_hash)
+        tx = _new_tx(
+            direction="deposit", asset_code=asset_code, amount=amount, network=network,
+            onchain_tx_hash=tx_hash, onchain_status=OnchainStatus.CONFIRMED.value,
+            confirmations=12, partner_transfer_id=None, status="completed",
+            receiver_user_id=None if merchant_id else user_id, receiver_merchant_id=merchant_id,
+            description=f"Deposit {amount} {asset_code}",
+        )
+        db.add(tx)
+        leg = _inbound_leg(tx)
+        if leg is not None:
+            credits.append((leg, tx.id))
+        log_event(db, "stablecoin.deposit", "stablecoin_service", tx.id,
+                  {"asset": asset_code, "amount": str(amount), "onchain_tx_hash": tx_hash})
+
+
+def _apply_settlement_updates(db: Session, updates: list, outcomes: List[str], credits: list) -> None:
+    transfer_ids = list(dict.fromkeys(u[1] for u in updates))
+    txs: Dict[str, Transaction] = {}
+    for chunk in chunked(transfer_ids):
+        for tx in db.query(Transaction).filter(Transaction.partner_transfer_id.in_(chunk)):
+            txs.setdefault(tx.partner_transfer_id, tx)
+
+    inbound = [tx for tx in txs.values() if tx.direction in ("onramp", "deposit") and tx.status != "completed"]
+    credited = set()
+    for chunk in chunked(inbound):
+        credited.update(tid for (tid,) in db.query(Ledger.transaction_id).filter(
+            Ledger.transaction_id.in_([tx.id for tx in chunk]),
+            Ledger.created_at >= min(tx.created_at for tx in chunk),
+        ))
+
+    for index, transfer_id, status, confirmations, tx_hash in updates:
+        tx = txs.get(transfer_id)
+        if tx is None:
+            outcomes[index] = "transfer_not_found"
+            continue
+        if _advance_onchain(tx, status, confirmations, tx_hash):
+            leg = _inbound_leg(tx)
+            if leg is not None and tx.id not in credited:
+                credits.append((leg, tx.id))
+                credited.add(tx.id)
+            tx.status = "completed"
+        outcomes[index] = "transfer_updated"
+
+
+def _apply_kyc_updates(db: Session, kyc_updates: list, outcomes: List[str]) -> None:
+    user_ids = list(dict.fromkeys(k[1] for k in kyc_updates))
+    records: Dict[str, KycRecord] = {}
+    for chunk in chunked(user_ids):
+        for record in db.query(KycRecord).filter(KycRecord.user_id.in_(chunk)):
+            records.setdefault(record.user_id, record)
+
+    for index, user_id, partner_kyc_id, status in kyc_updates:
+        record = records.get(user_id)
+        if record is None:
+            record = records[user_id] = KycRecord(user_id=user_id, partner="mock",
+                                                  partner_kyc_id=partner_kyc_id, status=status.value)
+            db.add(record)
+        else:
+            if partner_kyc_id:
+                record.partner_kyc_id = partner_kyc_id
+            record.status = status.value
+        outcomes[index] = "kyc_updated"
+
+
+def _fetch_statuses(provider, transfer_ids: List[str]) -> dict:
+    """get_transfer_statuses in chunks of the provider's max_batch_size,
+    SETTLEMENT_POLL_CONCURRENCY chunks at a time.
+
+    Maps each id to its TransferResult, or to the exception its chunk raised
+    (a LookupError when the partner has no status for it, so the row is left
+    pending rather than failed).
+    """
+    size = max(1, provider.max_batch_size)
+    chunks = [transfer_ids[i:i + size] for i in range(0, len(transfer_ids), size)]
+    results = {}
+    workers = max(1, min(settings.SETTLEMENT_POLL_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="settle-poll") as pool:
+        futures = {pool.submit(provider.get_transfer_statuses, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                statuses = future.result()
+            except Exception as exc:  # one partner error must not sink the page
+                statuses = dict.fromkeys(futures[future], exc)
+            for tid in futures[future]:
+                result = statuses.get(tid)
+                if result is None or getattr(result, "status", None) == OnchainStatus.UNKNOWN:
+                    result = LookupError(f"No status known for {tid}")
+                results[tid] = result
+    return results
+
+
+def poll_pending_settlements(db: Session, limit: Optional[int] = None, cursor: Optional[str] = None,
+                             time_budget_seconds: Optional[float] = None) -> dict:
+    """Poll the partner for still-pending on-chain transfers and advance them.
+
+    Walks the pending set oldest-first in pages of SETTLEMENT_POLL_BATCH_SIZE.
+    Each page's statuses are fetched with batched partner calls, then applied in a single
+    transaction (each row in its own savepoint, so one bad row is skipped
+    rather than rolling back the page). Stops after `limit` transfers or when
+    the time budget is spent; `next_cursor` is then where the next call
+    should resume, and None once the pending set has been walked to its end.
+    """
+    limit = settings.SETTLEMENT_POLL_MAX_TRANSFERS if limit is None else limit
+    budget = settings.SETTLEMENT_POLL_TIME_BUDGET_SECONDS if time_budget_seconds is None else time_budget_seconds
+    deadline = time.monotonic() + budget
     provider = get_stablecoin_provider()
     pending = db.query(Transaction).filter(
         Transaction.settlement_type == "onchain",
         Transaction.onchain_status.in_(["submitted", "confirming"]),
         Transaction.partner_transfer_id.isnot(None),
-    ).limit(limit).all()
-
-    for tx in pending:
-        result = provider.get_transfer_status(tx.partner_transfer_id)
-        apply_settlement_update(db, tx, result.status, result.confirmations, result.onchain_tx_hash)
-    return len(pending)
-
+    )
 
-def run_reconciliation(db: Session) -> list:
-    """Reconcile every crypto account (merchant or user) against the partner balance."""
-    from app.services.reconciliation_service import reconcile_owner
+    settled = failed = 0
+    while settled + failed < limit and time.monotonic() < deadline:
+        page = paginate(pending, page_size=min(settings.SETTLEMENT_POLL_BATCH_SIZE, limit - settled - failed),
+                        keyset=(Transaction.created_at, Transaction.id), cursor=cursor,
+                        with_total=False, oldest_first=True)
+        batch = page["items"]
+        statuses = _fetch_statuses(provider, [tx.partner_transfer_id for tx in batch])
+        with unit_of_work.transition(db):
+            for tx in batch:
+                result = statuses[tx.partner_transfer_id]
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    with db.begin_nested():
+                        apply_settlement_update(db, tx, result.status, result.confirmations,
+                                                result.onchain_tx_hash)
+                except Exception:
+                    logger.warning("Settlement poll failed for transaction %s", tx.id, exc_info=True)
+                    failed += 1
+                else:
+                    settled += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return {"settled": settled, "failed": failed, "next_cursor": cursor}
 
-    reports = []
-    for acct in db.query(CryptoAccount).all():
-        reports.append(reconcile_owner(
-            db, acct.asset_code, acct.partner_account_id,
-            user_id=acct.user_id, merchant_id=acct.merchant_id,
-        ))
-    return reports
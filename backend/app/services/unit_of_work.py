@@ -0,0 +1,78 @@
+"""Unit of work: one commit per payment state transition.
+
+A transition (initiated, settled/failed, wallet send) collects every write it
+causes -- the transaction row, ledger legs, balance updates, audit events and
+notification outbox rows -- and commits them together when the outermost
+`transition(db)` block exits, or rolls them all back if it raises.
+
+Helpers that used to commit on their own (post_journal, notify_transaction)
+call `commit(db)` instead, which only flushes while a transition is open, and
+defer side effects that must not run before the data is durable (waking the
+notification dispatcher) with `after_commit(db, fn)`.
+
+Outside a transition both helpers behave as before: commit immediately, run
+the callback immediately.
+"""
+from typing import Callable, List, Optional
+
+from sqlalchemy.orm import Session
+
+_KEY = "unit_of_work"
+
+
+class UnitOfWork:
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self.depth = 0
+        self._callbacks: List[Callable[[], None]] = []
+
+    def __enter__(self) -> "UnitOfWork":
+        self.depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.depth -= 1
+        if self.depth:
+            if exc_type is None:
+                self.db.flush()
+            return False
+
+        self.db.info.pop(_KEY, None)
+        if exc_type is not None:
+            self.db.rollback()
+            return False
+        self.db.commit()
+        for callback in self._callbacks:
+            callback()
+        return False
+
+
+def current(db: Session) -> Optional[UnitOfWork]:
+    """The transition open on `db`, if any."""
+    return db.info.get(_KEY)
+
+
+def transition(db: Session) -> UnitOfWork:
+    """Open (or join) the unit of work on `db`; use as a context manager."""
+    uow = current(db)
+    if uow is None:
+        uow = UnitOfWork(db)
+        db.info[_KEY] = uow
+    return uow
+
+
+def commit(db: Session) -> None:
+    """Commit now, or just flush if a transition will commit later."""
+    if current(db) is not None:
+        db.flush()
+    else:
+        db.commit()
+
+
+def after_commit(db: Session, callback: Callable[[], None]) -> None:
+    """Run `callback` once the enclosing transition commits (now if none is open)."""
+    uow = current(db)
+    if uow is None:
+        callback()
+    else:
+        uow._callbacks.append(callback)
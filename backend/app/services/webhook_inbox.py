@@ -0,0 +1,394 @@
+"""Inbound webhook processing, inline or through the webhook_inbox queue.
+
+In "inline" mode (WEBHOOK_INGEST_MODE) the receivers call process_* before
+responding. In "queue" mode they verify the signature, `enqueue` the raw event
+in a single INSERT whose ON CONFLICT DO NOTHING drops a redelivered event_id,
+and acknowledge; InboxWorker applies the events afterwards with the same
+process_* functions, so webhook_events and the audit log look the same in
+both modes.
+
+InboxWorker drains on a background thread (or from /tasks/webhooks/drain).
+Each pass claims a batch of due rows oldest-first, groups them by
+ordering_key (the partner transfer / bank reference an event touches) and
+applies the groups on up to WEBHOOK_INBOX_WORKERS threads, one session per
+group and events within a group strictly in order. A row is skipped while an
+earlier row for its key is held by another pass or waiting to be retried. A
+failing event stops its group, backs off and is retried, and after
+WEBHOOK_INBOX_MAX_ATTEMPTS it is parked as "dead" so its key moves on. A bank
+callback whose reference matches no transaction yet counts as failing.
+Delivery is at-least-once; the process_* functions are idempotent.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased, sessionmaker
+
+from app.config import settings
+from app.models.transaction import Transaction
+from app.models.webhook_event import WebhookEvent
+from app.models.webhook_inbox import WebhookInbox
+from app.services import unit_of_work
+from app.services.event_service import log_event
+from app.services.settlement_service import finalize_bank_transfer
+from app.services.stablecoin import get_stablecoin_provider
+from app.services.stablecoin_service import handle_partner_event, handle_partner_events
+from app.utils.batching import chunked
+
+logger = logging.getLogger(__name__)
+
+STABLECOIN = "stablecoin"
+BANK = "bank"
+
+PENDING = "pending"
+PROCESSING = "processing"
+PROCESSED = "processed"
+DEAD = "dead"
+
+_RETRY_MAX_SECONDS = 60
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# ----------------------------------------------------------------- processing
+
+def process_stablecoin_event(db: Session, event: dict) -> dict:
+    """Apply one parsed partner event unless its event_id was already recorded."""
+    event_id = event.get("event_id")
+    event_type = event.get("type")
+    if db.query(WebhookEvent).filter(WebhookEvent.event_id == event_id).first():
+        return {"status": "already_processed"}
+
+    outcome = handle_partner_event(db, event)
+
+    try:
+        db.add(WebhookEvent(provider="mock", event_id=event_id, event_type=event_type))
+        db.commit()
+    except IntegrityError:
+        # Concurrent delivery recorded it first; safe to treat as processed.
+        db.rollback()
+        return {"status": "already_processed"}
+
+    log_event(db, f"webhook.stablecoin.{event_type}", "stablecoin_webhooks", event_id, {"outcome": outcome})
+    return {"status": "processed", "outcome": outcome}
+
+
+def process_stablecoin_events(db: Session, events: List[dict]) -> dict:
+    """Batched process_stablecoin_event for partner backfills.
+
+    Already-recorded event_ids are found with chunked IN queries, the rest
+    are applied by handle_partner_events and recorded in webhook_events in
+    the same transaction, so a batch is applied entirely or not at all.
+    Returns how many events were applied and the count of each outcome.
+    """
+    if not all(event.get("event_id") for event in events):
+        raise ValueError("Missing event_id")
+    for attempt in range(2):
+        ids = list(dict.fromkeys(event["event_id"] for event in events))
+        recorded = set()
+        for chunk in chunked(ids):
+            recorded.update(eid for (eid,) in db.query(WebhookEvent.event_id).filter(WebhookEvent.event_id.in_(chunk)))
+        fresh = []
+        for event in events:
+            if event["event_id"] not in recorded:
+                recorded.add(event["event_id"])
+                fresh.append(event)
+        try:
+            with unit_of_work.transition(db):
+                outcomes = handle_partner_events(db, fresh)
+                db.add_all([WebhookEvent(provider="mock", event_id=event["event_id"], event_type=event.get("type"))
+                            for event in fresh])
+                for event, outcome in zip(fresh, outcomes):
+                    log_event(db, f"webhook.stablecoin.{event.get('type')}", "stablecoin_webhooks",
+                              event["event_id"], {"outcome": outcome})
+        except IntegrityError:
+            # A concurrent delivery recorded some of these first; dedupe again.
+            db.rollback()
+            if attempt:
+                raise
+            continue
+        counts: Dict[str, int] = {}
+        for outcome in outcomes:
+            counts[outcome] = counts.get(outcome, 0) + 1
+        counts["already_processed"] = len(events) - len(fresh)
+        return {"status": "processed", "processed": len(fresh), "outcomes": counts}
+
+
+def process_bank_event(db: Session, payload: dict) -> dict:
+    """Finalize the transaction a bank callback refers to."""
+    txn = db.query(Transaction).filter(Transaction.reference_id == payload["reference_id"]).first()
+    if not txn:
+        return {"status": "transaction_not_found"}
+
+    if not finalize_bank_transfer(db, txn, payload["status"], payload.get("failure_reason")):
+        return {"status": "already_processed"}
+
+    log_event(db, f"webhook.bank.{payload['status']}", "webhooks_router", txn.id, {
+        "reference_id": payload["reference_id"],
+    })
+    return {"status": "processed"}
+
+
+def stablecoin_ordering_key(event: dict) -> str:
+    """Events about the same transfer, deposit or KYC subject share a key."""
+    data = event.get("data") or {}
+    return str(data.get("partner_transfer_id") or data.get("onchain_tx_hash")
+               or data.get("user_id") or event.get("event_id"))
+
+
+# ----------------------------------------------------------------- ingestion
+
+def enqueue(db: Session, provider: str, event_id: str, event_type: Optional[str],
+            ordering_key: str, payload: str) -> bool:
+    """Append a raw event to the inbox; False when the event_id is already there."""
+    values = dict(id=str(uuid.uuid4()), provider=provider, event_id=event_id, event_type=event_type,
+                  ordering_key=ordering_key, payload=payload, status=PENDING, attempts=0,
+                  received_at=_utcnow())
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(WebhookInbox).values(**values).on_conflict_do_nothing(index_elements=["event_id"])
+        inserted = db.execute(stmt).rowcount == 1
+    else:
+        try:
+            with db.begin_nested():
+                db.add(WebhookInbox(**values))
+            inserted = True
+        except IntegrityError:
+            inserted = False
+    db.commit()
+
+    inbox_worker.record("received" if inserted else "duplicates")
+    if inserted:
+        inbox_worker.wake()
+    return inserted
+
+
+# ----------------------------------------------------------------- worker
+
+class InboxWorker:
+    """Drains webhook_inbox on a background thread; see the module docstring.
+
+    Also usable synchronously (drain) from the /tasks worker endpoint or tests.
+    Counters are process-local; see metrics().
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None) -> None:
+        self._session_factory = session_factory
+        self._drain_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {
+            "received": 0, "duplicates": 0, "processed": 0, "failed": 0, "dead": 0, "batches": 0,
+        }
+        self._last_batch_seconds = 0.0
+
+    # -- metrics --
+
+    def record(self, counter: str, n: int = 1) -> None:
+        with self._counter_lock:
+            self._counters[counter] += n
+
+    def metrics(self, db: Optional[Session] = None) -> dict:
+        with self._counter_lock:
+            snapshot = dict(self._counters)
+        snapshot["last_batch_seconds"] = round(self._last_batch_seconds, 4)
+        snapshot["running"] = bool(self._thread and self._thread.is_alive())
+        if db is not None:
+            for state in (PENDING, PROCESSING, DEAD):
+                snapshot[state] = db.query(WebhookInbox).filter(WebhookInbox.status == state).count()
+        return snapshot
+
+    # -- drain --
+
+    def _claim(self, db: Session) -> Tuple[str, Dict[str, List[str]]]:
+        """Mark a batch of due rows as ours; their ids grouped by ordering_key, in order."""
+        now = _utcnow()
+        earlier = aliased(WebhookInbox)
+        due = and_(WebhookInbox.status.in_([PENDING, PROCESSING]),
+                   or_(WebhookInbox.locked_until.is_(None), WebhookInbox.locked_until < now))
+        blocked = exists().where(
+            earlier.ordering_key == WebhookInbox.ordering_key,
+            earlier.received_at < WebhookInbox.received_at,
+            earlier.status.in_([PENDING, PROCESSING]),
+            earlier.locked_until >= now,
+        )
+        ids = [row.id for row in db.query(WebhookInbox.id).filter(due, ~blocked)
+               .order_by(WebhookInbox.received_at, WebhookInbox.id)
+               .limit(settings.WEBHOOK_INBOX_BATCH_SIZE)]
+        claim_id = str(uuid.uuid4())
+        if ids:
+            db.query(WebhookInbox).filter(WebhookInbox.id.in_(ids), due).update({
+                WebhookInbox.status: PROCESSING,
+                WebhookInbox.claim_id: claim_id,
+                WebhookInbox.locked_until: now + timedelta(seconds=settings.WEBHOOK_INBOX_LOCK_SECONDS),
+            }, synchronize_session=False)
+        db.commit()
+
+        groups: Dict[str, List[str]] = {}
+        if ids:
+            claimed = db.query(WebhookInbox.id, WebhookInbox.ordering_key) \
+                .filter(WebhookInbox.claim_id == claim_id) \
+                .order_by(WebhookInbox.received_at, WebhookInbox.id).all()
+            db.rollback()
+            for row in claimed:
+                groups.setdefault(row.ordering_key, []).append(row.id)
+        return claim_id, groups
+
+    @staticmethod
+    def _release(row: WebhookInbox, retry_at: Optional[datetime] = None) -> None:
+        row.status = PENDING
+        row.claim_id = None
+        row.locked_until = retry_at
+
+    @staticmethod
+    def _apply(db: Session, row: WebhookInbox) -> dict:
+        if row.provider == BANK:
+            result = process_bank_event(db, json.loads(row.payload))
+            if result["status"] == "transaction_not_found":
+                # The callback can beat the commit that records its reference:
+                # retry with backoff (parked as dead if it never appears).
+                raise LookupError(f"No transaction with reference {row.ordering_key}")
+            return result
+        event = get_stablecoin_provider().parse_webhook_event(row.payload.encode())
+        return process_stablecoin_event(db, event)
+
+    def _run_group(self, new_session: Callable[[], Session], claim_id: str, ids: List[str]) -> int:
+        """Apply one key's claimed rows in order; returns how many were handled."""
+        db = new_session()
+        handled = 0
+        try:
+            rows = db.query(WebhookInbox).filter(WebhookInbox.id.in_(ids)) \
+                .order_by(WebhookInbox.received_at, WebhookInbox.id).all()
+            first = rows[0]
+            # Another pass may hold (or be retrying) an earlier event for this key.
+            if db.query(WebhookInbox.id).filter(
+                WebhookInbox.ordering_key == first.ordering_key,
+                WebhookInbox.received_at < first.received_at,
+                WebhookInbox.status.in_([PENDING, PROCESSING]),
+                or_(WebhookInbox.claim_id.is_(None), WebhookInbox.claim_id != claim_id),
+            ).first():
+                for row in rows:
+                    self._release(row)
+                db.commit()
+                return 0
+
+            for index, row in enumerate(rows):
+                try:
+                    result = self._apply(db, row)
+                except Exception as e:
+                    db.rollback()
+                    handled += 1
+                    row.attempts += 1
+                    row.last_error = str(e)[:500]
+                    self.record("failed")
+                    if row.attempts >= settings.WEBHOOK_INBOX_MAX_ATTEMPTS:
+                        row.status = DEAD
+                        row.claim_id = None
+                        row.locked_until = None
+                        self.record("dead")
+                    else:
+                        delay = min(2 ** row.attempts, _RETRY_MAX_SECONDS)
+                        self._release(row, _utcnow() + timedelta(seconds=delay))
+                    for later in rows[index + 1:]:
+                        self._release(later)
+                    db.commit()
+                    logger.warning("webhook_inbox: event %s failed: %s", row.event_id, e)
+                    return handled
+                row.status = PROCESSED
+                row.outcome = result.get("outcome") or result["status"]
+                row.processed_at = _utcnow()
+                row.claim_id = None
+                row.locked_until = None
+                row.last_error = None
+                db.commit()
+                handled += 1
+                self.record("processed")
+            return handled
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def drain_batch(self, db: Session) -> int:
+        """Claim and apply one batch. Returns the number of events handled."""
+        with self._drain_lock:
+            started = time.monotonic()
+            claim_id, groups = self._claim(db)
+            if not groups:
+                return 0
+            new_session = self._session_factory or sessionmaker(bind=db.get_bind(), autoflush=False)
+            workers = max(1, min(settings.WEBHOOK_INBOX_WORKERS, len(groups)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook-inbox") as pool:
+                handled = sum(pool.map(lambda ids: self._run_group(new_session, claim_id, ids),
+                                       groups.values()))
+            self.record("batches")
+            self._last_batch_seconds = time.monotonic() - started
+            return handled
+
+    def drain(self, db: Session) -> int:
+        """Apply batches until nothing is due."""
+        total = 0
+        while True:
+            handled = self.drain_batch(db)
+            if not handled:
+                return total
+            total += handled
+
+    # -- background thread --
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _new_session(self) -> Session:
+        if self._session_factory is not None:
+            return self._session_factory()
+        from app.database import SessionLocal
+        return SessionLocal()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(timeout=settings.WEBHOOK_INBOX_POLL_SECONDS)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            db = self._new_session()
+            try:
+                self.drain(db)
+            except Exception as e:
+                db.rollback()
+                logger.warning("webhook_inbox: drain failed: %s", e)
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="webhook-inbox", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+inbox_worker = InboxWorker()
@@ -0,0 +1,15 @@
+"""Splitting large id lists for IN (...) queries.
+
+Bound parameters are capped per statement (SQLite 32766, Postgres 65535) and
+very long IN lists plan poorly, so bulk lookups go out IN_CHUNK ids at a time.
+"""
+from typing import Iterator, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+IN_CHUNK = 500
+
+
+def chunked(items: Sequence[T], size: int = IN_CHUNK) -> Iterator[List[T]]:
+    for start in range(0, len(items), size):
+        yield list(items[start:start + size])
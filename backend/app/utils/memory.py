@@ -0,0 +1,38 @@
+"""Rough memory accounting for in-process stores and the process itself.
+
+Used to report what the in-memory mocks hold during load/soak runs; the sizes
+are shallow estimates (object plus its slot/field values), not a heap profile.
+"""
+import resource
+import sys
+from typing import Iterable, Optional
+
+from app.utils.ttl_cache import TTLCache
+
+
+def approx_size(obj) -> int:
+    """Bytes of `obj` plus its direct slot / tuple field values."""
+    size = sys.getsizeof(obj)
+    if isinstance(obj, tuple):
+        fields: Iterable = obj
+    else:
+        fields = (getattr(obj, name, None) for name in getattr(type(obj), "__slots__", ()))
+    return size + sum(sys.getsizeof(value) for value in fields if value is not None)
+
+
+def cache_stats(cache: TTLCache, record_bytes: bool = True) -> dict:
+    """TTLCache counters plus the approximate bytes held by its live values."""
+    stats = cache.stats()
+    if record_bytes:
+        stats["approx_bytes"] = sum(approx_size(value) for value in cache.values())
+    return stats
+
+
+def rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux), else its peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
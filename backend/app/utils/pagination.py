@@ -1,15 +1,94 @@
-from typing import TypeVar, Generic, List
+"""Offset and keyset (cursor) pagination over SQLAlchemy queries.
+
+Keyset mode orders newest-first (or, on request, oldest-first) on (sort
+column, id) and continues strictly after the last row of the previous page,
+so a page costs the same at any depth (given an index on the filter columns +
+sort column) and rows inserted meanwhile do not shift pages. The sort column
+is compared as stored, so it must be written in one format (see
+Transaction.created_at). Cursors are opaque base64url tokens.
+"""
+import base64
+import json
+import operator
+from datetime import datetime
+from typing import Optional, Tuple, TypeVar
+
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Query
 
 T = TypeVar("T")
 
 
-def paginate(query: Query, page: int = 1, page_size: int = 20) -> dict:
-    total = query.count()
-    items = query.offset((page - 1) * page_size).limit(page_size).all()
+def encode_cursor(sort_value: datetime, row_id: str) -> str:
+    raw = json.dumps({"t": sort_value.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_cursor; raises ValueError on a malformed cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), str(data["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def paginate(
+    query: Query,
+    page: int = 1,
+    page_size: int = 20,
+    *,
+    keyset: Optional[tuple] = None,
+    cursor: Optional[str] = None,
+    with_total: bool = True,
+    oldest_first: bool = False,
+) -> dict:
+    """Paginate `query`.
+
+    Without `keyset`, classic OFFSET paging (the query supplies its ordering).
+    With `keyset=(sort_column, id_column)` the query is ordered newest-first on
+    that pair (oldest-first with `oldest_first`); `cursor` (from a previous
+    page's `next_cursor`) selects the page and `page` is ignored. In keyset
+    mode `next_cursor` is set when more rows exist; in OFFSET mode it is always
+    None and `has_more` alone says whether another page exists. `total` is None
+    when with_total is False.
+    """
+    total = query.count() if with_total else None
+
+    if keyset is None:
+        rows = query.offset((page - 1) * page_size).limit(page_size + 1).all()
+        items = rows[:page_size]
+        return {
+            "items": items,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": None,
+            "has_more": len(rows) > page_size,
+        }
+
+    sort_col, id_col = keyset
+    beyond = operator.gt if oldest_first else operator.lt
+    if cursor:
+        after_value, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            beyond(sort_col, after_value),
+            and_(sort_col == after_value, beyond(id_col, after_id)),
+        ))
+    order = (sort_col.asc(), id_col.asc()) if oldest_first else (sort_col.desc(), id_col.desc())
+    rows = query.order_by(*order).limit(page_size + 1).all()
+    items = rows[:page_size]
+    has_more = len(rows) > page_size
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, sort_col.key), getattr(last, id_col.key))
     return {
         "items": items,
         "total": total,
         "page": page,
         "page_size": page_size,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
     }
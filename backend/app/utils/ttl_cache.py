@@ -0,0 +1,98 @@
+"""Small thread-safe, bounded LRU cache with per-entry TTL.
+
+Process-local; used for hot-path lookups whose staleness is acceptable for a
+short time (descriptions, display names). Callers invalidate explicitly on
+writes they control. Entries past their TTL are dropped when read, and from
+the least recently used end whenever a new entry is set, so a cache that is
+only written to still stays bounded by both maxsize and ttl.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: Hashable, now: float) -> Any:
+        # Caller holds the lock.
+        item = self._data.get(key, _MISSING)
+        if item is not _MISSING:
+            expires_at, value = item
+            if expires_at >= now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+            self.evictions += 1
+        self.misses += 1
+        return _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key, self._clock())
+        return default if value is _MISSING else value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Live values for `keys` (missing or expired keys are left out), in one locked pass."""
+        with self._lock:
+            now = self._clock()
+            found = {key: self._lookup(key, now) for key in keys}
+        return {key: value for key, value in found.items() if value is not _MISSING}
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = self._clock() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            now = self._clock()
+            while self._data and (len(self._data) > self.maxsize or next(iter(self._data.values()))[0] < now):
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+        return default if item is _MISSING else item[1]
+
+    def discard_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def values(self) -> list:
+        """Snapshot of the live values, least recently used first."""
+        now = self._clock()
+        with self._lock:
+            return [value for expires_at, value in self._data.values() if expires_at >= now]
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
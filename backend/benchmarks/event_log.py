@@ -0,0 +1,120 @@
+"""Commits per payment: per-event commits (legacy) vs the batched event log.
+
+    cd backend && python -m benchmarks.event_log [--payments 200]
+
+Runs create_payment end to end against a throwaway SQLite database with an
+instant, always-successful bank, and counts real COMMITs on the engine.
+"legacy" reproduces the previous behaviour: callers committed their own
+work first, then log_event added and committed each event on its own.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import BankConfig, EventLog, Merchant
+from app.schemas.transaction import PaymentCreate
+from app.services import event_service
+from app.services.bank.schemas import TransferResponse
+from app.services.ledger_service import record_credit
+from app.services.payment_service import create_payment
+
+# Modules that imported log_event by name.
+_LOG_EVENT_USERS = (
+    "app.services.payment_service",
+    "app.services.settlement_service",
+)
+
+
+def _legacy_log_event(db, event_type, source, reference_id=None, payload=None):
+    db.commit()  # the caller's own commit, which used to precede every log_event
+    row = EventLog(event_type=event_type, source=source, reference_id=reference_id,
+                   payload=json.dumps(payload) if payload else None)
+    db.add(row)
+    db.commit()
+    return row
+
+
+def _instant_bank(request):
+    return TransferResponse(reference_id=str(uuid.uuid4()), status="completed",
+                            rail=request.rail, amount=request.amount)
+
+
+def _seed(Session):
+    db = Session()
+    db.add(BankConfig(bank_name="MockBank", supported_rails="fednow,rtp,ach,card",
+                      fednow_limit=Decimal("500000"), rtp_limit=Decimal("1000000"),
+                      ach_limit=Decimal("10000000"), is_active=True))
+    for n, mid in enumerate(("bench-a", "bench-b")):
+        db.add(Merchant(id=mid, name=mid, ein=f"00-000000{n}", contact_email=f"{mid}@bench.test",
+                        onboarding_status="active", kyb_status="approved"))
+    db.commit()
+    record_credit(db, "bench-a", Decimal("1000000"))
+    db.close()
+
+
+def run(mode: str, payments: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), f"bench_{mode}.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    _seed(Session)
+
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+    sink = event_service.EventSink(session_factory=Session)
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("app.services.bank.mock_bank.mock_bank_service.initiate_transfer",
+                                  side_effect=_instant_bank))
+        stack.enter_context(patch.object(event_service.settings, "EVENT_LOG_MODE",
+                                         "async" if mode == "async" else "sync"))
+        stack.enter_context(patch.object(event_service, "event_sink", sink))
+        if mode == "legacy":
+            for module in _LOG_EVENT_USERS:
+                stack.enter_context(patch(f"{module}.log_event", _legacy_log_event))
+
+        db = Session()
+        started = time.perf_counter()
+        for i in range(payments):
+            create_payment(db, PaymentCreate(
+                sender_merchant_id="bench-a", receiver_merchant_id="bench-b",
+                amount=Decimal("1.00"), idempotency_key=f"bench-{mode}-{i}",
+                preferred_rail="ach", description="bench",
+            ))
+        elapsed = time.perf_counter() - started
+        request_commits = len(commits)
+        sink.stop()
+        events = db.query(EventLog).count()
+        db.close()
+
+    engine.dispose()
+    return {
+        "mode": mode,
+        "payments": payments,
+        "commits_per_payment": round(request_commits / payments, 2),
+        "background_commits": len(commits) - request_commits,
+        "events_written": events,
+        "ms_per_payment": round(elapsed * 1000 / payments, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=200)
+    args = parser.parse_args()
+    for mode in ("legacy", "sync", "async"):
+        print(json.dumps(run(mode, args.payments)))
+
+
+if __name__ == "__main__":
+    main()
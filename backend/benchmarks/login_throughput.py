@@ -0,0 +1,119 @@
+"""Login throughput under a burst, and what it does to everyone else's latency.
+
+    cd backend && python -m benchmarks.login_throughput [--logins 200] [--concurrency 64]
+    BCRYPT_ROUNDS=10 PASSWORD_HASH_WORKERS=4 PASSWORD_HASH_MAX_PENDING=64 python -m benchmarks.login_throughput
+
+Serves the real app with uvicorn and fires --logins concurrent POST /auth/login
+requests while a single probe thread polls GET / (a sync endpoint that runs on
+the shared request threadpool). bcrypt runs on the dedicated PASSWORD_HASH_*
+pool, so the burst should cost logins 429s rather than probe latency. Run once
+per configuration to compare work factors and pool sizes.
+
+Prints logins/s, 200 vs 429 counts, login p50/p99 and the probe's p50/p99.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'login.db')}")
+os.environ.setdefault("NOTIFICATION_DISPATCHER_ENABLED", "false")
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+
+import httpx  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import User  # noqa: E402
+from app.services.auth_service import hash_password, password_hasher  # noqa: E402
+from benchmarks.payments_load import _free_port, _percentile, _serve  # noqa: E402
+
+USERS = 32
+PASSWORD = "bench-password"
+
+
+def _seed() -> None:
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        hashed = hash_password(PASSWORD)
+        for n in range(USERS):
+            uid = f"login-u{n:02d}"
+            if db.get(User, uid) is None:
+                db.add(User(id=uid, email=f"{uid}@bench.test", hashed_password=hashed, role="user"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    _seed()
+    port = _free_port()
+    server = _serve(port)
+    base_url = f"http://127.0.0.1:{port}"
+    done = threading.Event()
+    probe_latencies = []
+
+    def probe():
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while not done.is_set():
+                started = time.perf_counter()
+                client.get("/")
+                probe_latencies.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.01)
+
+    local = threading.local()
+
+    def login(i: int):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=base_url, timeout=60)
+        started = time.perf_counter()
+        try:
+            status = client.post("/auth/login", json={
+                "email": f"login-u{i % USERS:02d}@bench.test", "password": PASSWORD,
+            }).status_code
+        except httpx.HTTPError:
+            status = 599
+        return (time.perf_counter() - started) * 1000, status
+
+    prober = threading.Thread(target=probe, daemon=True)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(login, range(args.logins)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+    server.should_exit = True
+
+    ok = sorted(ms for ms, code in results if code == 200)
+    probes = sorted(probe_latencies)
+    print(json.dumps({
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "hash_workers": settings.PASSWORD_HASH_WORKERS,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "logins": args.logins,
+        "concurrency": args.concurrency,
+        "ok": len(ok),
+        "rejected_429": sum(1 for _, code in results if code == 429),
+        "other_errors": sum(1 for _, code in results if code not in (200, 429)),
+        "logins_per_s": round(len(ok) / elapsed, 1),
+        "login_p50_ms": round(_percentile(ok, 50), 1),
+        "login_p99_ms": round(_percentile(ok, 99), 1),
+        "probe_p50_ms": round(_percentile(probes, 50), 1),
+        "probe_p99_ms": round(_percentile(probes, 99), 1),
+        "hasher_rejected": password_hasher.rejected,
+    }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Latency percentiles of concurrent /payments traffic under the configured pool.
+
+    cd backend && python -m benchmarks.payments_load [--requests 400] [--concurrency 32] [--list]
+    DATABASE_URL=postgresql://... DB_POOL_SIZE=10 DB_MAX_OVERFLOW=0 python -m benchmarks.payments_load
+    DATABASE_URL=postgresql://...@pgbouncer:6432/... DB_PGBOUNCER=true python -m benchmarks.payments_load
+
+Serves the real app with uvicorn on a local port and drives it with one HTTP
+client per worker thread, so pool checkout, connection setup and the mock
+bank's rail latency all show up in the numbers. The pool is configured from
+the DB_* environment exactly as in production; run once per configuration to
+compare. Without DATABASE_URL a throwaway SQLite file is used. Point
+DATABASE_URL at a scratch database: tables are created and seeded.
+
+--list sends GET /payments (the async read path) instead of POST /payments.
+
+Prints p50/p95/p99/max latency, throughput, error count, the pool metrics
+snapshot (peak checked-out connections, overflow, connects), process RSS and
+what the mock bank holds (MOCK_PROVIDER_CACHE_* bound it), so long runs show
+whether memory stays flat.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}")
+os.environ.setdefault("NOTIFICATION_DISPATCHER_ENABLED", "false")
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import socket  # noqa: E402
+import threading  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+from decimal import Decimal  # noqa: E402
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from app.database import Base, SessionLocal, async_pool_metrics, engine, pool_metrics  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import BankConfig, Merchant, User  # noqa: E402
+from app.services.auth_service import create_access_token  # noqa: E402
+from app.services.bank.mock_bank import mock_bank_service  # noqa: E402
+from app.utils.memory import rss_bytes  # noqa: E402
+from app.services.ledger_service import record_credit  # noqa: E402
+
+MERCHANTS = 16
+
+
+def _seed() -> str:
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        if not db.query(BankConfig).filter(BankConfig.bank_name == "MockBank").first():
+            db.add(BankConfig(bank_name="MockBank", supported_rails="fednow,rtp,ach,card",
+                              fednow_limit=Decimal("500000"), rtp_limit=Decimal("1000000"),
+                              ach_limit=Decimal("10000000"), is_active=True))
+        for n in range(MERCHANTS):
+            mid = f"load-m{n:02d}"
+            if db.get(Merchant, mid) is None:
+                db.add(Merchant(id=mid, name=f"Load {n}", ein=f"90-00000{n:02d}",
+                                contact_email=f"{mid}@load.test",
+                                onboarding_status="active", kyb_status="approved"))
+        if db.get(User, "load-admin") is None:
+            db.add(User(id="load-admin", email="admin@load.test", hashed_password="x",
+                        role="merchant_admin", merchant_id="load-m00"))
+        db.commit()
+        for n in range(MERCHANTS):
+            record_credit(db, f"load-m{n:02d}", Decimal("1000000"))
+    finally:
+        db.close()
+    return create_access_token({"sub": "load-admin", "email": "admin@load.test", "role": "merchant_admin"})
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--rail", default="fednow")
+    parser.add_argument("--list", action="store_true", help="GET /payments instead of creating payments")
+    args = parser.parse_args()
+
+    token = _seed()
+    port = _free_port()
+    server = _serve(port)
+    local = threading.local()
+
+    def one(i: int):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60,
+                                                 headers={"Authorization": f"Bearer {token}"})
+        sender, receiver = i % MERCHANTS, (i + 1) % MERCHANTS
+        started = time.perf_counter()
+        try:
+            if args.list:
+                status = client.get("/payments", params={"merchant_id": f"load-m{sender:02d}"}).status_code
+                return time.perf_counter() - started, status
+            status = client.post("/payments", json={
+                "sender_merchant_id": f"load-m{sender:02d}", "receiver_merchant_id": f"load-m{receiver:02d}",
+                "amount": "1.00", "currency": "USD", "idempotency_key": str(uuid.uuid4()),
+                "preferred_rail": args.rail, "description": "load test",
+            }).status_code
+        except httpx.HTTPError:
+            status = 599  # e.g. pool timeout surfaced as a dropped connection
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    server.should_exit = True
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    errors = sum(1 for _, code in results if code >= 400)
+    print(json.dumps({
+        "dialect": engine.dialect.name,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "p50_ms": round(_percentile(latencies, 50), 1),
+        "p95_ms": round(_percentile(latencies, 95), 1),
+        "p99_ms": round(_percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1),
+        "pool": pool_metrics.snapshot(),
+        "async_pool": async_pool_metrics.snapshot(),
+        "rss_bytes": rss_bytes(),
+        "mock_bank": mock_bank_service.memory_stats(),
+    }))
+
+
+if __name__ == "__main__":
+    main()
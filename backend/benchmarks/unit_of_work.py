@@ -0,0 +1,179 @@
+"""Commits and write-lock hold time per payment: per-step commits vs unit of work.
+
+    cd backend && python -m benchmarks.unit_of_work [--ops 200] [--database-url URL]
+
+Runs create_payment (merchant -> merchant, instant bank) and /wallet/send
+end to end with e-mail notifications enabled, so every transition also writes
+an outbox row. Without --database-url a throwaway SQLite file is used; pass a
+Postgres URL pointing at a scratch database to measure there (tables are
+created and dropped by the run).
+
+"per-step" reproduces the previous behaviour: the settled/failed state was
+committed before notifications were enqueued, and helpers that now join the
+enclosing transition (post_journal, notify_transaction) committed on their own.
+Each COMMIT is one WAL fsync on both engines. Lock hold time is measured per
+DB transaction, from its first write (INSERT/UPDATE/DELETE or SELECT ... FOR
+UPDATE) to its COMMIT/ROLLBACK, and summed per operation.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+from contextlib import ExitStack
+from decimal import Decimal
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import BankConfig, Merchant, User
+from app.routers.wallet_transfer import WalletSendRequest, wallet_send
+from app.schemas.transaction import PaymentCreate
+from app.services import event_service, notification_service, unit_of_work
+from app.services.bank.schemas import TransferResponse
+from app.services.ledger_service import record_credit
+from app.services.payment_service import create_payment
+from app.services.wallet_service import wallet_credit
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE")
+
+
+_notify_transaction = notification_service.notify_transaction
+
+
+def _per_step_notify(db, *args, **kwargs):
+    db.commit()  # the state change used to commit before notifying
+    return _notify_transaction(db, *args, **kwargs)
+
+
+def _instant_bank(request):
+    return TransferResponse(reference_id=str(uuid.uuid4()), status="completed",
+                            rail=request.rail, amount=request.amount)
+
+
+class LockClock:
+    """Engine listener: commits, and time from first write to end of transaction."""
+
+    def __init__(self, engine) -> None:
+        self.commits = 0
+        self.held = 0.0
+        event.listen(engine, "before_cursor_execute", self._statement)
+        event.listen(engine, "commit", self._end(True))
+        event.listen(engine, "rollback", self._end(False))
+
+    def _statement(self, conn, cursor, statement, parameters, context, executemany):
+        sql = statement.lstrip().upper()
+        if sql.startswith(_WRITE_PREFIXES) or "FOR UPDATE" in sql:
+            conn.info.setdefault("bench_write_started", time.perf_counter())
+
+    def _end(self, committed: bool):
+        def listener(conn):
+            started = conn.info.pop("bench_write_started", None)
+            if committed:
+                self.commits += 1
+            if started is not None:
+                self.held += time.perf_counter() - started
+        return listener
+
+    def reset(self) -> None:
+        self.commits, self.held = 0, 0.0
+
+
+def _seed(Session) -> None:
+    db = Session()
+    db.add(BankConfig(bank_name="MockBank", supported_rails="fednow,rtp,ach,card",
+                      fednow_limit=Decimal("500000"), rtp_limit=Decimal("1000000"),
+                      ach_limit=Decimal("10000000"), is_active=True))
+    for n, mid in enumerate(("bench-a", "bench-b")):
+        db.add(Merchant(id=mid, name=mid, ein=f"00-000000{n}", contact_email=f"{mid}@bench.test",
+                        onboarding_status="active", kyb_status="approved"))
+        db.add(User(id=f"{mid}-admin", email=f"{mid}@bench.test", hashed_password="x",
+                    role="merchant_admin", merchant_id=mid))
+    for uid in ("bench-u1", "bench-u2"):
+        db.add(User(id=uid, email=f"{uid}@bench.test", hashed_password="x", role="user"))
+    db.commit()
+    record_credit(db, "bench-a", Decimal("1000000"))
+    wallet_credit(db, "bench-u1", Decimal("1000000"))
+    db.close()
+
+
+def _payment(db, mode, i):
+    create_payment(db, PaymentCreate(
+        sender_merchant_id="bench-a", receiver_merchant_id="bench-b", amount=Decimal("1.00"),
+        idempotency_key=f"pay-{mode}-{i}", preferred_rail="ach", description="bench",
+    ))
+
+
+def _wallet_send(db, mode, i):
+    sender = db.get(User, "bench-u1")
+    wallet_send(WalletSendRequest(receiver_user_id="bench-u2", amount=Decimal("1.00"),
+                                  idempotency_key=f"send-{mode}-{i}", description="bench"),
+                db=db, current_user=sender)
+
+
+FLOWS = {"payment": _payment, "wallet_send": _wallet_send}
+
+
+def run(mode: str, ops: int, database_url: str = "") -> list:
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), f'bench_{mode}.db')}"
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    _seed(Session)
+    clock = LockClock(engine)
+
+    results = []
+    with ExitStack() as stack:
+        stack.enter_context(patch("app.services.bank.mock_bank.mock_bank_service.initiate_transfer",
+                                  side_effect=_instant_bank))
+        stack.enter_context(patch.object(event_service.settings, "EVENT_LOG_MODE", "sync"))
+        stack.enter_context(patch.object(notification_service.settings, "SMTP_USERNAME", "bench"))
+        stack.enter_context(patch.object(notification_service.settings, "SMTP_PASSWORD", "bench"))
+        stack.enter_context(patch.object(notification_service.dispatcher, "wake", lambda: None))
+        stack.enter_context(patch("app.services.description_service.enrich_later"))
+        if mode == "per-step":
+            stack.enter_context(patch.object(unit_of_work, "current", lambda db: None))
+            stack.enter_context(patch.object(notification_service, "notify_transaction", _per_step_notify))
+
+        db = Session()
+        for flow, op in FLOWS.items():
+            clock.reset()
+            started = time.perf_counter()
+            for i in range(ops):
+                op(db, mode, i)
+            elapsed = time.perf_counter() - started
+            results.append({
+                "dialect": engine.dialect.name,
+                "mode": mode,
+                "flow": flow,
+                "ops": ops,
+                "commits_per_op": round(clock.commits / ops, 2),
+                "lock_ms_per_op": round(clock.held * 1000 / ops, 3),
+                "ms_per_op": round(elapsed * 1000 / ops, 3),
+            })
+        db.close()
+
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--database-url", default="",
+                        help="scratch database to run against (default: temporary SQLite file)")
+    args = parser.parse_args()
+    for mode in ("per-step", "unit-of-work"):
+        for row in run(mode, args.ops, args.database_url):
+            print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
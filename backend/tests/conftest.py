@@ -1,10 +1,15 @@
+import re
+from contextlib import contextmanager
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
 from decimal import Decimal
 
-from app.database import Base, get_db
+from app.database import Base, async_database_url, get_async_db, get_db
 from app.main import app
 from app.models.merchant import Merchant
 from app.models.user import User
@@ -17,6 +22,29 @@ from app.utils.encryption import encrypt_value
 TEST_DB_URL = "sqlite:///./test.db"
 
 
+@contextmanager
+def _capture_selects(db, pattern=None):
+    seen = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and (pattern is None or re.search(pattern, statement)):
+            seen.append((statement, parameters))
+
+    engine = db.get_bind()
+    event.listen(engine, "before_cursor_execute", before)
+    try:
+        yield seen
+    finally:
+        event.remove(engine, "before_cursor_execute", before)
+
+
+@pytest.fixture
+def captured_selects():
+    """`with captured_selects(db, pattern) as seen:` collects (statement, parameters)
+    of every SELECT on db's engine whose SQL matches `pattern` (all when None)."""
+    return _capture_selects
+
+
 @pytest.fixture(autouse=True)
 def _reset_rate_limiter():
     """Rate limiter is a process-global; clear it around each test to isolate."""
@@ -26,6 +54,53 @@ def _reset_rate_limiter():
     rate_limiter.clear()
 
 
+@pytest.fixture(autouse=True)
+def _reset_principal_cache():
+    """Each test recreates users under the same ids; never serve a stale principal."""
+    from app.services import principal_cache
+    principal_cache.reset()
+    yield
+    principal_cache.reset()
+
+
+@pytest.fixture(autouse=True)
+def _reset_idempotency_cache():
+    """Each test starts from an empty database; drop responses cached by earlier ones."""
+    from app.services.idempotency import idempotency_store
+    idempotency_store.clear()
+    yield
+    idempotency_store.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_rail_router():
+    """Drop the routing table compiled from an earlier test's bank configs."""
+    from app.services.rail_selector import rail_router
+    rail_router.reset()
+    yield
+    rail_router.reset()
+
+
+@pytest.fixture(autouse=True)
+def _sync_event_log():
+    """Write audit events on the caller's session so tests can read them back."""
+    from app.config import settings
+    previous = settings.EVENT_LOG_MODE
+    settings.EVENT_LOG_MODE = "sync"
+    yield
+    settings.EVENT_LOG_MODE = previous
+
+
+@pytest.fixture(autouse=True)
+def _cheap_bcrypt():
+    """Production cost makes every seeded user and login take ~0.25s."""
+    from app.config import settings
+    previous = settings.BCRYPT_ROUNDS
+    settings.BCRYPT_ROUNDS = 4
+    yield
+    settings.BCRYPT_ROUNDS = previous
+
+
 @pytest.fixture(scope="function")
 def db_session():
     engine = create_engine(TEST_DB_URL, connect_args={"check_same_thread": False})
@@ -47,7 +122,17 @@ def client(db_session):
         finally:
             pass
 
+    # Async endpoints read the same file through aiosqlite. NullPool: each
+    # TestClient runs its own event loop, so connections must not be reused.
+    async_engine = create_async_engine(async_database_url(TEST_DB_URL), poolclass=NullPool)
+    AsyncTestingSession = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
@@ -0,0 +1,70 @@
+"""Tests for the asyncio database path used by read-heavy endpoints."""
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from app import database
+from app.database import async_database_url, async_engine_options
+from tests.conftest import get_auth_header, make_auth_header
+
+
+def test_read_endpoints_are_coroutines():
+    from app.routers import auth, consumer, payments, stablecoin_api, stablecoin_webhooks
+
+    endpoints = [
+        payments.get_payments, consumer.get_consumer_balance, stablecoin_api.balances,
+        stablecoin_api.transactions, auth.me, stablecoin_webhooks.receive_stablecoin_webhook,
+    ]
+    assert all(asyncio.iscoroutinefunction(fn) for fn in endpoints)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///./local.db", "sqlite+aiosqlite:///./local.db"),
+    ("postgresql://u:p@db:5432/payrails", "postgresql+asyncpg://u:p@db:5432/payrails"),
+    ("postgresql+psycopg2://u:p@db/payrails", "postgresql+asyncpg://u:p@db/payrails"),
+])
+def test_async_database_url(url, expected):
+    assert async_database_url(url) == expected
+
+
+def test_asyncpg_options_under_pgbouncer():
+    url = "postgresql://u:p@bouncer:6432/payrails"
+    with patch.object(database.settings, "DB_PGBOUNCER", True):
+        assert async_database_url(url).endswith("?prepared_statement_cache_size=0")
+        opts = async_engine_options(url)
+    assert opts["connect_args"]["statement_cache_size"] == 0
+    assert opts["connect_args"]["server_settings"] == {"application_name": "payrails-backend"}
+
+
+def test_async_me_and_listing(client, seed_data):
+    me = client.get("/auth/me", headers=get_auth_header())
+    assert me.status_code == 200
+    assert me.json()["merchant_id"] == "merchant-001"
+
+    listing = client.get("/payments?merchant_id=merchant-001", headers=get_auth_header())
+    assert listing.status_code == 200
+    assert listing.json()["items"] == []
+
+
+def test_async_auth_rejects_unknown_user(client, seed_data):
+    resp = client.get("/auth/me", headers=make_auth_header("user-ghost", "ghost@test.com"))
+    assert resp.status_code == 401
+
+
+def test_stablecoin_webhook_processing_runs_off_the_event_loop(client):
+    seen = {}
+
+    def handler(db, event):
+        try:
+            asyncio.get_running_loop()
+            seen["on_loop"] = True
+        except RuntimeError:
+            seen["on_loop"] = False
+        return "ignored"
+
+    with patch("app.services.webhook_inbox.handle_partner_event", side_effect=handler):
+        resp = client.post("/webhooks/stablecoin", json={"event_id": "evt-async-1", "type": "noop", "data": {}})
+
+    assert resp.status_code == 200
+    assert seen == {"on_loop": False}
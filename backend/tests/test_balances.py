@@ -0,0 +1,83 @@
+"""Tests for the materialized balances table (balance_service)."""
+from decimal import Decimal
+
+from app.models.balance import Balance
+from app.models.ledger import Ledger
+from app.services import balance_service
+from app.services.ledger_service import get_balance, record_credit, record_debit
+from app.services.wallet_service import get_wallet_balance, wallet_credit, wallet_debit
+
+
+def _row(db, owner_type, owner_id, asset_code="USD"):
+    return db.query(Balance).filter(
+        Balance.owner_type == owner_type,
+        Balance.owner_id == owner_id,
+        Balance.asset_code == asset_code,
+    ).first()
+
+
+def test_ledger_writes_maintain_balance_row(db_session):
+    record_credit(db_session, "m-bal", Decimal("100.00"))
+    record_debit(db_session, "m-bal", Decimal("30.25"))
+
+    row = _row(db_session, "merchant", "m-bal")
+    assert row.balance_base_units == 6975
+    assert get_balance(db_session, "m-bal") == Decimal("69.75")
+
+
+def test_entry_balance_after_matches_materialized(db_session):
+    wallet_credit(db_session, "u-bal", Decimal("10.00"))
+    entry = wallet_debit(db_session, "u-bal", Decimal("4.00"))
+    assert entry.balance_after == Decimal("6.00")
+    assert entry.balance_after_base_units == 600
+    assert get_wallet_balance(db_session, "u-bal") == Decimal("6.00")
+
+
+def test_balances_keyed_by_owner_type_and_asset(db_session):
+    record_credit(db_session, "same-id", Decimal("5"))
+    wallet_credit(db_session, "same-id", Decimal("7"))
+    wallet_credit(db_session, "same-id", Decimal("1.5"), asset_code="USDC")
+
+    assert get_balance(db_session, "same-id") == Decimal("5")
+    assert get_wallet_balance(db_session, "same-id") == Decimal("7")
+    assert get_wallet_balance(db_session, "same-id", "USDC") == Decimal("1.5")
+    assert _row(db_session, "user", "same-id", "USDC").balance_base_units == 1_500_000
+
+
+def test_unknown_owner_has_zero_balance(db_session):
+    assert get_balance(db_session, "nobody") == Decimal("0")
+    assert get_wallet_balance(db_session, "nobody", "USD1") == Decimal("0")
+
+
+def test_verify_clean_after_normal_writes(db_session):
+    record_credit(db_session, "m-v", Decimal("50"))
+    wallet_credit(db_session, "u-v", Decimal("20"), asset_code="USDC")
+    wallet_debit(db_session, "u-v", Decimal("5"), asset_code="USDC")
+    assert balance_service.verify_balances(db_session) == []
+
+
+def test_verify_reports_drift_and_rebuild_repairs(db_session):
+    record_credit(db_session, "m-d", Decimal("50"))
+    # A ledger row written outside the service (e.g. a manual backfill).
+    db_session.add(Ledger(merchant_id="m-d", entry_type="credit", amount=Decimal("25"),
+                          asset_code="USD", amount_base_units=2500))
+    db_session.commit()
+
+    drift = balance_service.verify_balances(db_session)
+    assert len(drift) == 1
+    assert drift[0]["ledger_balance"] == Decimal("75")
+    assert drift[0]["materialized_balance"] == Decimal("50")
+
+    assert balance_service.rebuild_balances(db_session) == 1
+    assert balance_service.verify_balances(db_session) == []
+    assert get_balance(db_session, "m-d") == Decimal("75")
+
+
+def test_rebuild_creates_missing_rows(db_session):
+    db_session.add(Ledger(user_id="u-r", entry_type="credit", asset_code="USD1",
+                          amount_base_units=3_000_000))
+    db_session.commit()
+    assert get_wallet_balance(db_session, "u-r", "USD1") == Decimal("0")
+
+    balance_service.rebuild_balances(db_session)
+    assert get_wallet_balance(db_session, "u-r", "USD1") == Decimal("3")
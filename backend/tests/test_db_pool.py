@@ -0,0 +1,81 @@
+"""Tests for engine pool configuration and pool metrics."""
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, QueuePool
+
+from app import database
+from app.database import PoolMetrics, engine_options
+
+PG_URL = "postgresql://payrails:secret@db:5432/payrails"
+
+
+def test_in_memory_sqlite_keeps_driver_defaults():
+    assert engine_options("sqlite://") == {"connect_args": {"check_same_thread": False}}
+
+
+def test_sqlite_file_gets_pool_but_no_postgres_options():
+    opts = engine_options("sqlite:///./local.db")
+    assert opts["connect_args"] == {"check_same_thread": False}
+    assert opts["pool_size"] == database.settings.DB_POOL_SIZE
+
+
+def test_postgres_gets_pool_settings_and_statement_timeout():
+    s = database.settings
+    with patch.object(s, "DB_POOL_SIZE", 20), patch.object(s, "DB_MAX_OVERFLOW", 5), \
+            patch.object(s, "DB_STATEMENT_TIMEOUT_MS", 5000), patch.object(s, "DB_PGBOUNCER", False):
+        opts = engine_options(PG_URL)
+
+    assert opts["pool_size"] == 20
+    assert opts["max_overflow"] == 5
+    assert opts["pool_pre_ping"] is True
+    assert opts["connect_args"]["options"] == "-c statement_timeout=5000"
+    assert opts["connect_args"]["application_name"] == "payrails-backend"
+
+
+def test_async_engine_has_its_own_pool_budget():
+    s = database.settings
+    with patch.object(s, "DB_POOL_SIZE", 20), patch.object(s, "DB_ASYNC_POOL_SIZE", 4), \
+            patch.object(s, "DB_ASYNC_MAX_OVERFLOW", 1), patch.object(s, "DB_PGBOUNCER", False):
+        opts = database.async_engine_options(PG_URL)
+
+    assert (opts["pool_size"], opts["max_overflow"]) == (4, 1)
+
+
+def test_pgbouncer_mode_uses_null_pool_without_startup_options():
+    s = database.settings
+    with patch.object(s, "DB_PGBOUNCER", True), patch.object(s, "DB_STATEMENT_TIMEOUT_MS", 5000):
+        opts = engine_options(PG_URL)
+
+    assert opts["poolclass"] is NullPool
+    assert "options" not in opts["connect_args"]
+    assert "pool_size" not in opts
+
+
+def test_pool_metrics_track_checkouts_and_overflow(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=QueuePool,
+                           pool_size=2, max_overflow=2)
+    metrics = PoolMetrics(engine, max_overflow=2)
+
+    conns = [engine.connect() for _ in range(3)]
+    during = metrics.snapshot()
+    for conn in conns:
+        conn.close()
+    after = metrics.snapshot()
+    engine.dispose()
+
+    assert during["checked_out"] == 3
+    assert during["overflow"] == 1
+    assert during["max_overflow"] == 2
+    assert after["checked_out"] == 0
+    assert after["peak_checked_out"] == 3
+    assert after["checkouts"] == after["checkins"] == 3
+    assert after["idle"] == 2
+
+
+def test_pool_endpoint_requires_worker_secret(client):
+    assert client.get("/tasks/db/pool").status_code == 403
+    with patch.object(database.settings, "STABLECOIN_WORKER_SECRET", "s3cret"):
+        resp = client.get("/tasks/db/pool", headers={"X-Worker-Secret": "s3cret"})
+    assert resp.status_code == 200
+    assert {"checkouts", "checked_out", "peak_checked_out", "pool_class"} <= resp.json().keys()
@@ -0,0 +1,187 @@
+"""Tests for the cached, precomputed, async-fill description engine."""
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.transaction import Transaction
+from app.services import description_service
+from app.services.description_service import (
+    DescriptionEngine, StubProvider, fallback_description, generate_description,
+)
+from app.utils.ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def stub():
+    provider = MagicMock(wraps=StubProvider())
+    engine = DescriptionEngine(provider=provider)
+    with patch.object(description_service, "description_engine", engine):
+        yield provider, engine
+
+
+def test_user_provided_description_wins(stub):
+    provider, _ = stub
+    assert generate_description("Acme", 10.0, "ach", "Team lunch") == "Team lunch"
+    provider.describe.assert_not_called()
+
+
+def test_no_provider_configured_falls_back_without_network():
+    engine = DescriptionEngine()
+    with patch.object(description_service, "description_engine", engine), \
+            patch.object(description_service.settings, "ANTHROPIC_API_KEY", ""), \
+            patch("anthropic.Anthropic") as client:
+        assert generate_description("Acme", 10.0, "ach") == "Payment to Acme via ACH"
+    client.assert_not_called()
+
+
+def test_stub_is_deterministic_and_cached_per_amount_bucket(stub):
+    provider, _ = stub
+    first = generate_description("Acme", 12.0, "fednow")
+    assert first == "Acme purchase (under $50) via FEDNOW"
+    assert generate_description("Acme", 40.0, "fednow") == first
+    assert provider.describe.call_count == 1
+
+    generate_description("Acme", 400.0, "fednow")
+    assert provider.describe.call_count == 2
+
+
+def test_failing_provider_falls_back_and_cools_down():
+    provider = MagicMock()
+    provider.describe.side_effect = TimeoutError("unreachable")
+    engine = DescriptionEngine(provider=provider)
+    with patch.object(description_service, "description_engine", engine):
+        assert generate_description("Acme", 5.0, "rtp") == "Payment to Acme via RTP"
+        assert generate_description("Acme", 500.0, "ach") == "Payment to Acme via ACH"
+    assert provider.describe.call_count == 1
+
+
+def test_precomputed_templates_serve_first_payment(db_session, seed_data, stub):
+    provider, engine = stub
+    stored = engine.refresh_templates(db_session)
+    assert stored == 2 * 4  # active merchants x supported rails
+    calls = provider.describe.call_count
+
+    text = generate_description("Globex Inc", 73.0, "rtp", merchant_id="merchant-002")
+    assert text == "Globex Inc purchase (typical) via RTP"
+    assert provider.describe.call_count == calls
+
+
+def test_templates_expire_unless_refreshed(db_session, seed_data):
+    clock = Clock()
+    engine = DescriptionEngine(provider=StubProvider(), clock=clock)
+    engine.refresh_templates(db_session)
+    assert engine.lookup("Globex Inc", "rtp", 73.0, "merchant-002") is not None
+
+    clock.now += 2 * description_service.settings.DESCRIPTION_TEMPLATE_REFRESH_SECONDS + 1
+    assert engine.lookup("Globex Inc", "rtp", 73.0, "merchant-002") is None
+
+
+def test_template_refresh_runs_in_background_until_shutdown(db_session, seed_data):
+    engine = DescriptionEngine(provider=StubProvider())
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    engine.start_template_refresh(Session)
+    thread = engine._refresh_thread
+    engine.shutdown()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert engine.lookup("Globex Inc", "rtp", 73.0, "merchant-002") is not None
+
+
+def test_rename_drops_cached_descriptions(db_session, seed_data, stub):
+    from app.schemas.merchant import MerchantUpdate
+    from app.services import merchant_service
+
+    provider, engine = stub
+    engine.refresh_templates(db_session)
+    generate_description("Globex Inc", 20.0, "ach", merchant_id="merchant-002")
+    generate_description("Acme Corp", 20.0, "ach", merchant_id="merchant-001")
+
+    merchant_service.update_merchant(db_session, "merchant-002", MerchantUpdate(name="Globex Intl"))
+
+    assert engine.lookup("Globex Inc", "ach", 20.0, "merchant-002") is None
+    assert engine.lookup("Acme Corp", "ach", 20.0, "merchant-001") is not None
+    assert generate_description("Globex Intl", 20.0, "ach", merchant_id="merchant-002") == \
+        "Globex Intl purchase (under $50) via ACH"
+
+
+def test_same_name_merchants_do_not_share_entries(stub):
+    provider, _ = stub
+    generate_description("Acme", 12.0, "ach", merchant_id="m-1")
+    generate_description("Acme", 12.0, "ach", merchant_id="m-2")
+    assert provider.describe.call_count == 2
+
+
+def test_async_fill_saves_fallback_then_enriches(db_session, seed_data, stub):
+    provider, engine = stub
+    with patch.object(description_service.settings, "DESCRIPTION_ASYNC_FILL", True):
+        text = generate_description("Globex Inc", 20.0, "ach")
+    assert text == fallback_description("Globex Inc", "ach")
+    provider.describe.assert_not_called()
+
+    txn = Transaction(sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+                      amount=Decimal("20.00"), rail="ach", status="processing",
+                      idempotency_key="desc-async-1", description=text)
+    db_session.add(txn)
+    db_session.commit()
+
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    engine.enrich_transaction(Session, txn.id, "Globex Inc", 20.0, "ach")
+    db_session.expire_all()
+    assert txn.description == "Globex Inc purchase (under $50) via ACH"
+
+
+def test_enrich_later_is_noop_unless_async_and_fallback(stub):
+    _, engine = stub
+    with patch.object(engine, "submit_enrichment") as submit:
+        description_service.enrich_later("t1", "Payment to Acme via ACH", "Acme", 1.0, "ach")
+        with patch.object(description_service.settings, "DESCRIPTION_ASYNC_FILL", True):
+            description_service.enrich_later("t1", "Custom text", "Acme", 1.0, "ach")
+            submit.assert_not_called()
+            description_service.enrich_later("t1", "Payment to Acme via ACH", "Acme", 1.0, "ach", merchant_id="m-1")
+    submit.assert_called_once()
+    assert submit.call_args[0][1:] == ("t1", "Acme", 1.0, "ach", "m-1")
+
+
+def test_ttl_cache_expires_and_evicts_lru():
+    clock = Clock()
+    cache = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # evicts least recently used "b"
+    assert cache.get("b") is None and cache.get("a") == 1
+
+    clock.now += 11
+    assert cache.get("a") is None
+    assert len(cache) == 1  # "c" expired but not yet touched
+
+
+def test_ttl_cache_drops_expired_entries_on_write():
+    clock = Clock()
+    cache = TTLCache(maxsize=100, ttl=10, clock=clock)
+    for key in "abc":
+        cache.set(key, key)
+    clock.now += 11
+    cache.set("d", "d")  # write-only traffic still sheds what has expired
+    assert len(cache) == 1 and cache.values() == ["d"]
+    assert cache.stats()["evictions"] == 3
+
+
+def test_ttl_cache_get_many_skips_missing_and_expired():
+    clock = Clock()
+    cache = TTLCache(maxsize=10, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=1)
+    clock.now += 5
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1}
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
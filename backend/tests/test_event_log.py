@@ -0,0 +1,126 @@
+"""Tests for the transaction-joining, batched audit event log."""
+import uuid
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.models.event_log import EventLog
+from app.models.merchant import Merchant
+from app.schemas.transaction import PaymentCreate
+from app.services import event_service
+from app.services.bank.schemas import TransferResponse
+from app.services.event_service import EventSink, log_event
+from app.services.payment_service import create_payment
+
+
+def _count_commits(db):
+    commits = []
+    event.listen(db.get_bind(), "commit", lambda conn: commits.append(1))
+    return commits
+
+
+def _merchant(i):
+    return Merchant(id=f"m-ev-{i}", name="Evented", ein=f"55-000000{i}", contact_email="ev@test.com")
+
+
+def test_event_joins_open_transaction(db_session):
+    commits = _count_commits(db_session)
+    db_session.add(_merchant(1))
+    log_event(db_session, "merchant.created", "test", "m-ev-1")
+    assert commits == []
+
+    db_session.rollback()
+    assert db_session.query(EventLog).count() == 0  # rolled back with the caller's work
+
+
+def test_event_joins_flushed_transaction(db_session):
+    commits = _count_commits(db_session)
+    db_session.add(_merchant(2))
+    db_session.flush()
+    log_event(db_session, "merchant.created", "test", "m-ev-2")
+    db_session.commit()
+    assert len(commits) == 1
+    assert db_session.query(EventLog).filter(EventLog.reference_id == "m-ev-2").count() == 1
+
+
+def test_sync_mode_commits_standalone_event(db_session):
+    log_event(db_session, "standalone", "test", payload={"k": "v"})
+    db_session.rollback()
+    row = db_session.query(EventLog).filter(EventLog.event_type == "standalone").one()
+    assert row.payload == '{"k": "v"}'
+
+
+def test_async_mode_buffers_and_bulk_inserts(db_session):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    sink = EventSink(session_factory=Session, batch_size=1000, flush_interval=60)
+    commits = _count_commits(db_session)
+    with patch.object(event_service.settings, "EVENT_LOG_MODE", "async"), \
+            patch.object(event_service, "event_sink", sink):
+        for i in range(25):
+            log_event(db_session, "bulk", "test", f"r-{i}")
+        assert commits == []
+        assert sink.pending() == 25
+        sink.stop()
+
+    assert len(commits) == 1
+    assert db_session.query(EventLog).filter(EventLog.event_type == "bulk").count() == 25
+
+
+def test_full_buffer_flushes_inline_without_dropping(db_session):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    sink = EventSink(session_factory=Session, max_buffer=5, batch_size=100, flush_interval=60)
+    for i in range(12):
+        sink.emit(event_service._event_row("bounded", "test", str(i), None))
+    assert sink.pending() <= 5
+    sink.stop()
+    assert db_session.query(EventLog).filter(EventLog.event_type == "bounded").count() == 12
+
+
+def test_failed_flush_keeps_rows_and_retries_with_backoff(db_session):
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    clock = [100.0]
+    healthy = [False]
+
+    def session_factory():
+        if not healthy[0]:
+            broken = MagicMock()
+            broken.execute.side_effect = OperationalError("INSERT", {}, Exception("database is locked"))
+            return broken
+        return Session()
+
+    sink = EventSink(session_factory=session_factory, batch_size=100, flush_interval=1, clock=lambda: clock[0])
+    for i in range(3):
+        sink._queue.put(event_service._event_row("retried", "test", str(i), None))
+
+    assert sink.flush() == 0 and sink.pending() == 3 and sink.failures == 1
+    healthy[0] = True
+    sink._queue.put(event_service._event_row("retried", "test", "3", None))
+    assert sink.flush() == 0  # still backing off: nothing attempted
+    assert sink.failures == 1 and sink.pending() == 4
+
+    clock[0] += 1.5
+    assert sink.flush() == 4 and sink.pending() == 0 and sink.dropped == 0
+    assert db_session.query(EventLog).filter(EventLog.event_type == "retried").count() == 4
+
+
+def test_payment_commits_twice_with_events(db_session, seed_data):
+    """Transaction insert + initiated event, then settlement + completed event."""
+    commits = _count_commits(db_session)
+
+    def instant(request):
+        return TransferResponse(reference_id=str(uuid.uuid4()), status="completed",
+                                rail=request.rail, amount=request.amount)
+
+    with patch("app.services.bank.mock_bank.mock_bank_service.initiate_transfer", side_effect=instant):
+        resp = create_payment(db_session, PaymentCreate(
+            sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+            amount=Decimal("5.00"), idempotency_key="ev-pay-1", preferred_rail="ach", description="x",
+        ))
+
+    assert resp.status == "completed"
+    assert len(commits) == 2
+    types = {e.event_type for e in db_session.query(EventLog).filter(EventLog.reference_id == resp.id)}
+    assert types == {"payment.initiated", "payment.completed"}
@@ -0,0 +1,109 @@
+"""Tests for the shared idempotency layer (reserved keys, replay, coalescing)."""
+import threading
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.idempotency_key import IdempotencyKey
+from app.services.idempotency import (
+    IdempotencyInProgress, _utcnow, idempotency_store,
+)
+from tests.conftest import MULTI_CONSUMERS, get_auth_header, make_auth_header
+
+
+def _payment(key, amount="500.00"):
+    return {"sender_merchant_id": "merchant-001", "receiver_merchant_id": "merchant-002",
+            "amount": amount, "idempotency_key": key}
+
+
+def test_retry_is_replayed_without_running_the_endpoint(client, seed_data):
+    headers = get_auth_header()
+    key = str(uuid.uuid4())
+    first = client.post("/payments", json=_payment(key), headers=headers)
+    assert first.status_code == 201
+
+    with patch("app.routers.payments.create_payment", side_effect=AssertionError("re-executed")):
+        warm = client.post("/payments", json=_payment(key), headers=headers)
+        idempotency_store.clear()  # another instance: answered from the table
+        cold = client.post("/payments", json=_payment(key), headers=headers)
+
+    for replay in (warm, cold):
+        assert replay.status_code == 201
+        assert replay.json() == first.json()
+        assert replay.headers["idempotent-replayed"] == "true"
+
+
+def test_key_reused_with_a_different_body_is_rejected(client, seed_data):
+    headers = get_auth_header()
+    key = str(uuid.uuid4())
+    assert client.post("/payments", json=_payment(key), headers=headers).status_code == 201
+    assert client.post("/payments", json=_payment(key, "501.00"), headers=headers).status_code == 422
+
+
+def test_failed_request_releases_its_key(client, full_seed_data, db_session):
+    u_id, email = MULTI_CONSUMERS[0]
+    headers = make_auth_header(u_id, email, role="user")
+    body = {"receiver_user_id": MULTI_CONSUMERS[1][0], "amount": "900.00", "idempotency_key": "retry-me"}
+
+    assert client.post("/wallet/send", json=body, headers=headers).status_code == 400
+    assert db_session.query(IdempotencyKey).count() == 0
+
+    assert client.post("/consumer/wallet/topup?amount=500.00", headers=headers).status_code == 200
+    retried = client.post("/wallet/send", json=body, headers=headers)
+    assert retried.status_code == 200
+    assert retried.json()["status"] == "completed"
+
+
+def test_concurrent_duplicates_wait_for_the_first_result(db_session):
+    Session = sessionmaker(bind=db_session.get_bind())
+    scope = ("u-coalesce", "POST /payments", "k-1")
+    first_holds_key = threading.Event()
+    results = []
+
+    def first():
+        db = Session()
+        try:
+            assert idempotency_store.reserve(db, scope, "h") is None
+            first_holds_key.set()
+            threading.Event().wait(0.2)  # the "request" runs
+            idempotency_store.complete(db, scope, "h", 201, {"id": "tx-1"})
+        finally:
+            db.close()
+
+    def duplicate():
+        first_holds_key.wait()
+        db = Session()
+        try:
+            results.append(idempotency_store.reserve(db, scope, "h"))
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=first)] + [threading.Thread(target=duplicate) for _ in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert [(r.status_code, r.body) for r in results] == [(201, {"id": "tx-1"})] * 3
+    assert db_session.query(IdempotencyKey).filter_by(status="completed").count() == 1
+
+
+def test_key_held_by_another_instance(db_session, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_WAIT_SECONDS", 0.1)
+    scope = ("u-other", "POST /payments", "k-2")
+    db_session.add(IdempotencyKey(owner=scope[0], endpoint=scope[1], key=scope[2], request_hash="h",
+                                  locked_until=_utcnow() + timedelta(minutes=5)))
+    db_session.commit()
+
+    with pytest.raises(IdempotencyInProgress):
+        idempotency_store.reserve(db_session, scope, "h")
+
+    # Once its lock lapses (the holder died) a retry takes the key over.
+    db_session.query(IdempotencyKey).update({IdempotencyKey.locked_until: _utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    assert idempotency_store.reserve(db_session, scope, "h") is None
+    idempotency_store.release(db_session, scope)
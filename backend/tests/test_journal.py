@@ -0,0 +1,151 @@
+"""Tests for atomic, row-locked double-entry posting (ledger_service.post_journal)."""
+import threading
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.models.balance import Balance
+from app.models.ledger import Ledger
+from app.services import balance_service
+from app.services.ledger_service import get_balance, merchant_leg, post_journal, post_journals, wallet_leg
+from app.services.wallet_service import get_wallet_balance, wallet_credit, wallet_debit
+
+
+def _count_commits(db):
+    """Counts real DB COMMITs (savepoint releases excluded)."""
+    commits = []
+    event.listen(db.get_bind(), "commit", lambda conn: commits.append(1))
+    return commits
+
+
+def test_all_legs_commit_once(db_session):
+    post_journal(db_session, [merchant_leg("m-src", "credit", Decimal("100"))])
+    commits = _count_commits(db_session)
+
+    entries = post_journal(db_session, [
+        merchant_leg("m-src", "debit", Decimal("40"), "Payment sent"),
+        merchant_leg("m-dst", "credit", Decimal("40"), "Payment received"),
+        wallet_leg("u-dst", "credit", Decimal("40"), "Payment received"),
+    ], transaction_id="txn-j1")
+
+    assert len(commits) == 1
+    assert [e.entry_type for e in entries] == ["debit", "credit", "credit"]
+    assert all(e.transaction_id == "txn-j1" for e in entries)
+    assert get_balance(db_session, "m-src") == Decimal("60")
+    assert get_balance(db_session, "m-dst") == Decimal("40")
+    assert get_wallet_balance(db_session, "u-dst") == Decimal("40")
+
+
+def test_insufficient_funds_rejects_whole_journal(db_session):
+    wallet_credit(db_session, "u-poor", Decimal("10"))
+
+    with pytest.raises(ValueError, match="Insufficient wallet balance"):
+        post_journal(db_session, [
+            merchant_leg("m-payee", "credit", Decimal("25")),
+            wallet_leg("u-poor", "debit", Decimal("25"), check_funds=True),
+        ])
+    db_session.rollback()
+
+    assert get_wallet_balance(db_session, "u-poor") == Decimal("10")
+    assert get_balance(db_session, "m-payee") == Decimal("0")
+    assert db_session.query(Ledger).filter(Ledger.merchant_id == "m-payee").count() == 0
+
+
+def test_funds_check_uses_net_of_same_owner_legs(db_session):
+    wallet_credit(db_session, "u-net", Decimal("10"))
+    post_journal(db_session, [
+        wallet_leg("u-net", "credit", Decimal("5")),
+        wallet_leg("u-net", "debit", Decimal("15"), check_funds=True),
+    ])
+    assert get_wallet_balance(db_session, "u-net") == Decimal("0")
+
+
+def test_balance_after_is_running_within_journal(db_session):
+    entries = post_journal(db_session, [
+        wallet_leg("u-run", "credit", Decimal("10")),
+        wallet_leg("u-run", "debit", Decimal("3")),
+    ])
+    assert [e.balance_after for e in entries] == [Decimal("10"), Decimal("7")]
+
+
+def test_post_journals_applies_in_order_against_running_balances(db_session):
+    wallet_credit(db_session, "u-bulk", Decimal("5"))
+    posted = post_journals(db_session, [
+        ([wallet_leg("u-bulk", "credit", Decimal("10"))], "txn-b1"),
+        ([wallet_leg("u-bulk", "debit", Decimal("12"), check_funds=True)], "txn-b2"),
+        ([merchant_leg("m-bulk", "credit", Decimal("3"), asset_code="USDC")], "txn-b3"),
+    ])
+
+    assert [[e.transaction_id for e in entries] for entries in posted] == [["txn-b1"], ["txn-b2"], ["txn-b3"]]
+    assert [entries[0].balance_after for entries in posted[:2]] == [Decimal("15"), Decimal("3")]
+    assert get_wallet_balance(db_session, "u-bulk") == Decimal("3")
+    assert get_balance(db_session, "m-bulk", "USDC") == Decimal("3")
+
+
+def test_commit_false_leaves_transaction_open(db_session):
+    post_journal(db_session, [merchant_leg("m-open", "credit", Decimal("9"))], commit=False)
+    assert get_balance(db_session, "m-open") == Decimal("9")
+    db_session.rollback()
+    assert get_balance(db_session, "m-open") == Decimal("0")
+
+
+@pytest.mark.parametrize("leg", [
+    merchant_leg("m-x", "credit", Decimal("0")),
+    merchant_leg("m-x", "transfer", Decimal("1")),
+])
+def test_invalid_legs_rejected(db_session, leg):
+    with pytest.raises(ValueError):
+        post_journal(db_session, [leg])
+
+
+def test_empty_journal_rejected(db_session):
+    with pytest.raises(ValueError):
+        post_journal(db_session, [])
+
+
+def test_stale_balance_update_is_rejected(db_session):
+    """The version check catches a lost update where row locks are unavailable (SQLite)."""
+    wallet_credit(db_session, "u-race", Decimal("10"))
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    other = Session()
+    try:
+        stale = other.query(Balance).filter(Balance.owner_id == "u-race").one()
+        wallet_debit(db_session, "u-race", Decimal("4"))  # commits version + 1
+
+        stale.balance_base_units = int(stale.balance_base_units) - 800
+        with pytest.raises(StaleDataError):
+            other.commit()
+    finally:
+        other.rollback()
+        other.close()
+    assert get_wallet_balance(db_session, "u-race") == Decimal("6")
+
+
+def test_concurrent_debits_never_overdraw(db_session):
+    wallet_credit(db_session, "u-conc", Decimal("50"))
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+
+    def spend():
+        db = Session()
+        try:
+            wallet_debit(db, "u-conc", Decimal("10"))
+        except Exception:
+            db.rollback()
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=spend) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    db_session.expire_all()
+    balance = get_wallet_balance(db_session, "u-conc")
+    assert balance >= 0
+    debits = db_session.query(Ledger).filter(Ledger.user_id == "u-conc", Ledger.entry_type == "debit").count()
+    assert balance == Decimal("50") - 10 * debits
+    assert balance_service.verify_balances(db_session) == []
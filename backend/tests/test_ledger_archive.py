@@ -0,0 +1,109 @@
+"""Tests for ledger/event_logs partition upkeep and monthly archival."""
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app.models.archive_snapshot import ArchiveSnapshot
+from app.models.event_log import EventLog
+from app.models.ledger import Ledger
+from app.services import balance_service, ledger_archive
+from app.services.ledger_archive import (
+    archive_closed_periods, ensure_partitions, partition_ddl, read_snapshot,
+)
+from app.services.ledger_service import record_credit, record_debit
+from app.services.wallet_service import wallet_credit
+
+NOW = datetime(2026, 10, 18, 12, 0)  # hot window (3 months) starts 2026-07-01
+
+
+def _backdate(db, entry, when):
+    entry.created_at = when
+    db.commit()
+
+
+@pytest.fixture
+def aged_ledger(db_session):
+    """Entries spread over closed (April, May) and hot (September) months."""
+    _backdate(db_session, record_credit(db_session, "m-arch", Decimal("100.00")), datetime(2026, 4, 3))
+    _backdate(db_session, record_debit(db_session, "m-arch", Decimal("30.25")), datetime(2026, 5, 9))
+    _backdate(db_session, wallet_credit(db_session, "u-arch", Decimal("2.5"), asset_code="USDC"),
+              datetime(2026, 5, 20))
+    _backdate(db_session, record_credit(db_session, "m-arch", Decimal("5.00")), datetime(2026, 9, 1))
+    return db_session
+
+
+def test_archival_keeps_ledger_totals_exact(aged_ledger):
+    db = aged_ledger
+    before = balance_service.ledger_totals(db)
+
+    archived = archive_closed_periods(db, now=NOW)
+
+    assert [(r["table"], r["period"]) for r in archived] == [
+        ("ledger", "2026-04"), ("ledger", "2026-05"), ("ledger", "2026-06"),
+    ]
+    assert balance_service.ledger_totals(db) == before
+    assert balance_service.verify_balances(db) == []
+    assert db.query(Ledger).filter(Ledger.created_at < datetime(2026, 7, 1)).count() == 0
+
+
+def test_opening_balances_are_carried_forward_once(aged_ledger):
+    db = aged_ledger
+    archive_closed_periods(db, now=NOW)
+
+    opening = db.query(Ledger).filter(Ledger.created_at == datetime(2026, 7, 1)).all()
+    by_owner = {(e.merchant_id or e.user_id, e.asset_code): e for e in opening}
+    assert len(opening) == len(by_owner) == 2
+    assert by_owner[("m-arch", "USD")].amount == Decimal("69.75")
+    assert by_owner[("m-arch", "USD")].entry_type == "credit"
+    assert by_owner[("u-arch", "USDC")].amount_base_units == 2_500_000
+
+    # A second run finds nothing new to archive.
+    assert archive_closed_periods(db, now=NOW) == []
+
+
+def test_snapshot_round_trip_and_checksum(aged_ledger):
+    db = aged_ledger
+    archive_closed_periods(db, now=NOW)
+    snapshot = db.query(ArchiveSnapshot).filter(
+        ArchiveSnapshot.table_name == "ledger", ArchiveSnapshot.period_start == datetime(2026, 5, 1),
+    ).one()
+
+    rows = read_snapshot(snapshot)
+    assert snapshot.row_count == len(rows) == 3  # May's two entries + April's carried balance
+    assert {r["description"] for r in rows} >= {"Opening balance carried forward to 2026-05"}
+
+    snapshot.checksum = "0" * 64
+    with pytest.raises(ValueError):
+        read_snapshot(snapshot)
+
+
+def test_event_logs_archived_without_opening_entries(db_session):
+    db_session.add_all([
+        EventLog(event_type="old", source="test", created_at=datetime(2026, 1, 15)),
+        EventLog(event_type="hot", source="test", created_at=datetime(2026, 8, 15)),
+    ])
+    db_session.commit()
+
+    archived = archive_closed_periods(db_session, now=NOW)
+
+    assert archived == [{"table": "event_logs", "period": "2026-01", "rows": 1,
+                         "opening_entries": 0, "compressed_bytes": archived[0]["compressed_bytes"]}]
+    assert [e.event_type for e in db_session.query(EventLog).all()] == ["hot"]
+
+
+def test_partitions_are_postgres_only(db_session):
+    assert ensure_partitions(db_session, now=NOW) == []
+    assert partition_ddl("ledger", datetime(2026, 12, 1)) == (
+        "CREATE TABLE IF NOT EXISTS ledger_y2026m12 PARTITION OF ledger "
+        "FOR VALUES FROM ('2026-12-01') TO ('2027-01-01')"
+    )
+
+
+def test_archive_endpoint_requires_worker_secret(client):
+    assert client.post("/tasks/archive/run").status_code == 403
+    with patch.object(ledger_archive.settings, "STABLECOIN_WORKER_SECRET", "s3cret"):
+        resp = client.post("/tasks/archive/run", headers={"X-Worker-Secret": "s3cret"})
+    assert resp.status_code == 200
+    assert resp.json() == {"archived": []}
@@ -77,3 +77,24 @@ def test_rail_limits_defined():
     assert RAIL_LIMITS["rtp"] == Decimal("1000000")
     assert RAIL_LIMITS["ach"] == Decimal("10000000")
     assert RAIL_LIMITS["card"] == Decimal("50000")
+
+
+def test_stores_are_bounded_and_report_memory(monkeypatch):
+    bank = MockBankService(maxsize=3)
+    monkeypatch.setattr(bank, "_simulate_delay", lambda rail: None)
+    responses = [
+        bank.initiate_transfer(TransferRequest(
+            sender_account_id="s1", receiver_account_id="r1",
+            amount=Decimal("10"), rail="fednow", idempotency_key=f"soak-{i}",
+        ))
+        for i in range(10)
+    ]
+    evicted = bank.get_transfer_status(responses[0].reference_id)
+    assert evicted.status == "not_found"  # distinguishable from a real failure
+    assert evicted.failure_reason == "Transfer not found or expired"
+    assert bank.get_transfer_status(responses[-1].reference_id) == responses[-1]
+
+    stats = bank.memory_stats()
+    assert stats["transfers"]["size"] == stats["idempotency"]["size"] == 3
+    assert stats["transfers"]["evictions"] == 7
+    assert stats["transfers"]["approx_bytes"] > 0
@@ -0,0 +1,104 @@
+"""Tests for the notification outbox and batched dispatcher."""
+import smtplib
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.models.notification_outbox import NotificationOutbox
+from app.models.user import User
+from app.services import notification_service
+from app.services.notification_service import NotificationDispatcher, SmtpConnection, notify_transaction
+
+
+@pytest.fixture
+def configured(db_session):
+    db_session.add(User(id="user-notify", email="notify@test.com", hashed_password="x",
+                        role="user", phone="+15550001111"))
+    db_session.commit()
+    s = notification_service.settings
+    with patch.object(s, "SMTP_USERNAME", "relay-user"), \
+            patch.object(s, "SMTP_PASSWORD", "relay-pass"), \
+            patch.object(s, "BREVO_API_KEY", "brevo-key"), \
+            patch.object(notification_service, "dispatcher", NotificationDispatcher()):
+        yield
+
+
+def _dispatcher(smtp_server=None, http_client=None):
+    factory = MagicMock(return_value=smtp_server or MagicMock())
+    return NotificationDispatcher(smtp=SmtpConnection(factory), http_client=http_client or MagicMock()), factory
+
+
+def test_notify_only_enqueues(db_session, configured):
+    with patch("smtplib.SMTP") as smtp, patch("httpx.post") as post:
+        notify_transaction(db_session, "user-notify", "txn-1", "completed", 12.5, "Acme", "ach", "Lunch")
+
+    smtp.assert_not_called()
+    post.assert_not_called()
+    rows = db_session.query(NotificationOutbox).order_by(NotificationOutbox.channel).all()
+    assert [r.channel for r in rows] == ["email", "sms"]
+    assert all(r.status == "pending" and r.transaction_id == "txn-1" for r in rows)
+    assert rows[0].subject == "Transaction COMPLETED: $12.50 to Acme"
+    assert rows[1].body == "PayRails: Your $12.50 payment to Acme completed."
+
+
+def test_unconfigured_channels_are_not_enqueued(db_session):
+    db_session.add(User(id="user-quiet", email="quiet@test.com", hashed_password="x", role="user"))
+    db_session.commit()
+    notify_transaction(db_session, "user-quiet", "txn-2", "completed", 1.0, "Acme", "ach", None)
+    assert db_session.query(NotificationOutbox).count() == 0
+
+
+def test_batch_reuses_one_smtp_connection_and_http_client(db_session, configured):
+    for i in range(5):
+        notify_transaction(db_session, "user-notify", f"txn-b{i}", "completed", 1.0, "Acme", "ach", None)
+
+    server, client = MagicMock(), MagicMock()
+    dispatcher, factory = _dispatcher(server, client)
+    assert dispatcher.drain(db_session) == 10
+
+    assert factory.call_count == 1
+    assert server.sendmail.call_count == 5
+    assert client.post.call_count == 5
+    assert db_session.query(NotificationOutbox).filter(NotificationOutbox.status == "sent").count() == 10
+    metrics = dispatcher.metrics(db_session)
+    assert metrics["sent"] == 10 and metrics["pending"] == 0 and metrics["smtp_connects"] == 1
+
+
+def test_dropped_smtp_connection_reconnects(db_session, configured):
+    notify_transaction(db_session, "user-notify", "txn-r", "completed", 1.0, "Acme", "ach", None)
+    stale, fresh = MagicMock(), MagicMock()
+    stale.sendmail.side_effect = smtplib.SMTPServerDisconnected("idle timeout")
+    dispatcher = NotificationDispatcher(smtp=SmtpConnection(MagicMock(side_effect=[stale, fresh])),
+                                        http_client=MagicMock())
+    dispatcher.drain(db_session)
+    fresh.sendmail.assert_called_once()
+    assert db_session.query(NotificationOutbox).filter(NotificationOutbox.status == "sent").count() == 2
+
+
+def test_failed_send_backs_off_then_dead_letters(db_session, configured):
+    notify_transaction(db_session, "user-notify", "txn-f", "failed", 1.0, "Acme", "ach", None)
+    server = MagicMock()
+    server.sendmail.side_effect = smtplib.SMTPDataError(451, b"try later")
+    dispatcher, _ = _dispatcher(server)
+
+    dispatcher.drain(db_session)
+    email = db_session.query(NotificationOutbox).filter(NotificationOutbox.channel == "email").one()
+    assert email.status == "pending" and email.attempts == 1
+    assert email.next_attempt_at > notification_service._utcnow()
+    assert dispatcher.dispatch_batch(db_session) == 0  # not yet due
+
+    with patch.object(notification_service.settings, "NOTIFICATION_MAX_ATTEMPTS", 2):
+        email.next_attempt_at = notification_service._utcnow()
+        db_session.commit()
+        dispatcher.drain(db_session)
+    assert email.status == "dead" and email.attempts == 2
+    assert "try later" in email.last_error
+    assert dispatcher.metrics()["dead"] == 1
+
+
+def test_metrics_endpoint_requires_worker_secret(client):
+    with patch("app.routers.stablecoin_worker.settings.STABLECOIN_WORKER_SECRET", "s3cret"):
+        assert client.get("/tasks/notifications/metrics").status_code == 403
+        resp = client.get("/tasks/notifications/metrics", headers={"X-Worker-Secret": "s3cret"})
+    assert resp.status_code == 200
+    assert "pending" in resp.json()
@@ -0,0 +1,70 @@
+"""Tests for the bounded bcrypt pool, 429 backpressure and rehash-on-login."""
+import threading
+from unittest.mock import patch
+
+import bcrypt
+import pytest
+
+from app.models.user import User
+from app.services import auth_service
+from app.services.auth_service import PasswordHasher, PasswordHasherBusy, needs_rehash
+
+
+def test_hash_and_verify_round_trip_with_configured_cost():
+    hashed = auth_service.hash_password("correct horse")
+    assert hashed.startswith("$2b$04$")
+    assert auth_service.verify_password("correct horse", hashed)
+    assert not auth_service.verify_password("wrong horse", hashed)
+    assert not needs_rehash(hashed)
+
+
+def test_needs_rehash_when_cost_changes():
+    hashed = bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=5)).decode()
+    assert needs_rehash(hashed)
+    assert needs_rehash("not-a-bcrypt-hash")
+
+
+def test_saturated_pool_rejects_instead_of_queueing():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    with patch.object(auth_service, "_verify", side_effect=lambda *a: release.wait(5)):
+        first = hasher._submit(auth_service._verify, "a", "b")
+        second = hasher._submit(auth_service._verify, "a", "b")
+        with pytest.raises(PasswordHasherBusy):
+            hasher.verify("a", "b")
+        release.set()
+        assert first.result() and second.result()
+    assert hasher.rejected == 1
+    # Slots are returned once work completes.
+    assert hasher.hash("pw").startswith("$2b$")
+    hasher.shutdown()
+
+
+def test_login_returns_429_when_hasher_is_busy(client, seed_data):
+    with patch.object(auth_service.password_hasher, "_submit", side_effect=PasswordHasherBusy()):
+        resp = client.post("/auth/login", json={"email": "admin@acme.com", "password": "password123"})
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+
+
+def test_login_upgrades_hash_when_cost_changes(client, seed_data, db_session):
+    before = db_session.get(User, "user-001").hashed_password
+    assert before.startswith("$2b$04$")
+
+    with patch.object(auth_service.settings, "BCRYPT_ROUNDS", 5):
+        resp = client.post("/auth/login", json={"email": "admin@acme.com", "password": "password123"})
+        assert resp.status_code == 200
+
+        db_session.expire_all()
+        after = db_session.get(User, "user-001").hashed_password
+        assert after.startswith("$2b$05$")
+        assert auth_service.verify_password("password123", after)
+
+
+def test_failed_login_does_not_rehash(client, seed_data, db_session):
+    before = db_session.get(User, "user-001").hashed_password
+    with patch.object(auth_service.settings, "BCRYPT_ROUNDS", 5):
+        resp = client.post("/auth/login", json={"email": "admin@acme.com", "password": "wrong-password"})
+    assert resp.status_code == 401
+    db_session.expire_all()
+    assert db_session.get(User, "user-001").hashed_password == before
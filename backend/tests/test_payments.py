@@ -205,3 +205,63 @@ def test_payment_no_auth(client):
         "idempotency_key": str(uuid.uuid4()),
     })
     assert resp.status_code in (401, 403)
+
+
+def _seed_history(db_session, n, created_at):
+    from decimal import Decimal
+    from app.models.transaction import Transaction
+    for i in range(n):
+        db_session.add(Transaction(
+            sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+            amount=Decimal("1.00"), rail="ach", status="completed", description="history",
+            idempotency_key=f"history-{i}", created_at=created_at,
+        ))
+    db_session.commit()
+
+
+def test_cursor_pagination_walks_every_row_once(client, seed_data, db_session):
+    """Rows sharing created_at are split across pages by the id tie-breaker."""
+    from datetime import datetime
+    _seed_history(db_session, 7, datetime(2026, 1, 1, 12, 0, 0))
+    headers = get_auth_header()
+
+    first = client.get("/payments?merchant_id=merchant-001&page_size=3", headers=headers).json()
+    assert first["total"] == 7 and first["has_more"] is True
+    seen = [t["id"] for t in first["items"]]
+    cursor = first["next_cursor"]
+    while cursor:
+        page = client.get(f"/payments?merchant_id=merchant-001&page_size=3&cursor={cursor}", headers=headers).json()
+        assert page["total"] is None
+        seen += [t["id"] for t in page["items"]]
+        cursor = page["next_cursor"]
+
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_offset_pages_still_supported(client, seed_data, db_session):
+    from datetime import datetime
+    _seed_history(db_session, 5, datetime(2026, 1, 1, 12, 0, 0))
+    headers = get_auth_header()
+    page2 = client.get("/payments?page=2&page_size=2", headers=headers).json()
+    keyset = client.get("/payments?page_size=2", headers=headers).json()
+    page2_by_cursor = client.get(f"/payments?page_size=2&cursor={keyset['next_cursor']}", headers=headers).json()
+    assert page2["total"] == 5
+    assert [t["id"] for t in page2["items"]] == [t["id"] for t in page2_by_cursor["items"]]
+
+
+def test_created_at_is_stored_in_one_format(db_session, seed_data):
+    """Keyset pages compare the raw column, so every row carries microseconds."""
+    from decimal import Decimal
+    from sqlalchemy import text
+    from app.models.transaction import Transaction
+    db_session.add(Transaction(sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+                               amount=Decimal("1.00"), rail="ach", status="completed", idempotency_key="fmt-1"))
+    db_session.commit()
+    stored = db_session.execute(text("SELECT created_at FROM transactions WHERE idempotency_key = 'fmt-1'"))
+    assert len(stored.scalar()) == len("2026-01-01 12:00:00.000000")
+
+
+def test_invalid_cursor_returns_400(client, seed_data):
+    resp = client.get("/payments?cursor=not-a-cursor", headers=get_auth_header())
+    assert resp.status_code == 400
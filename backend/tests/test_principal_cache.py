@@ -0,0 +1,70 @@
+"""Tests for the authenticated-principal cache on the request auth path."""
+from unittest.mock import patch
+
+from app.services import principal_cache
+from app.services.principal_cache import invalidate_principal
+from tests.conftest import get_auth_header, make_auth_header
+
+
+def _login(client, email="admin@acme.com", password="password123"):
+    resp = client.post("/auth/login", json={"email": email, "password": password})
+    assert resp.status_code == 200
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+def test_repeat_requests_skip_the_user_query(client, db_session, seed_data, captured_selects):
+    headers = get_auth_header()
+    with captured_selects(db_session, "FROM users") as user_queries:
+        assert client.get("/payments/balance?merchant_id=merchant-001", headers=headers).status_code == 200
+        first = len(user_queries)
+        assert client.get("/payments/balance?merchant_id=merchant-001", headers=headers).status_code == 200
+    assert first == 1
+    assert len(user_queries) == first
+
+
+def test_update_me_invalidates_cached_principal(client, seed_data):
+    headers = get_auth_header()
+    client.get("/payments/balance?merchant_id=merchant-001", headers=headers)
+
+    resp = client.patch("/auth/me", json={"email": "new-admin@acme.com"}, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["email"] == "new-admin@acme.com"
+
+    assert len(principal_cache.principal_cache) == 0
+    assert client.get("/auth/me", headers=headers).json()["email"] == "new-admin@acme.com"
+
+
+def test_password_reset_invalidates_cached_principal(client, seed_data):
+    headers = get_auth_header()
+    client.get("/payments/balance?merchant_id=merchant-001", headers=headers)
+    assert len(principal_cache.principal_cache) == 1
+
+    token = client.post("/auth/password-reset/request", json={"email": "admin@acme.com"}).json()["reset_token"]
+    resp = client.post("/auth/password-reset/confirm", json={"token": token, "new_password": "newpassword1"})
+    assert resp.status_code == 200
+    assert len(principal_cache.principal_cache) == 0
+
+
+def test_trusted_claims_skip_the_db_entirely(client, db_session, seed_data, captured_selects):
+    headers = _login(client)
+    with patch.object(principal_cache.settings, "AUTH_TRUST_TOKEN_CLAIMS", True), \
+            captured_selects(db_session, "FROM users") as user_queries:
+        resp = client.get("/payments/balance?merchant_id=merchant-001", headers=headers)
+    assert resp.status_code == 200
+    assert user_queries == []
+
+
+def test_claims_issued_before_invalidation_are_not_trusted():
+    claims = {"sub": "user-001", "iat": 1_000, "role": "merchant_admin",
+              "merchant_id": "merchant-001", "email": "admin@acme.com"}
+    with patch.object(principal_cache.settings, "AUTH_TRUST_TOKEN_CLAIMS", True):
+        assert principal_cache.lookup(claims).role == "merchant_admin"
+        invalidate_principal("user-001")
+        assert principal_cache.lookup(claims) is None
+
+
+def test_unknown_user_is_rejected_and_not_cached(client, seed_data):
+    resp = client.get("/payments/balance?merchant_id=merchant-001",
+                      headers=make_auth_header("user-ghost", "ghost@test.com"))
+    assert resp.status_code == 401
+    assert len(principal_cache.principal_cache) == 0
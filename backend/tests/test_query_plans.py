@@ -0,0 +1,128 @@
+"""Query-plan regression tests: hot lookups must keep using their indexes.
+
+Each test runs the real code path, captures the SQL it sends, and EXPLAINs
+that statement with the same parameters. SQLite always runs; Postgres runs
+when TEST_POSTGRES_URL points at a scratch database (tables are created and
+dropped). On Postgres sequential scans are disabled for the EXPLAIN so that
+tiny test tables still show which index the planner can use.
+"""
+import json
+import os
+import re
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models.transaction import Transaction
+from app.services import balance_service, stablecoin_service
+from app.services.ledger_service import record_credit
+from app.services.stablecoin.schemas import OnchainStatus
+from app.services.wallet_service import wallet_credit
+from tests.conftest import TEST_DB_URL
+
+POSTGRES_URL = os.environ.get("TEST_POSTGRES_URL", "")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def plan_db(request):
+    if request.param == "postgresql":
+        if not POSTGRES_URL:
+            pytest.skip("TEST_POSTGRES_URL not set")
+        engine = create_engine(POSTGRES_URL)
+    else:
+        engine = create_engine(TEST_DB_URL, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+def _pg_index_names(node):
+    names = {node["Index Name"]} if "Index Name" in node else set()
+    for child in node.get("Plans", ()):
+        names |= _pg_index_names(child)
+    return names
+
+
+def indexes_used(db, statement, parameters) -> set:
+    """Index names in the plan of one captured statement."""
+    conn = db.connection()
+    cursor = conn.connection.cursor()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return _pg_index_names(plan[0]["Plan"])
+        cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+        return {m.group(1) for row in cursor.fetchall()
+                for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", row[3])] if m}
+    finally:
+        cursor.close()
+
+
+def test_bank_webhook_looks_up_reference_id_by_index(plan_db, captured_selects):
+    from app.routers.webhooks import BankWebhookPayload, receive_bank_webhook
+
+    with captured_selects(plan_db, r"reference_id = ") as seen:
+        with pytest.raises(HTTPException):
+            receive_bank_webhook(BankWebhookPayload(reference_id="ref-x", status="completed"), db=plan_db)
+    assert "ix_transactions_reference_id" in indexes_used(plan_db, *seen[0])
+
+
+def test_settlement_poller_uses_partial_pending_index(plan_db, captured_selects):
+    with captured_selects(plan_db, r"onchain_status IN") as seen:
+        stablecoin_service.poll_pending_settlements(plan_db)
+    assert "ix_transactions_onchain_pending" in indexes_used(plan_db, *seen[0])
+
+
+def test_already_credited_lookup_uses_transaction_index(plan_db, captured_selects):
+    plan_db.add(Transaction(id="tx-plan", idempotency_key="tx-plan", settlement_type="onchain",
+                            direction="deposit", receiver_user_id="u-plan", asset_code="USDC",
+                            amount_base_units=1_000_000, status="pending"))
+    plan_db.commit()
+    tx = plan_db.get(Transaction, "tx-plan")
+
+    with captured_selects(plan_db, r"ledger\.transaction_id = ") as seen:
+        stablecoin_service.apply_settlement_update(plan_db, tx, OnchainStatus.CONFIRMED, 12)
+    assert "ix_ledger_transaction_id" in indexes_used(plan_db, *seen[0])
+
+
+def test_ledger_totals_are_index_only_per_owner(plan_db, captured_selects):
+    record_credit(plan_db, "m-plan", Decimal("10.00"))
+    wallet_credit(plan_db, "u-plan", Decimal("4.00"))
+
+    with captured_selects(plan_db, r"FROM ledger") as seen:
+        balance_service.ledger_totals(plan_db)
+    merchant_sql, user_sql = seen
+    assert "ix_ledger_merchant_totals" in indexes_used(plan_db, *merchant_sql)
+    assert "ix_ledger_user_totals" in indexes_used(plan_db, *user_sql)
+
+
+def test_ledger_totals_index_is_covering_on_sqlite(plan_db, captured_selects):
+    if plan_db.get_bind().dialect.name != "sqlite":
+        pytest.skip("SQLite reports covering scans explicitly")
+    with captured_selects(plan_db, r"FROM ledger") as seen:
+        balance_service.ledger_totals(plan_db)
+    cursor = plan_db.connection().connection.cursor()
+    cursor.execute("EXPLAIN QUERY PLAN " + seen[0][0], seen[0][1])
+    details = " ".join(row[3] for row in cursor.fetchall())
+    assert "COVERING INDEX ix_ledger_merchant_totals" in details
+    assert "TEMP B-TREE" not in details
+
+
+def test_audit_trail_export_streams_in_index_order(plan_db, captured_selects):
+    from app.services.reporting_service import iter_onchain_audit_trail
+
+    with captured_selects(plan_db, r"settlement_type = ") as seen:
+        list(iter_onchain_audit_trail(plan_db))
+    assert "ix_transactions_onchain_created" in indexes_used(plan_db, *seen[0])
@@ -1,5 +1,11 @@
 from decimal import Decimal
-from app.services.rail_selector import select_rail
+
+import pytest
+
+from app.config import settings
+from app.models.bank_config import BankConfig
+from app.services.rail_selector import rail_router, select_rail
+from tests.conftest import get_auth_header
 
 
 def test_small_amount_selects_fednow():
@@ -45,3 +51,49 @@ def test_card_only():
 def test_card_over_limit():
     rail = select_rail(Decimal("60000"), "card")
     assert rail is None
+
+
+def test_config_limits_override_defaults():
+    limits = {"fednow": Decimal("1000"), "rtp": None, "ach": Decimal("5000000")}
+    assert select_rail(Decimal("1500"), "fednow,rtp,ach", limits=limits) == "rtp"
+    assert select_rail(Decimal("1500"), "fednow,ach", limits=limits) == "ach"
+    assert select_rail(Decimal("6000000"), "fednow,ach", limits=limits) is None
+
+
+def test_router_caches_table_until_a_config_changes(db_session, seed_data, captured_selects):
+    with captured_selects(db_session, "FROM bank_configs") as config_queries:
+        for _ in range(3):
+            assert rail_router.select_rail(db_session, Decimal("1500")) == "fednow"
+    assert len(config_queries) == 1
+
+    config = db_session.get(BankConfig, "bank-config-test")
+    config.fednow_limit = Decimal("1000")
+    db_session.commit()
+    assert rail_router.select_rail(db_session, Decimal("1500")) == "rtp"
+
+    config.is_active = False
+    db_session.commit()
+    with pytest.raises(ValueError, match="No active bank configuration"):
+        rail_router.select_rail(db_session, Decimal("1500"))
+
+
+def test_scored_strategy_prefers_the_faster_rail(db_session, seed_data, monkeypatch):
+    monkeypatch.setattr(settings, "RAIL_ROUTING_STRATEGY", "scored")
+    rail_router.observe("fednow", 0.4)
+    rail_router.observe("rtp", 0.05)
+    assert rail_router.select_rail(db_session, Decimal("1500")) == "rtp"
+    # Preferred rails are still honored, and only eligible rails are scored.
+    assert rail_router.select_rail(db_session, Decimal("1500"), preferred_rail="fednow") == "fednow"
+    assert rail_router.select_rail(db_session, Decimal("2000000")) == "ach"
+
+
+def test_payment_routes_against_config_limits(client, db_session, seed_data):
+    db_session.get(BankConfig, "bank-config-test").fednow_limit = Decimal("100")
+    db_session.commit()
+    resp = client.post("/payments", json={
+        "sender_merchant_id": "merchant-001", "receiver_merchant_id": "merchant-002", "amount": "500.00",
+        "idempotency_key": "route-by-config-limit",
+    }, headers=get_auth_header())
+    assert resp.status_code == 201
+    assert resp.json()["rail"] == "rtp"
+    assert "rtp" in rail_router.latencies()
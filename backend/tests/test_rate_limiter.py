@@ -0,0 +1,121 @@
+"""Tests for the pluggable rate limiters and the routes they guard."""
+from unittest.mock import patch
+
+import fakeredis
+import pytest
+import redis
+
+from app.config import settings
+from app.services.rate_limiter import (
+    FixedWindowRateLimiter, RedisRateLimiter, SlidingWindowRateLimiter, TokenBucketRateLimiter,
+    _InMemoryLimiter,
+)
+from tests.conftest import get_auth_header
+
+
+def _in_memory(algorithm):
+    return {"sliding_window": SlidingWindowRateLimiter, "token_bucket": TokenBucketRateLimiter,
+            "fixed_window": FixedWindowRateLimiter}[algorithm]()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def make_limiter(request):
+    def make(algorithm):
+        if request.param == "redis":
+            return RedisRateLimiter(fakeredis.FakeRedis(), algorithm)
+        return _in_memory(algorithm)
+    return make
+
+
+def test_sliding_window_has_no_boundary_burst(make_limiter):
+    limiter = make_limiter("sliding_window")
+    # Fill the quota at the very end of one minute...
+    assert all(limiter.allow("k", 5, 60, now=59.0) for _ in range(5))
+    # ...and the next minute does not grant a fresh quota straight away.
+    assert not limiter.allow("k", 5, 60, now=61.0)
+    assert limiter.allow("k", 5, 60, now=119.5)
+
+
+def test_fixed_window_allows_double_at_the_boundary(make_limiter):
+    limiter = make_limiter("fixed_window")
+    assert all(limiter.allow("k", 5, 60, now=59.0) for _ in range(5))
+    assert not limiter.allow("k", 5, 60, now=59.5)
+    assert all(limiter.allow("k", 5, 60, now=61.0) for _ in range(5))
+
+
+def test_token_bucket_refills_gradually(make_limiter):
+    limiter = make_limiter("token_bucket")
+    assert all(limiter.allow("k", 6, 60, now=0.0) for _ in range(6))
+    assert not limiter.allow("k", 6, 60, now=0.0)
+    assert limiter.allow("k", 6, 60, now=10.0)  # one token per 10s
+    assert not limiter.allow("k", 6, 60, now=10.0)
+
+
+def test_keys_are_independent(make_limiter):
+    limiter = make_limiter("sliding_window")
+    assert limiter.allow("a", 1, 60, now=0.0)
+    assert not limiter.allow("a", 1, 60, now=1.0)
+    assert limiter.allow("b", 1, 60, now=1.0)
+
+
+@pytest.mark.parametrize("algorithm", ["sliding_window", "token_bucket", "fixed_window"])
+def test_in_memory_limiters_evict_idle_keys(algorithm):
+    limiter = _in_memory(algorithm)
+    for n in range(100):
+        limiter.allow(f"client-{n}", 5, 60, now=0.0)
+    assert len(limiter) == 100
+    limiter.allow("late", 5, 60, now=120.0)
+    assert len(limiter) == 1
+
+
+def test_in_memory_limiter_requires_a_step():
+    class Incomplete(_InMemoryLimiter):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_redis_keys_expire_with_the_window():
+    client = fakeredis.FakeRedis()
+    limiter = RedisRateLimiter(client, "sliding_window")
+    limiter.allow("k", 5, 60)
+    assert 0 < client.pttl("ratelimit:k") <= 60_000
+
+
+def test_redis_limit_is_shared_between_instances():
+    server = fakeredis.FakeServer()
+    first = RedisRateLimiter(fakeredis.FakeRedis(server=server))
+    second = RedisRateLimiter(fakeredis.FakeRedis(server=server))
+    assert first.allow("k", 2, 60, now=0.0)
+    assert second.allow("k", 2, 60, now=1.0)
+    assert not first.allow("k", 2, 60, now=2.0)
+
+
+def test_redis_outage_fails_open():
+    client = fakeredis.FakeRedis()
+    limiter = RedisRateLimiter(client, "sliding_window")
+    with patch.object(client, "evalsha", side_effect=redis.ConnectionError("down")):
+        assert limiter.allow("k", 0, 60)
+
+
+def test_login_is_limited_per_client(client, seed_data, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_MAX_REQUESTS", 2)
+    body = {"email": "admin@acme.com", "password": "wrong-password"}
+    assert client.post("/auth/login", json=body).status_code == 401
+    assert client.post("/auth/login", json=body).status_code == 401
+    resp = client.post("/auth/login", json=body)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == str(settings.RATE_LIMIT_LOGIN_WINDOW_SECONDS)
+
+
+def test_payment_creation_is_limited_per_user(client, seed_data, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_MAX_REQUESTS", 1)
+    headers = get_auth_header()
+    body = {"sender_merchant_id": "merchant-001", "receiver_merchant_id": "merchant-002",
+            "amount": "1.00", "currency": "USD", "idempotency_key": "rl-1", "preferred_rail": "ach"}
+    assert client.post("/payments", json=body, headers=headers).status_code != 429
+    assert client.post("/payments", json={**body, "idempotency_key": "rl-2"},
+                       headers=headers).status_code == 429
+    # Reads on the same path are not counted against the write limit.
+    assert client.get("/payments?merchant_id=merchant-001", headers=headers).status_code == 200
@@ -0,0 +1,115 @@
+"""Tests for the chunked, resumable, incremental reconciliation engine."""
+from datetime import datetime
+from decimal import Decimal
+
+from app.config import settings
+from app.models.balance import Balance
+from app.models.crypto_account import CryptoAccount
+from app.models.reconciliation import ReconciliationDrift
+from app.services import reconciliation_service as rs
+from app.services import stablecoin_service as sc
+from app.services.stablecoin import get_stablecoin_provider
+
+OLD = datetime(2026, 1, 1)
+
+
+def _funded(db_session, user_id, amount, asset_code="USDC"):
+    sc.ensure_kyc(db_session, user_id)
+    account = sc.ensure_crypto_account(db_session, user_id, asset_code, "ethereum")
+    if amount:
+        sc.onramp(db_session, user_id, Decimal(amount), asset_code)
+    return account
+
+
+def _backdate(db_session):
+    db_session.query(Balance).update({Balance.updated_at: OLD})
+    db_session.query(CryptoAccount).update({CryptoAccount.created_at: OLD})
+    db_session.commit()
+
+
+def test_full_run_batches_partner_calls_and_persists_only_drift(db_session, monkeypatch):
+    provider = get_stablecoin_provider()
+    matched = _funded(db_session, "u-rc1", "10")
+    _funded(db_session, "u-rc2", "25")
+    _funded(db_session, "u-rc3", "5", asset_code="USD1")
+    monkeypatch.setitem(provider._balances, matched.partner_account_id, Decimal("10"))
+    monkeypatch.setattr(provider, "get_balance", lambda *a: (_ for _ in ()).throw(AssertionError("unbatched")))
+    batches = []
+    real_get_balances = provider.get_balances
+    monkeypatch.setattr(provider, "get_balances",
+                        lambda ids, asset: batches.append((len(ids), asset)) or real_get_balances(ids, asset))
+
+    run = rs.run_reconciliation(db_session)
+
+    assert (run.status, run.mode, run.accounts_checked, run.drifted, run.errors) == ("completed", "full", 3, 2, 0)
+    assert sorted(batches) == [(1, "USD1"), (2, "USDC")]
+    drifts = {d.user_id: d for d in db_session.query(ReconciliationDrift).filter_by(run_id=run.id)}
+    assert set(drifts) == {"u-rc2", "u-rc3"}
+    assert drifts["u-rc2"].drift == Decimal("25")
+
+
+def test_run_checkpoints_each_chunk_and_resumes(db_session, monkeypatch):
+    for i in range(3):
+        _funded(db_session, f"u-ck{i}", "1")
+    monkeypatch.setattr(settings, "RECONCILIATION_BATCH_SIZE", 2)
+    ticks = iter([0.0, 0.0])  # start, first chunk; then the budget is spent
+    monkeypatch.setattr(rs.time, "monotonic", lambda: next(ticks, 1e9))
+
+    run = rs.run_reconciliation(db_session, time_budget_seconds=10)
+    assert (run.status, run.accounts_checked, run.drifted) == ("running", 2, 2)
+
+    monkeypatch.undo()
+    resumed = rs.run_reconciliation(db_session, run_id=run.id)
+    assert resumed.id == run.id
+    assert (resumed.status, resumed.accounts_checked, resumed.drifted) == ("completed", 3, 3)
+    assert db_session.query(ReconciliationDrift).filter_by(run_id=run.id).count() == 3
+
+
+def test_incremental_run_only_checks_owners_active_since_last_clean_run(db_session, monkeypatch):
+    provider = get_stablecoin_provider()
+    quiet = _funded(db_session, "u-quiet", "")
+    busy = _funded(db_session, "u-busy", "")
+    clean = rs.run_reconciliation(db_session)
+    assert (clean.accounts_checked, clean.drifted) == (2, 0)
+    _backdate(db_session)
+
+    sc.onramp(db_session, "u-busy", Decimal("7"), "USDC")
+    monkeypatch.setitem(provider._balances, busy.partner_account_id, Decimal("7"))
+    run = rs.run_reconciliation(db_session, incremental=True)
+
+    assert run.baseline_run_id == clean.id
+    assert (run.mode, run.accounts_checked, run.drifted) == ("incremental", 1, 0)
+    assert quiet.partner_account_id not in {d.partner_account_id for d in db_session.query(ReconciliationDrift)}
+
+
+def test_partner_errors_are_recorded_and_block_incremental_baseline(db_session, monkeypatch):
+    provider = get_stablecoin_provider()
+    _funded(db_session, "u-err", "")
+
+    def unavailable(ids, asset_code):
+        raise ConnectionError("partner timeout")
+
+    monkeypatch.setattr(provider, "get_balances", unavailable)
+    run = rs.run_reconciliation(db_session)
+
+    assert (run.status, run.errors, run.drifted) == ("completed", 1, 0)
+    drift = db_session.query(ReconciliationDrift).filter_by(run_id=run.id).one()
+    assert drift.error == "ConnectionError: partner timeout" and drift.external_balance is None
+    assert rs.last_clean_run(db_session) is None
+
+
+def test_drift_reports_are_paged_from_the_table(client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "STABLECOIN_WORKER_SECRET", "rec-secret")
+    headers = {"X-Worker-Secret": "rec-secret"}
+    _funded(db_session, "u-page1", "3")
+    _funded(db_session, "u-page2", "4")
+
+    summary = client.post("/tasks/reconcile", headers=headers).json()
+    assert summary["status"] == "completed" and summary["drifted"] == 2
+
+    r = client.get(f"/tasks/reconcile/{summary['run_id']}/drifts?page_size=1", headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert body["has_more"] is True and len(body["reports"]) == 1
+    assert body["reports"][0]["drift"] in {"3", "4"}
+    assert client.post("/tasks/reconcile?run_id=nope", headers=headers).status_code == 404
@@ -0,0 +1,276 @@
+"""Tests for the bank settlement pipeline (sync, async executor, webhook finalization)."""
+import threading
+import time
+import uuid
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.ledger import Ledger
+from app.models.transaction import Transaction
+from app.services import settlement_service
+from app.services.bank.schemas import TransferRequest, TransferResponse
+from app.services.ledger_service import get_balance
+from app.services.payment_service import cancel_payment
+from app.services.settlement_service import SettlementExecutor, finalize_bank_transfer
+from tests.conftest import get_auth_header
+
+
+class SlowBank:
+    """Bank double that blocks until released, standing in for rail latency."""
+
+    def __init__(self, status="completed", failure_reason=None):
+        self.release = threading.Event()
+        self.status = status
+        self.failure_reason = failure_reason
+
+    def initiate_transfer(self, request):
+        self.release.wait(timeout=5)
+        return TransferResponse(
+            reference_id=f"ref-{uuid.uuid4()}", status=self.status, rail=request.rail,
+            amount=request.amount, failure_reason=self.failure_reason,
+        )
+
+
+@pytest.fixture
+def async_settlement(db_session):
+    bank = SlowBank()
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    executor = SettlementExecutor(session_factory=Session, max_workers=2, bank=bank)
+    with patch.object(settlement_service.settings, "BANK_SETTLEMENT_ASYNC", True), \
+            patch.object(settlement_service, "settlement_executor", executor), \
+            patch("app.services.notification_service.notify_transaction"):
+        yield bank, executor
+    bank.release.set()
+    executor.shutdown()
+
+
+def _pay(client, key, amount="100.00", rail="ach"):
+    return client.post("/payments", json={
+        "sender_merchant_id": "merchant-001",
+        "receiver_merchant_id": "merchant-002",
+        "amount": amount,
+        "currency": "USD",
+        "idempotency_key": key,
+        "preferred_rail": rail,
+        "description": "Invoice settlement",
+    }, headers=get_auth_header())
+
+
+def test_retry_after_async_settlement_reflects_the_current_row(client, seed_data, db_session, async_settlement):
+    """A "processing" response is not stored, so the retry is not a stale replay."""
+    bank, executor = async_settlement
+    first = _pay(client, "settle-async-retry")
+    assert first.json()["status"] == "processing"
+
+    bank.release.set()
+    executor.shutdown()
+
+    retry = _pay(client, "settle-async-retry")
+    assert retry.json()["id"] == first.json()["id"]
+    assert retry.json()["status"] == "completed"
+    assert "idempotent-replayed" not in retry.headers
+
+
+def test_async_payment_returns_processing_before_bank_responds(client, seed_data, db_session, async_settlement):
+    bank, executor = async_settlement
+
+    start = time.monotonic()
+    resp = _pay(client, "settle-async-1")
+    assert time.monotonic() - start < 2
+    assert resp.status_code in (200, 201)
+    assert resp.json()["status"] == "processing"
+    assert get_balance(db_session, "merchant-002") == Decimal("100000.00")
+
+    bank.release.set()
+    executor.shutdown()
+
+    db_session.expire_all()
+    txn = db_session.query(Transaction).filter(Transaction.id == resp.json()["id"]).one()
+    assert txn.status == "completed"
+    assert txn.reference_id is not None
+    assert get_balance(db_session, "merchant-001") == Decimal("99900.00")
+    assert get_balance(db_session, "merchant-002") == Decimal("100100.00")
+
+
+def test_async_failed_transfer_posts_no_ledger(client, seed_data, db_session, async_settlement):
+    bank, executor = async_settlement
+    bank.status, bank.failure_reason = "failed", "Bank processing error (simulated)"
+
+    resp = _pay(client, "settle-async-2")
+    bank.release.set()
+    executor.shutdown()
+
+    db_session.expire_all()
+    txn = db_session.query(Transaction).filter(Transaction.id == resp.json()["id"]).one()
+    assert txn.status == "failed"
+    assert txn.failure_reason == "Bank processing error (simulated)"
+    assert db_session.query(Ledger).filter(Ledger.transaction_id == txn.id).count() == 0
+
+
+def test_webhook_finalizes_processing_payment(client, seed_data, db_session):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("200.00"), currency="USD", rail="fednow",
+        status="processing", idempotency_key="settle-webhook-1", reference_id="ref-webhook-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+
+    with patch("app.services.notification_service.notify_transaction"):
+        resp = client.post("/webhooks/bank", json={"reference_id": "ref-webhook-1", "status": "completed"})
+        again = client.post("/webhooks/bank", json={"reference_id": "ref-webhook-1", "status": "completed"})
+
+    assert resp.json() == {"status": "processed"}
+    assert again.json() == {"status": "already_processed"}
+    # Same settlement path as inline: instant-rail discount, both legs, once.
+    assert get_balance(db_session, "merchant-002") == Decimal("100199.90")
+    assert db_session.query(Ledger).filter(Ledger.transaction_id == txn.id).count() == 2
+
+
+def test_finalize_is_idempotent(db_session, seed_data):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("10.00"), currency="USD", rail="ach",
+        status="processing", idempotency_key="settle-final-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+
+    with patch("app.services.notification_service.notify_transaction") as notify:
+        assert finalize_bank_transfer(db_session, txn, "completed") is True
+        assert finalize_bank_transfer(db_session, txn, "failed", "late failure") is False
+
+    assert txn.status == "completed"
+    assert notify.call_count == 1
+    assert get_balance(db_session, "merchant-002") == Decimal("100010.00")
+
+
+def test_settlement_failing_funds_check_marks_payment_failed(db_session, seed_data):
+    txn = Transaction(
+        sender_user_id="user-broke", receiver_merchant_id="merchant-002",
+        amount=Decimal("10.00"), currency="USD", rail="ach",
+        status="processing", idempotency_key="settle-broke-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+
+    with patch("app.services.notification_service.notify_transaction"):
+        finalize_bank_transfer(db_session, txn, "completed")
+
+    assert txn.status == "failed"
+    assert txn.failure_reason == "Insufficient wallet balance"
+    assert get_balance(db_session, "merchant-002") == Decimal("100000.00")
+
+
+class CancellingBank:
+    """Bank double during whose call the payment is cancelled from another session."""
+
+    def __init__(self, Session, txn_id):
+        self.Session, self.txn_id = Session, txn_id
+
+    def initiate_transfer(self, request):
+        other = self.Session()
+        try:
+            cancel_payment(other, self.txn_id)
+        finally:
+            other.close()
+        return TransferResponse(reference_id="ref-late", status="completed", rail=request.rail,
+                                amount=request.amount)
+
+
+def test_cancel_during_bank_call_is_not_overwritten(db_session, seed_data):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("50.00"), currency="USD", rail="ach",
+        status="processing", idempotency_key="settle-cancel-1", description="Invoice 7",
+    )
+    db_session.add(txn)
+    db_session.commit()
+    bank = CancellingBank(sessionmaker(bind=db_session.get_bind()), txn.id)
+    request = TransferRequest(sender_account_id="s", receiver_account_id="r", amount=txn.amount,
+                              rail="ach", idempotency_key=txn.idempotency_key)
+
+    with patch("app.services.notification_service.notify_transaction") as notify:
+        settlement_service.execute_transfer(db_session, txn, request, bank)
+
+    assert txn.status == "cancelled"
+    assert txn.reference_id is None
+    assert db_session.query(Ledger).filter(Ledger.transaction_id == txn.id).count() == 0
+    assert get_balance(db_session, "merchant-002") == Decimal("100000.00")
+    assert notify.call_count == 0
+
+
+def test_non_final_bank_status_sends_no_notification(db_session, seed_data):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("10.00"), currency="USD", rail="ach",
+        status="pending", idempotency_key="settle-pending-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+
+    with patch("app.services.notification_service.notify_transaction") as notify:
+        assert finalize_bank_transfer(db_session, txn, "processing") is True
+        assert finalize_bank_transfer(db_session, txn, "completed") is True
+
+    assert txn.status == "completed"
+    assert notify.call_count == 1
+
+
+class FailingBank:
+    def __init__(self):
+        self.calls = 0
+
+    def initiate_transfer(self, request):
+        self.calls += 1
+        raise ConnectionError("bank unreachable")
+
+
+def test_failed_bank_call_is_resubmitted_by_the_sweeper(client, seed_data, db_session, monkeypatch):
+    bank = FailingBank()
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=db_session.get_bind())
+    executor = SettlementExecutor(session_factory=Session, max_workers=1, bank=bank)
+    with patch.object(settlement_service.settings, "BANK_SETTLEMENT_ASYNC", True), \
+            patch.object(settlement_service, "settlement_executor", executor):
+        resp = _pay(client, "settle-lost-1")
+        executor.shutdown()
+
+    db_session.expire_all()
+    txn = db_session.get(Transaction, resp.json()["id"])
+    assert bank.calls == 1
+    assert (txn.status, txn.reference_id) == ("processing", None)
+    assert txn.bank_submitted_at is not None
+
+    monkeypatch.setattr(settlement_service.settings, "STABLECOIN_WORKER_SECRET", "s3cret")
+    sweep = client.post("/tasks/settlement/resubmit", headers={"X-Worker-Secret": "s3cret"})
+    assert sweep.json() == {"resubmitted": 0, "failed": 0}  # not stale yet
+
+    monkeypatch.setattr(settlement_service.settings, "BANK_SETTLEMENT_RESUBMIT_AFTER_SECONDS", -1)
+    with patch("app.services.notification_service.notify_transaction"):
+        sweep = client.post("/tasks/settlement/resubmit", headers={"X-Worker-Secret": "s3cret"})
+    assert sweep.json() == {"resubmitted": 1, "failed": 0}
+    db_session.expire_all()
+    assert db_session.get(Transaction, txn.id).status == "completed"
+
+
+def test_bank_reference_is_kept_when_finalizing_fails(db_session, seed_data):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("20.00"), currency="USD", rail="ach",
+        status="processing", idempotency_key="settle-ref-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+    bank = SlowBank()
+    bank.release.set()
+
+    with patch.object(settlement_service, "finalize_bank_transfer", side_effect=RuntimeError("db blip")), \
+            pytest.raises(RuntimeError):
+        settlement_service.execute_transfer(db_session, txn, settlement_service.transfer_request_for(txn), bank)
+
+    db_session.expire_all()
+    assert txn.status == "processing"
+    assert txn.reference_id.startswith("ref-")
@@ -115,3 +115,22 @@ def test_transactions_history_filtered(client, db_session):
     rows = client.get("/stablecoin/transactions?asset_code=USDC", headers=headers).json()
     assert len(rows) >= 1
     assert all(r["asset_code"] == "USDC" for r in rows)
+
+
+def test_transactions_history_cursor_pages(client, db_session):
+    headers = _consumer(db_session)
+    client.post("/stablecoin/kyc", json={}, headers=headers)
+    for amount in ("10", "20", "30"):
+        client.post("/stablecoin/onramp", json={"usd_amount": amount, "asset_code": "USDC"}, headers=headers)
+
+    first = client.get("/stablecoin/transactions?limit=2", headers=headers)
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+    rest = client.get(f"/stablecoin/transactions?limit=2&cursor={cursor}", headers=headers)
+    assert "X-Next-Cursor" not in rest.headers
+    ids = [r["id"] for r in first.json() + rest.json()]
+    assert len(ids) == len(set(ids)) == 3
+
+    unpaged = client.get("/stablecoin/transactions", headers=headers)
+    assert "X-Next-Cursor" not in unpaged.headers
+    assert [r["id"] for r in unpaged.json()] == ids
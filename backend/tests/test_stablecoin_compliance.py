@@ -1,14 +1,21 @@
 """Tests for step 5 compliance hooks: KYT screening, audit trail, event logging."""
+import csv
+import io
+import json
 from decimal import Decimal
 
 import pytest
 
+from app.config import settings
 from app.models.event_log import EventLog
+from app.models.transaction import Transaction
 from app.models.sanctions_screening import SanctionsScreening
 from app.models.user import User
 from app.services import stablecoin_service as sc
 from app.services.auth_service import hash_password
-from app.services.reporting_service import onchain_audit_trail, ctr_report, screening_report
+from app.services.reporting_service import (
+    AUDIT_TRAIL_FIELDS, csv_lines, ctr_report, onchain_audit_trail, screening_report,
+)
 from app.services.screening_service import ScreeningBlockedError
 from app.services.wallet_service import get_wallet_balance
 
@@ -72,6 +79,52 @@ def test_ctr_report_flags_large_transactions(db_session):
     assert Decimal("100") not in amounts
 
 
+def test_ctr_threshold_is_applied_per_asset_in_sql(db_session):
+    for i, (asset_code, units, amount) in enumerate([
+        ("USDC", 10_000_000_000, None),   # exactly 10,000 USDC
+        ("USD1", 9_999_999_999, None),    # 9,999.999999 USD1
+        ("USD", 1_000_000, Decimal("10000.00")),
+        ("USD", 999_999, Decimal("9999.99")),
+    ]):
+        db_session.add(Transaction(id=f"tx-ctr-{i}", idempotency_key=f"ctr-{i}", settlement_type="onchain",
+                                   asset_code=asset_code, currency=asset_code, amount=amount,
+                                   amount_base_units=units, status="completed", direction="deposit"))
+    db_session.commit()
+
+    assert [r["transaction_id"] for r in ctr_report(db_session)] == ["tx-ctr-0", "tx-ctr-2"]
+
+
+def test_csv_export_is_written_in_chunks(monkeypatch):
+    monkeypatch.setattr(settings, "EXPORT_BATCH_SIZE", 2)
+    rows = [dict.fromkeys(AUDIT_TRAIL_FIELDS, None) | {"transaction_id": f"t{i}", "amount": Decimal("1.5")}
+            for i in range(3)]
+
+    chunks = list(csv_lines(iter(rows), AUDIT_TRAIL_FIELDS))
+
+    assert len(chunks) == 2  # header + t0, then t1 + t2
+    parsed = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [r["transaction_id"] for r in parsed] == ["t0", "t1", "t2"]
+    assert parsed[0]["amount"] == "1.5" and parsed[0]["network"] == ""
+
+
+def test_export_endpoints_stream_csv_and_ndjson(client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "STABLECOIN_WORKER_SECRET", "exp-secret")
+    headers = {"X-Worker-Secret": "exp-secret"}
+    _funded(db_session, amount="12000")
+    assert client.get("/tasks/exports/ctr").status_code == 403
+
+    r = client.get("/tasks/exports/ctr?format=ndjson", headers=headers)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [(row["asset_code"], row["amount"]) for row in rows] == [("USDC", "12000.000000")]
+
+    r = client.get("/tasks/exports/onchain-audit-trail?asset_code=USDC", headers=headers)
+    assert r.headers["content-type"].startswith("text/csv")
+    assert 'filename="onchain_audit_trail.csv"' in r.headers["content-disposition"]
+    assert list(csv.DictReader(io.StringIO(r.text)))[0]["direction"] == "onramp"
+
+
 # --- event logging ---
 
 def test_stablecoin_events_logged(db_session):
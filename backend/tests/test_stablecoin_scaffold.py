@@ -5,12 +5,14 @@ StablecoinProviderInterface with basic happy-path behaviour. No business logic i
 wired yet, so these only exercise the scaffold surface.
 """
 from decimal import Decimal
+from unittest.mock import patch
 
 from app.models.asset import Asset
 from app.models.crypto_account import CryptoAccount
 from app.models.kyc_record import KycRecord
 from app.services.stablecoin import get_stablecoin_provider
 from app.services.stablecoin.interface import StablecoinProviderInterface
+from app.services.stablecoin.mock_provider import MockStablecoinProvider
 from app.services.stablecoin.schemas import KycStatus, OnchainStatus
 
 
@@ -70,8 +72,32 @@ def test_mock_provider_happy_path():
     xfer = provider.transfer(account.partner_account_id, "0xdead", "USDC", "ethereum", Decimal("5"), "send-1")
     assert provider.get_transfer_status(xfer.partner_transfer_id).status == OnchainStatus.CONFIRMED
 
+    with patch.object(provider, "get_transfer_status", side_effect=AssertionError("per-id lookup")), \
+            patch.object(provider, "get_balance", side_effect=AssertionError("per-id lookup")):
+        statuses = provider.get_transfer_statuses([xfer.partner_transfer_id, "missing"])
+        balances = provider.get_balances([account.partner_account_id], "USDC")
+    assert statuses[xfer.partner_transfer_id].status == OnchainStatus.CONFIRMED
+    assert statuses["missing"].status == OnchainStatus.UNKNOWN
+    assert balances == {
+        account.partner_account_id: provider.get_balance(account.partner_account_id, "USDC"),
+    }
+
 
 def test_mock_provider_webhook_helpers():
     provider = get_stablecoin_provider()
     assert provider.verify_webhook({}, b"{}") is True
     assert provider.parse_webhook_event(b'{"event":"deposit"}') == {"event": "deposit"}
+
+
+def test_mock_provider_stores_are_bounded():
+    provider = MockStablecoinProvider(maxsize=2)
+    first = provider.transfer("acct", "0xdead", "USDC", "ethereum", Decimal("1"), "soak-0")
+    for i in range(1, 5):
+        provider.execute_onramp(provider.quote_onramp(Decimal("1"), "USDC").quote_id, f"soak-{i}")
+
+    assert provider.get_transfer_status(first.partner_transfer_id).status == OnchainStatus.UNKNOWN
+    stats = provider.memory_stats()
+    assert {store: stats[store]["size"] for store in ("quotes", "transfers", "idempotency")} == {
+        "quotes": 2, "transfers": 2, "idempotency": 2,
+    }
+    assert stats["transfers"]["evictions"] == 3
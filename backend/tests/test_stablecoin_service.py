@@ -3,6 +3,7 @@ from decimal import Decimal
 
 import pytest
 
+from app.models.ledger import Ledger
 from app.models.user import User
 from app.services.auth_service import hash_password
 from app.services.wallet_service import wallet_credit, get_wallet_balance
@@ -76,6 +77,17 @@ def test_offramp_insufficient_balance_raises(db_session):
         sc.offramp(db_session, "user-sc-1", "USDC", Decimal("10"))
 
 
+def test_merchant_offramp_checks_funds_on_the_locked_balance(db_session, seed_data, monkeypatch):
+    _make_user(db_session)
+    sc.ensure_kyc(db_session, "user-sc-1")
+    monkeypatch.setattr(sc, "get_balance", lambda *a: pytest.fail("unlocked balance pre-check"))
+    with pytest.raises(ValueError, match="Insufficient balance"):
+        sc.offramp(db_session, "user-sc-1", "USDC", Decimal("10"), merchant_id="merchant-001")
+    db_session.rollback()
+    assert db_session.query(Ledger).filter(Ledger.merchant_id == "merchant-001",
+                                           Ledger.asset_code == "USDC").count() == 0
+
+
 def test_send_stablecoin_debits_wallet(db_session):
     _make_user(db_session)
     sc.ensure_kyc(db_session, "user-sc-1")
@@ -64,3 +64,62 @@ def test_webhook_transfer_updated_settles(client, db_session):
     db_session.refresh(tx)
     assert tx.status == "completed"
     assert get_wallet_balance(db_session, "u-xfer", "USDC") == Decimal("40")
+
+
+def _deposit(eid, tx_hash, user_id="u-batch", amount="2"):
+    return {"event_id": eid, "type": "deposit.confirmed",
+            "data": {"user_id": user_id, "asset_code": "USDC", "amount": amount, "onchain_tx_hash": tx_hash}}
+
+
+def test_batch_webhook_applies_mixed_events_once(client, db_session):
+    onramp = Transaction(
+        receiver_user_id="u-batch", amount=None, amount_base_units=to_base_units(Decimal("40"), "USDC"),
+        currency="USDC", asset_code="USDC", status="processing", idempotency_key="idem-batch-1",
+        settlement_type="onchain", onchain_status="submitted", partner="mock",
+        partner_transfer_id="xfer-batch-1", direction="onramp",
+    )
+    db_session.add(onramp)
+    db_session.commit()
+    assert client.post("/webhooks/stablecoin", json=_deposit("evt-b0", "0xb0")).status_code == 200
+
+    events = [
+        _deposit("evt-b0", "0xb0"),                      # already processed singly
+        _deposit("evt-b1", "0xb1"),
+        _deposit("evt-b2", "0xb1"),                      # same deposit, new event id
+        _deposit("evt-b3", "0xb3", user_id="u-batch2", amount="5"),
+        {"event_id": "evt-b4", "type": "transfer.updated",
+         "data": {"partner_transfer_id": "xfer-batch-1", "status": "confirmed", "confirmations": 12}},
+        {"event_id": "evt-b5", "type": "transfer.updated",
+         "data": {"partner_transfer_id": "xfer-batch-1", "status": "confirmed", "confirmations": 13}},
+        {"event_id": "evt-b6", "type": "kyc.updated", "data": {"user_id": "u-batch", "status": "approved"}},
+    ]
+    r = client.post("/webhooks/stablecoin/batch", json=events)
+    assert r.status_code == 200
+    assert r.json() == {"status": "processed", "processed": 6, "outcomes": {
+        "deposit_credited": 3, "transfer_updated": 2, "kyc_updated": 1, "already_processed": 1,
+    }}
+    assert get_wallet_balance(db_session, "u-batch", "USDC") == Decimal("44")  # 2 + 2 + 40
+    assert get_wallet_balance(db_session, "u-batch2", "USDC") == Decimal("5")
+    db_session.refresh(onramp)
+    assert (onramp.status, onramp.confirmations) == ("completed", 13)
+
+    again = client.post("/webhooks/stablecoin/batch", json=events).json()
+    assert again["processed"] == 0 and again["outcomes"] == {"already_processed": 7}
+    assert get_wallet_balance(db_session, "u-batch", "USDC") == Decimal("44")
+
+
+def test_batch_webhook_query_count_does_not_grow_with_the_batch(client, db_session, captured_selects):
+    events = [_deposit(f"evt-n{i}", f"0xn{i}", user_id=f"u-n{i % 20}", amount="1") for i in range(300)]
+    with captured_selects(db_session) as selects:
+        assert client.post("/webhooks/stablecoin/batch", json=events).json()["processed"] == 300
+
+    assert len(selects) <= 5
+    assert get_wallet_balance(db_session, "u-n0", "USDC") == Decimal("15")
+
+
+def test_batch_webhook_rejects_malformed_event_without_writing(client, db_session):
+    events = [_deposit("evt-m1", "0xm1"), {"event_id": "evt-m2", "type": "deposit.confirmed", "data": {}}]
+    r = client.post("/webhooks/stablecoin/batch", json=events)
+    assert r.status_code == 400 and "evt-m2" in r.json()["detail"]
+    assert get_wallet_balance(db_session, "u-batch", "USDC") == Decimal("0")
+    assert client.post("/webhooks/stablecoin/batch", json={"not": "a list"}).status_code == 400
@@ -1,12 +1,19 @@
 """Tests for the stablecoin worker endpoints (step 4): /tasks/settle, /tasks/reconcile."""
+import time
+from datetime import datetime, timedelta
 from decimal import Decimal
 
+from sqlalchemy import event
+
 from app.config import settings
 from app.models.transaction import Transaction
 from app.models.user import User
 from app.services import stablecoin_service as sc
 from app.services.auth_service import hash_password
 from app.services.stablecoin import get_stablecoin_provider
+from app.services.stablecoin.interface import StablecoinProviderInterface
+from app.services.stablecoin.mock_provider import MockStablecoinProvider
+from app.services.stablecoin.schemas import OnchainStatus, TransferResult
 from app.services.units import to_base_units
 from app.services.wallet_service import get_wallet_balance
 
@@ -62,3 +69,124 @@ def test_reconcile_reports_drift(client, db_session, monkeypatch):
     body = r.json()
     assert body["accounts"] >= 1
     assert body["drifted"] >= 1
+
+
+class _SlowPartner:
+    """Stand-in partner: fixed latency per status call, optional failing ids.
+
+    Without a bulk endpoint it uses the interface's looping fallback; pass
+    max_batch_size to pretend it has one (each batch call costs one latency).
+    """
+
+    get_transfer_statuses = StablecoinProviderInterface.get_transfer_statuses
+
+    def __init__(self, latency=0.0, broken=(), max_batch_size=1):
+        self.latency, self.broken, self.max_batch_size = latency, set(broken), max_batch_size
+        self.batch_calls = []
+
+    def get_transfer_status(self, partner_transfer_id):
+        time.sleep(self.latency)
+        if partner_transfer_id in self.broken:
+            raise ConnectionError("partner timeout")
+        return TransferResult(partner_transfer_id=partner_transfer_id, status=OnchainStatus.CONFIRMED,
+                              confirmations=12, onchain_tx_hash=f"0x{partner_transfer_id}")
+
+
+class _BatchPartner(_SlowPartner):
+    def get_transfer_statuses(self, partner_transfer_ids):
+        self.batch_calls.append(list(partner_transfer_ids))
+        if self.broken & set(partner_transfer_ids):
+            raise ConnectionError("partner timeout")
+        return {tid: TransferResult(partner_transfer_id=tid, status=OnchainStatus.CONFIRMED, confirmations=12)
+                for tid in partner_transfer_ids}
+
+
+def _pending(db_session, n):
+    for i in range(n):
+        db_session.add(Transaction(
+            receiver_user_id="u-poll", amount_base_units=to_base_units(Decimal("1"), "USDC"),
+            currency="USDC", asset_code="USDC", status="processing", idempotency_key=f"idem-poll-{i}",
+            settlement_type="onchain", settlement_network="ethereum", onchain_status="submitted",
+            partner="mock", partner_transfer_id=f"pt-{i:03d}", direction="deposit",
+            created_at=datetime(2026, 10, 1) + timedelta(minutes=i),
+        ))
+    db_session.commit()
+
+
+def test_poll_fetches_statuses_concurrently_and_commits_per_page(db_session, monkeypatch):
+    _pending(db_session, 8)
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: _SlowPartner(latency=0.1))
+    monkeypatch.setattr(settings, "SETTLEMENT_POLL_CONCURRENCY", 8)
+    commits = []
+
+    def on_commit(conn):
+        commits.append(conn)
+
+    event.listen(db_session.get_bind(), "commit", on_commit)
+    started = time.perf_counter()
+    result = sc.poll_pending_settlements(db_session)
+    elapsed = time.perf_counter() - started
+    event.remove(db_session.get_bind(), "commit", on_commit)
+
+    assert result == {"settled": 8, "failed": 0, "next_cursor": None}
+    assert elapsed < 0.5  # 8 x 100ms serially would be 0.8s
+    assert len(commits) == 1
+    assert get_wallet_balance(db_session, "u-poll", "USDC") == Decimal("8")
+
+
+def test_poll_resumes_from_cursor(db_session, monkeypatch):
+    _pending(db_session, 5)
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: _SlowPartner())
+    monkeypatch.setattr(settings, "SETTLEMENT_POLL_BATCH_SIZE", 2)
+
+    first = sc.poll_pending_settlements(db_session, limit=3)
+    assert first["settled"] == 3 and first["next_cursor"]
+    second = sc.poll_pending_settlements(db_session, cursor=first["next_cursor"])
+    assert second == {"settled": 2, "failed": 0, "next_cursor": None}
+    assert get_wallet_balance(db_session, "u-poll", "USDC") == Decimal("5")
+
+
+def test_poll_skips_rows_whose_status_call_fails(db_session, monkeypatch):
+    _pending(db_session, 3)
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: _SlowPartner(broken={"pt-001"}))
+
+    result = sc.poll_pending_settlements(db_session)
+
+    assert result == {"settled": 2, "failed": 1, "next_cursor": None}
+    stuck = db_session.query(Transaction).filter(Transaction.partner_transfer_id == "pt-001").one()
+    assert stuck.onchain_status == "submitted"
+
+
+def test_settle_rejects_bad_cursor(client, monkeypatch):
+    headers = _auth(monkeypatch)
+    assert client.post("/tasks/settle?cursor=not-a-cursor", headers=headers).status_code == 400
+
+
+def test_poll_uses_one_partner_call_per_batch(db_session, monkeypatch):
+    _pending(db_session, 7)
+    partner = _BatchPartner(max_batch_size=3)
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: partner)
+
+    result = sc.poll_pending_settlements(db_session)
+
+    assert result == {"settled": 7, "failed": 0, "next_cursor": None}
+    assert sorted(len(ids) for ids in partner.batch_calls) == [1, 3, 3]
+
+
+def test_poll_fails_only_the_batch_whose_call_fails(db_session, monkeypatch):
+    _pending(db_session, 4)
+    partner = _BatchPartner(broken={"pt-003"}, max_batch_size=2)
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: partner)
+
+    assert sc.poll_pending_settlements(db_session) == {"settled": 2, "failed": 2, "next_cursor": None}
+
+
+
+def test_poll_leaves_transfers_the_partner_no_longer_knows_pending(db_session, monkeypatch):
+    _pending(db_session, 1)
+    provider = MockStablecoinProvider(maxsize=1)  # pt-000 was never (or is no longer) stored
+    monkeypatch.setattr(sc, "get_stablecoin_provider", lambda: provider)
+
+    assert sc.poll_pending_settlements(db_session) == {"settled": 0, "failed": 1, "next_cursor": None}
+    tx = db_session.query(Transaction).filter(Transaction.partner_transfer_id == "pt-000").one()
+    assert (tx.status, tx.onchain_status) == ("processing", "submitted")
@@ -165,3 +165,63 @@ class TestConsumerToMerchantNames:
         assert match is not None
         assert match["sender_name"] == "display.consumer@test.com"
         assert match["receiver_name"] == "Acme Corp"
+
+
+# ---------------------------------------------------------------------------
+# Bulk enrichment: query count is independent of page size
+# ---------------------------------------------------------------------------
+
+class TestBulkEnrichment:
+
+    def _seed_transactions(self, db_session, n):
+        from datetime import datetime, timedelta
+
+        from app.models.transaction import Transaction
+
+        # Distinct timestamps so every page mixes merchant and user senders.
+        base = datetime(2025, 1, 1)
+
+        consumer = User(id="user-bulk", email="bulk@test.com", first_name="Bulk", last_name="Buyer",
+                        hashed_password="x", role="user")
+        db_session.add(consumer)
+        for i in range(n):
+            if i % 2:
+                db_session.add(Transaction(sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+                                           amount=Decimal("1.00"), rail="ach", status="completed", description="bulk",
+                                           idempotency_key=f"bulk-{i}", created_at=base + timedelta(seconds=i)))
+            else:
+                db_session.add(Transaction(sender_user_id="user-bulk", receiver_merchant_id="merchant-002",
+                                           amount=Decimal("1.00"), rail="ach", status="completed", description="bulk",
+                                           idempotency_key=f"bulk-{i}", created_at=base + timedelta(seconds=i)))
+        db_session.commit()
+
+    def test_list_page_resolves_names_with_constant_queries(self, db_session, seed_data, captured_selects):
+        from app.services.payment_service import list_payments
+
+        self._seed_transactions(db_session, 40)
+        with captured_selects(db_session) as small_queries:
+            list_payments(db_session, page_size=4)
+        with captured_selects(db_session) as large_queries:
+            large = list_payments(db_session, page_size=40)
+
+        assert len(large.items) == 40
+        assert len(small_queries) == len(large_queries)
+        names = {(i.sender_name, i.receiver_name) for i in large.items}
+        assert names == {("Acme Corp", "Globex Inc"), ("Bulk Buyer", "Globex Inc")}
+
+    def test_merchant_name_cache_invalidated_on_update(self, db_session, seed_data, captured_selects):
+        from unittest.mock import patch
+
+        from app.schemas.merchant import MerchantUpdate
+        from app.services import merchant_service
+
+        merchant_service.merchant_name_cache.clear()
+        with patch.object(merchant_service.settings, "MERCHANT_NAME_CACHE_ENABLED", True):
+            assert merchant_service.get_merchant_names(db_session, ["merchant-002"]) == {"merchant-002": "Globex Inc"}
+            with captured_selects(db_session) as queries:
+                merchant_service.get_merchant_names(db_session, ["merchant-002"])
+            assert queries == []
+
+            merchant_service.update_merchant(db_session, "merchant-002", MerchantUpdate(name="Globex Intl"))
+            assert merchant_service.get_merchant_names(db_session, ["merchant-002"]) == {"merchant-002": "Globex Intl"}
+        merchant_service.merchant_name_cache.clear()
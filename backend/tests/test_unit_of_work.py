@@ -0,0 +1,119 @@
+"""Tests for one-commit-per-transition payment orchestration."""
+import uuid
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+from sqlalchemy import event
+
+from app.models.event_log import EventLog
+from app.models.merchant import Merchant
+from app.models.notification_outbox import NotificationOutbox
+from app.schemas.transaction import PaymentCreate
+from app.services import notification_service, unit_of_work
+from app.services.bank.schemas import TransferResponse
+from app.services.payment_service import create_payment
+from tests.conftest import MULTI_CONSUMERS, make_auth_header
+
+
+def _count_commits(db):
+    commits = []
+    event.listen(db.get_bind(), "commit", lambda conn: commits.append(1))
+    return commits
+
+
+@pytest.fixture
+def email_configured():
+    s = notification_service.settings
+    wake = MagicMock()
+    with patch.object(s, "SMTP_USERNAME", "relay-user"), \
+            patch.object(s, "SMTP_PASSWORD", "relay-pass"), \
+            patch.object(notification_service.dispatcher, "wake", wake):
+        yield wake
+
+
+def test_nested_transition_commits_once_then_runs_callbacks(db_session):
+    commits = _count_commits(db_session)
+    ran = []
+    with unit_of_work.transition(db_session):
+        db_session.add(Merchant(id="m-uow-1", name="A", ein="71-0000001", contact_email="a@test.com"))
+        unit_of_work.commit(db_session)
+        with unit_of_work.transition(db_session):
+            db_session.add(Merchant(id="m-uow-2", name="B", ein="71-0000002", contact_email="b@test.com"))
+            unit_of_work.after_commit(db_session, lambda: ran.append(len(commits)))
+        assert commits == [] and ran == []
+
+    assert len(commits) == 1
+    assert ran == [1]
+    assert unit_of_work.current(db_session) is None
+
+
+def test_failed_transition_rolls_back_every_step(db_session):
+    ran = []
+    with pytest.raises(RuntimeError):
+        with unit_of_work.transition(db_session):
+            db_session.add(Merchant(id="m-uow-3", name="C", ein="71-0000003", contact_email="c@test.com"))
+            unit_of_work.commit(db_session)
+            unit_of_work.after_commit(db_session, lambda: ran.append(1))
+            raise RuntimeError("bank exploded")
+
+    assert ran == []
+    assert db_session.query(Merchant).filter(Merchant.id == "m-uow-3").count() == 0
+    assert unit_of_work.current(db_session) is None
+
+
+def test_helpers_act_immediately_outside_a_transition(db_session):
+    commits = _count_commits(db_session)
+    ran = []
+    db_session.add(Merchant(id="m-uow-4", name="D", ein="71-0000004", contact_email="d@test.com"))
+    unit_of_work.commit(db_session)
+    unit_of_work.after_commit(db_session, lambda: ran.append(1))
+    assert len(commits) == 1 and ran == [1]
+
+
+def test_settlement_commits_outbox_rows_with_ledger(db_session, seed_data, email_configured):
+    commits = _count_commits(db_session)
+
+    def instant(request):
+        return TransferResponse(reference_id=str(uuid.uuid4()), status="completed",
+                                rail=request.rail, amount=request.amount)
+
+    with patch("app.services.bank.mock_bank.mock_bank_service.initiate_transfer", side_effect=instant):
+        resp = create_payment(db_session, PaymentCreate(
+            sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+            amount=Decimal("5.00"), idempotency_key="uow-pay-1", preferred_rail="ach", description="x",
+        ))
+
+    assert resp.status == "completed"
+    assert len(commits) == 2  # initiated, settled
+    email_configured.assert_called_once()
+    assert db_session.query(NotificationOutbox).filter(NotificationOutbox.transaction_id == resp.id).count() == 1
+    assert db_session.query(EventLog).filter(EventLog.reference_id == resp.id).count() == 2
+
+
+def test_wallet_send_is_one_commit(client, db_session, full_seed_data, email_configured):
+    (sender_id, sender_email), (receiver_id, _) = MULTI_CONSUMERS
+    commits = _count_commits(db_session)
+    resp = client.post("/wallet/send", json={
+        "receiver_user_id": receiver_id, "amount": "12.00",
+        "idempotency_key": "uow-send-1", "description": "Dinner",
+    }, headers=make_auth_header(sender_id, sender_email, role="user"))
+
+    assert resp.status_code == 200, resp.text
+    assert len(commits) == 3  # reserve the idempotency key, the transfer, store its response
+    outbox = db_session.query(NotificationOutbox).filter(
+        NotificationOutbox.transaction_id == resp.json()["transaction_id"]).one()
+    assert outbox.recipient == "consumer2@test.com"
+
+
+def test_rejected_wallet_send_writes_nothing(client, db_session, full_seed_data, email_configured):
+    (sender_id, sender_email), (receiver_id, _) = MULTI_CONSUMERS
+    # Passes the pre-check, then fails the locked funds check in post_journal.
+    with patch("app.routers.wallet_transfer.get_wallet_balance", return_value=Decimal("1000000")):
+        resp = client.post("/wallet/send", json={
+            "receiver_user_id": receiver_id, "amount": "900.00", "idempotency_key": "uow-send-2",
+        }, headers=make_auth_header(sender_id, sender_email, role="user"))
+
+    assert resp.status_code == 400
+    assert db_session.query(NotificationOutbox).count() == 0
+    email_configured.assert_not_called()
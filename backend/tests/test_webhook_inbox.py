@@ -0,0 +1,114 @@
+"""Tests for queue-mode webhook ingestion (webhook_inbox + InboxWorker)."""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.models.transaction import Transaction
+from app.models.webhook_inbox import WebhookInbox
+from app.services.webhook_inbox import inbox_worker
+from app.services.wallet_service import get_wallet_balance
+
+
+@pytest.fixture(autouse=True)
+def _queue_mode(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_INGEST_MODE", "queue")
+
+
+def _transfer_event(eid, status, partner_transfer_id="xfer-q1"):
+    return {"event_id": eid, "type": "transfer.updated",
+            "data": {"partner_transfer_id": partner_transfer_id, "status": status, "confirmations": 1}}
+
+
+def test_webhook_is_acked_from_the_inbox_and_applied_by_the_worker(client, db_session):
+    event = {"event_id": "evt-q1", "type": "deposit.confirmed",
+             "data": {"user_id": "u-q", "asset_code": "USDC", "amount": "30", "onchain_tx_hash": "0xq1"}}
+
+    first = client.post("/webhooks/stablecoin", json=event)
+    again = client.post("/webhooks/stablecoin", json=event)
+    assert (first.json(), again.json()) == ({"status": "accepted"}, {"status": "duplicate"})
+    assert get_wallet_balance(db_session, "u-q", "USDC") == Decimal("0")
+    assert db_session.query(WebhookInbox).count() == 1
+
+    assert inbox_worker.drain(db_session) == 1
+    db_session.expire_all()
+    row = db_session.query(WebhookInbox).one()
+    assert (row.status, row.outcome, row.ordering_key) == ("processed", "deposit_credited", "0xq1")
+    assert get_wallet_balance(db_session, "u-q", "USDC") == Decimal("30")
+
+
+def test_events_for_one_transfer_apply_in_order_and_wait_for_a_failed_one(client, db_session):
+    for eid, status in (("evt-o1", "confirming"), ("evt-o2", "confirmed")):
+        assert client.post("/webhooks/stablecoin", json=_transfer_event(eid, status)).status_code == 200
+    client.post("/webhooks/stablecoin", json=_transfer_event("evt-other", "confirmed", "xfer-q2"))
+    seen, failures = [], ["evt-o1"]
+
+    def handler(db, event):
+        if event["event_id"] in failures:
+            failures.remove(event["event_id"])
+            raise ConnectionError("db blip")
+        seen.append(event["event_id"])
+        return "transfer_not_found"
+
+    with patch("app.services.webhook_inbox.handle_partner_event", side_effect=handler):
+        inbox_worker.drain(db_session)
+        # evt-o2 waits behind its failed predecessor; the other transfer is unaffected.
+        assert seen == ["evt-other"]
+        db_session.expire_all()
+        failed = db_session.query(WebhookInbox).filter_by(event_id="evt-o1").one()
+        assert (failed.status, failed.attempts, failed.last_error) == ("pending", 1, "db blip")
+
+        failed.locked_until = failed.locked_until - timedelta(minutes=5)  # backoff elapsed
+        db_session.commit()
+        inbox_worker.drain(db_session)
+
+    assert seen == ["evt-other", "evt-o1", "evt-o2"]
+
+
+def test_event_that_keeps_failing_is_parked_and_its_key_moves_on(client, db_session, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_INBOX_MAX_ATTEMPTS", 1)
+    client.post("/webhooks/stablecoin", json=_transfer_event("evt-d1", "confirming"))
+    client.post("/webhooks/stablecoin", json=_transfer_event("evt-d2", "confirmed"))
+
+    def handler(db, event):
+        if event["event_id"] == "evt-d1":
+            raise ValueError("malformed")
+        return "transfer_not_found"
+
+    with patch("app.services.webhook_inbox.handle_partner_event", side_effect=handler):
+        inbox_worker.drain(db_session)
+        inbox_worker.drain(db_session)
+
+    db_session.expire_all()
+    statuses = {r.event_id: r.status for r in db_session.query(WebhookInbox)}
+    assert statuses == {"evt-d1": "dead", "evt-d2": "processed"}
+
+    monkeypatch.setattr(settings, "STABLECOIN_WORKER_SECRET", "inbox-secret")
+    metrics = client.get("/tasks/webhooks/metrics", headers={"X-Worker-Secret": "inbox-secret"}).json()
+    assert (metrics["dead"], metrics["pending"]) == (1, 0)
+
+
+def test_bank_callbacks_are_queued_and_finalized(client, seed_data, db_session):
+    txn = Transaction(
+        sender_merchant_id="merchant-001", receiver_merchant_id="merchant-002",
+        amount=Decimal("200.00"), currency="USD", rail="ach",
+        status="processing", idempotency_key="inbox-bank-1", reference_id="ref-inbox-1",
+    )
+    db_session.add(txn)
+    db_session.commit()
+
+    body = {"reference_id": "ref-inbox-1", "status": "completed"}
+    assert client.post("/webhooks/bank", json=body).json() == {"status": "accepted"}
+    assert client.post("/webhooks/bank", json=body).json() == {"status": "duplicate"}
+    client.post("/webhooks/bank", json={"reference_id": "ref-unknown", "status": "completed"})
+
+    with patch("app.services.notification_service.notify_transaction"):
+        assert inbox_worker.drain(db_session) == 2
+
+    db_session.expire_all()
+    assert db_session.get(Transaction, txn.id).status == "completed"
+    rows = {r.ordering_key: (r.status, r.outcome, r.attempts) for r in db_session.query(WebhookInbox)}
+    # An unknown reference may not be committed yet: it is retried, not dropped.
+    assert rows == {"ref-inbox-1": ("processed", "processed", 0), "ref-unknown": ("pending", None, 1)}